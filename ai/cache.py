@@ -0,0 +1,250 @@
+"""
+Result cache in front of LLM calls.
+
+Summaries and key points are often re-requested for the exact same
+messages (after a restart, or when no new text arrived), and each costs
+a full LLM round trip. Completions are cached by a hash of the model,
+the request parameters and the messages:
+
+- an in-memory LRU tier (per process)
+- a persistent SQLite tier (llm_cache.db next to memory.db, so a restart
+  starts warm; a separate file keeps memory.db's single writer)
+
+Each call type has its own TTL (CACHE_TTLS, overridable with the
+LLM_CACHE_TTLS env var as JSON). A TTL of 0 opts the call type out:
+conversational replies are not cached by default.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from ai.governor import llm_governor
+from config import get_settings
+from memory import storage
+
+# Seconds a cached completion stays valid, per call type (0 = never cached)
+CACHE_TTLS = {
+    "summary": 24 * 60 * 60,
+    "key_points": 24 * 60 * 60,
+    "mistakes": 7 * 24 * 60 * 60,
+    "reply": 0,
+}
+MEMORY_ENTRIES = 512
+CACHE_FILE = "llm_cache.db"
+
+# Governor options and transport settings that do not change the completion
+_NOT_IN_KEY = {"hedge", "deadline", "timeout"}
+
+
+def load_ttls():
+    """Default TTLs, with overrides from LLM_CACHE_TTLS (JSON, e.g. {"reply": 300})."""
+    ttls = dict(CACHE_TTLS)
+    override = get_settings().llm_cache_ttls
+    if override:
+        try:
+            ttls.update({name: float(ttl) for name, ttl in json.loads(override).items()})
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+            print(f"[LLMCache] Ignoring invalid LLM_CACHE_TTLS: {e}")
+    return ttls
+
+
+def request_key(request):
+    """
+    Content hash of a completion request.
+
+    Args:
+        request: Keyword arguments of chat.completions.create
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    payload = {name: value for name, value in request.items() if name not in _NOT_IN_KEY}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier (LRU + SQLite) cache of completion texts.
+
+    Args:
+        path: SQLite file of the persistent tier (default: llm_cache.db next to memory.db)
+        max_entries: Entries kept in the in-memory tier
+        ttls: TTL per call type (default: load_ttls())
+    """
+
+    def __init__(self, path=None, max_entries=MEMORY_ENTRIES, ttls=None):
+        self._path = path
+        self.max_entries = max_entries
+        self._ttls = ttls
+        self.entries = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self._initialized_path = None
+        self.stats = {}
+
+    @property
+    def ttls(self):
+        if self._ttls is None:
+            self._ttls = load_ttls()
+        return self._ttls
+
+    @property
+    def path(self):
+        return self._path or os.path.join(os.path.dirname(storage.DB_PATH), CACHE_FILE)
+
+    def _count(self, call_type, outcome):
+        with self._lock:
+            counts = self.stats.setdefault(call_type, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0})
+            counts[outcome] += 1
+
+    # --- Persistent tier -------------------------------------------------
+
+    def _connect(self):
+        path = self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5.0)
+        if self._initialized_path != path:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                call_type TEXT NOT NULL,
+                response TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """)
+            conn.commit()
+            self._initialized_path = path
+        return conn
+
+    def _disk_get(self, key, now):
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT response, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                               (key, now)).fetchone()
+            conn.close()
+            return row
+        except sqlite3.Error as e:
+            print(f"[LLMCache] Read error: {e}")
+            return None
+
+    def _disk_put(self, key, call_type, text, expires_at):
+        try:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO llm_cache (key, call_type, response, expires_at) VALUES (?, ?, ?, ?)",
+                         (key, call_type, text, expires_at))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"[LLMCache] Write error: {e}")
+
+    def prune_expired(self):
+        """
+        Delete expired rows from the persistent tier.
+
+        Returns:
+            int: Rows deleted
+        """
+        if not os.path.exists(self.path):
+            return 0
+        conn = self._connect()
+        deleted = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    # --- Lookup ----------------------------------------------------------
+
+    def get(self, call_type, request):
+        """
+        Cached completion text for a request, or None.
+        Counts a bypass when the call type is not cached.
+        """
+        if self.ttls.get(call_type, 0) <= 0:
+            self._count(call_type, "bypassed")
+            return None
+
+        key = request_key(request)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+            else:
+                entry = None
+        if entry:
+            self._count(call_type, "memory_hits")
+            return entry[1]
+
+        row = self._disk_get(key, now)
+        if row:
+            self._remember(key, row[1], row[0])
+            self._count(call_type, "disk_hits")
+            return row[0]
+
+        self._count(call_type, "misses")
+        return None
+
+    def put(self, call_type, request, text):
+        """Store a completion text (no-op for call types that are not cached)."""
+        ttl = self.ttls.get(call_type, 0)
+        if ttl <= 0 or not text:
+            return
+        key = request_key(request)
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, text)
+        self._disk_put(key, call_type, text, expires_at)
+
+    def _remember(self, key, expires_at, text):
+        with self._lock:
+            self.entries[key] = (expires_at, text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def complete(self, call_type, create, **request):
+        """
+        Cached chat completion through the governor.
+
+        Args:
+            call_type: TTL class ("summary", "key_points", ...)
+            create: client.chat.completions.create
+            **request: Request parameters (plus governor options like hedge/deadline)
+
+        Returns:
+            str: Completion text
+        """
+        text = self.get(call_type, request)
+        if text is not None:
+            return text
+        response = llm_governor.call(create, **request)
+        text = response.choices[0].message.content
+        self.put(call_type, request, text)
+        return text
+
+    def clear(self):
+        """Drop the in-memory tier (the persistent tier expires on its own)."""
+        with self._lock:
+            self.entries.clear()
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Hit rate and counters per call type, and the in-memory tier size
+        """
+        with self._lock:
+            per_type = {}
+            for call_type, counts in self.stats.items():
+                hits = counts["memory_hits"] + counts["disk_hits"]
+                lookups = hits + counts["misses"]
+                per_type[call_type] = {**counts, "hit_rate": round(hits / lookups, 3) if lookups else None}
+            return {"memory_entries": len(self.entries), "ttls": self.ttls, "by_type": per_type}
+
+
+# Global instance shared by all LLM calls
+llm_cache = LLMCache()
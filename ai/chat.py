@@ -1,36 +1,94 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
+from config import get_openai_client
+from ai.governor import llm_governor, CircuitOpenError, is_timeout
+from ai.cache import llm_cache
+from ai.router import model_router
 
-load_dotenv()
+ERROR_REPLY = "Sorry, I'm having trouble thinking right now. Let's try again in a bit."
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Cheaper reply used when the primary one misses its deadline
+FALLBACK_MODEL = "gpt-4o-mini"
+FALLBACK_MAX_TOKENS = 120
+FALLBACK_HISTORY_LIMIT = 6
 
-def generate_response(system_prompt, message_history, summary_context=""):
+def generate_response(system_prompt, message_history, summary_context="", deadline=None, route=None):
     """
     Generate a response using OpenAI.
-    
+
     Args:
         system_prompt: Base system prompt
         message_history: List of dictionaries [{'role': 'user'|'assistant', 'content': '...'}, ...]
         summary_context: Optional conversation summary to include in system prompt
-    
+        deadline: Optional TurnDeadline. The primary request must finish by the
+            "generation" checkpoint; if it misses, a shorter reply is requested
+            within the "fallback" stage.
+        route: Optional Route from ai.router (model and max_tokens for this
+            turn). Defaults to the "standard" tier.
+
     Returns:
         str: Generated response
     """
+    # Append summary context to system prompt if available
+    enhanced_prompt = system_prompt
+    if summary_context:
+        enhanced_prompt += summary_context
+
+    messages = [{"role": "system", "content": enhanced_prompt}] + message_history
+    route = route or model_router.tier("standard")
+    request = {"model": route.model, "messages": messages, "max_tokens": route.max_tokens}
+
+    # Replies are only cached when LLM_CACHE_TTLS opts them in
+    cached = llm_cache.get("reply", request)
+    if cached is not None:
+        return cached
+
+    try:
+        start = time.monotonic()
+        response = llm_governor.call(
+            get_openai_client().chat.completions.create,
+            **request,
+            deadline=deadline.stage_deadline("generation") if deadline else None
+        )
+        model_router.record_latency(route.model, time.monotonic() - start)
+        text = response.choices[0].message.content
+        llm_cache.put("reply", request, text)
+        return text
+    except CircuitOpenError:
+        print("Skipping AI response: LLM circuit breaker is open")
+        return ERROR_REPLY
+    except Exception as e:
+        if deadline is None or not is_timeout(e):
+            print(f"Error generating AI response: {e}")
+            return ERROR_REPLY
+        deadline.record_miss("generation")
+        # A timeout is the strongest latency signal we get for this model
+        model_router.record_latency(route.model, time.monotonic() - start)
+
+    return generate_fallback_response(system_prompt, message_history, deadline)
+
+
+def generate_fallback_response(system_prompt, message_history, deadline):
+    """
+    Fast, short reply for when the primary generation ran out of time.
+    Uses only the recent history, no summary, a small max_tokens and no
+    hedging, so it fits in the "fallback" stage of the turn budget.
+    """
+    messages = [{"role": "system", "content": system_prompt}] + message_history[-FALLBACK_HISTORY_LIMIT:]
+
     try:
-        # Append summary context to system prompt if available
-        enhanced_prompt = system_prompt
-        if summary_context:
-            enhanced_prompt += summary_context
-        
-        messages = [{"role": "system", "content": enhanced_prompt}] + message_history
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
+        response = llm_governor.call(
+            get_openai_client().chat.completions.create,
+            model=FALLBACK_MODEL,
+            messages=messages,
+            max_tokens=FALLBACK_MAX_TOKENS,
+            hedge=False,
+            deadline=deadline.stage_deadline("fallback")
         )
+        deadline.record_fallback()
+        print(f"[Deadline] Fallback reply after {deadline.elapsed():.2f}s")
         return response.choices[0].message.content
     except Exception as e:
-        print(f"Error generating AI response: {e}")
-        return "Sorry, I'm having trouble thinking right now. Let's try again in a bit."
+        if is_timeout(e):
+            deadline.record_miss("fallback")
+        print(f"Error generating fallback response: {e}")
+        return ERROR_REPLY
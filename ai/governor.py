@@ -0,0 +1,357 @@
+"""
+Shared request governor for all LLM calls.
+
+Every OpenAI request (chat replies, summaries, key points) goes through
+llm_governor.call(), which provides:
+- AIMD adaptive concurrency (additive increase, halve on 429/timeout)
+- Retries with jittered exponential backoff (honours Retry-After)
+- Hedged requests: a duplicate is sent when the first one is slower than
+  the recent p95, and whichever finishes first wins
+- A circuit breaker that fails fast while the API is down, so callers can
+  fall back immediately instead of waiting on timeouts
+
+The OpenAI client is synchronous, so this is thread-based; async callers
+should run LLM functions via asyncio.to_thread.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call's deadline passes before it could succeed."""
+
+
+# HTTP statuses worth retrying; anything else (400, 401, ...) fails at once
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    """Check if an LLM error is transient (rate limit, timeout, 5xx, network)."""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # APIConnectionError / APITimeoutError carry no status code
+    name = type(error).__name__
+    return name in ("APIConnectionError", "APITimeoutError") or isinstance(error, TimeoutError)
+
+
+def is_timeout(error):
+    """Check if an LLM error is a timeout (ours or the HTTP client's)."""
+    return isinstance(error, TimeoutError) or type(error).__name__ == "APITimeoutError"
+
+
+def is_overload(error):
+    """Errors that mean we are sending too much: shrink the concurrency limit."""
+    return _status_code(error) in OVERLOAD_STATUS or type(error).__name__ == "APITimeoutError"
+
+
+def _retry_after_seconds(error):
+    """Read the Retry-After header from an API error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestGovernor:
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=16,
+                 max_retries=3, backoff_base=0.5, backoff_cap=8.0,
+                 hedge_min_delay=2.0, hedge_quantile=0.95,
+                 failure_threshold=5, reset_timeout=30.0):
+        # Adaptive concurrency (AIMD)
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+        # Retries
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        # Hedging
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_quantile = hedge_quantile
+        self.latencies = deque(maxlen=200)
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max_limit * 2, thread_name_prefix="llm-hedge")
+
+        # Circuit breaker
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"  # closed -> open -> half_open -> closed
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._half_open_trial = False
+
+        self.counters = {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "rejected": 0,
+            "limit_decreases": 0,
+        }
+
+    # --- Circuit breaker -------------------------------------------------
+
+    def _before_request(self):
+        with self._cond:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError("LLM circuit breaker is open")
+                self.state = "half_open"
+                self._half_open_trial = False
+                print("[Governor] Circuit half-open, sending a trial request")
+            if self.state == "half_open":
+                if self._half_open_trial:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError("LLM circuit breaker is half-open, trial in progress")
+                self._half_open_trial = True
+
+    def _record_success(self, latency):
+        with self._cond:
+            self.counters["successes"] += 1
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            if self.state != "closed":
+                print("[Governor] Circuit closed")
+            self.state = "closed"
+            self._half_open_trial = False
+            # Additive increase: roughly +1 per "window" of limit requests
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _record_failure(self, error, deadline_bound=False):
+        with self._cond:
+            self.counters["failures"] += 1
+            if deadline_bound and is_timeout(error):
+                # A timeout we imposed from a turn deadline says nothing about
+                # load or health: no decrease, no breaker count. A half-open
+                # trial that ran out of time lets the next request try instead.
+                self._half_open_trial = False
+                return
+            if is_overload(error):
+                # Multiplicative decrease
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.counters["limit_decreases"] += 1
+            if not is_retryable(error):
+                # The endpoint answered (400, auth, ...): it is reachable, so a
+                # failed half-open trial closes the circuit instead of wedging it
+                if self.state == "half_open":
+                    print("[Governor] Circuit closed (trial reached the API)")
+                    self.state = "closed"
+                    self.consecutive_failures = 0
+                    self._half_open_trial = False
+                return
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"[Governor] Circuit opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._half_open_trial = False
+
+    # --- Concurrency -----------------------------------------------------
+
+    def _acquire(self, deadline=None):
+        with self._cond:
+            while self.in_flight >= max(1, int(self.limit)):
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("LLM call deadline exceeded waiting for a slot")
+                self._cond.wait(remaining)
+            self.in_flight += 1
+
+    def _release(self, *_):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _try_acquire(self):
+        with self._cond:
+            if self.in_flight >= max(1, int(self.limit)):
+                return False
+            self.in_flight += 1
+            return True
+
+    # --- Hedging ---------------------------------------------------------
+
+    def hedge_delay(self):
+        """Delay after which a duplicate request is sent (recent p95 latency)."""
+        with self._cond:
+            samples = sorted(self.latencies)
+        if len(samples) < 20:
+            return None  # Not enough data to know what "slow" means
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_quantile))
+        return max(self.hedge_min_delay, samples[index])
+
+    @staticmethod
+    def _with_timeout(kwargs, deadline):
+        """Per-request kwargs with timeout=<time left> (recomputed per send)."""
+        if deadline is None:
+            return kwargs
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("LLM call deadline exceeded")
+        return {**kwargs, "timeout": remaining}
+
+    def _attempt(self, func, args, kwargs, hedge, deadline=None):
+        """One attempt, possibly hedged. Returns the first successful result."""
+        self._acquire(deadline)
+        try:
+            request_kwargs = self._with_timeout(kwargs, deadline)
+        except DeadlineExceeded:
+            self._release()
+            raise
+        primary = self._hedge_pool.submit(func, *args, **request_kwargs)
+        primary.add_done_callback(self._release)
+
+        delay = self.hedge_delay() if hedge else None
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._try_acquire():
+            return primary.result()
+        try:
+            request_kwargs = self._with_timeout(kwargs, deadline)
+        except DeadlineExceeded:
+            self._release()
+            return primary.result()
+
+        with self._cond:
+            self.counters["hedges"] += 1
+        backup = self._hedge_pool.submit(func, *args, **request_kwargs)
+        backup.add_done_callback(self._release)
+
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        with self._cond:
+                            self.counters["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    # --- Public API ------------------------------------------------------
+
+    def call(self, func, *args, hedge=True, deadline=None, **kwargs):
+        """
+        Run an LLM request under the governor.
+
+        Args:
+            func: Callable performing the request (e.g. client.chat.completions.create)
+            hedge: Allow a duplicate request for slow tail latencies
+            deadline: Optional time.monotonic() value by which the call must
+                finish. Waiting for a concurrency slot is capped by it, each
+                request gets timeout=<time left> once it has a slot, and no
+                retry is started that could not finish in time.
+            *args, **kwargs: Passed to func
+
+        Returns:
+            The result of func
+
+        Raises:
+            CircuitOpenError: If the circuit is open (no request was made)
+            DeadlineExceeded: If the deadline passed before an attempt could start
+            Exception: The last error once retries are exhausted
+        """
+        with self._cond:
+            self.counters["requests"] += 1
+
+        for attempt in range(self.max_retries + 1):
+            if deadline is not None and deadline <= time.monotonic():
+                raise DeadlineExceeded("LLM call deadline exceeded")
+
+            self._before_request()
+            start = time.monotonic()
+            try:
+                result = self._attempt(func, args, kwargs, hedge, deadline)
+            except Exception as e:
+                self._record_failure(e, deadline_bound=deadline is not None)
+                if not is_retryable(e) or attempt == self.max_retries or self.state == "open":
+                    raise
+                # Full jitter backoff, but never sooner than Retry-After
+                backoff = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+                retry_after = _retry_after_seconds(e)
+                if retry_after is not None:
+                    backoff = max(backoff, min(retry_after, self.backoff_cap))
+                if deadline is not None and time.monotonic() + backoff >= deadline:
+                    raise
+                with self._cond:
+                    self.counters["retries"] += 1
+                print(f"[Governor] {type(e).__name__}, retrying in {backoff:.2f}s (attempt {attempt + 1})")
+                time.sleep(backoff)
+                continue
+
+            self._record_success(time.monotonic() - start)
+            return result
+
+    def share_budget(self, parts):
+        """
+        Keep only a 1/parts share of the concurrency budget (for one of
+        `parts` worker processes calling the same API).
+
+        Args:
+            parts: Number of processes sharing the API
+        """
+        with self._cond:
+            self.max_limit = max(1, self.max_limit // max(1, parts))
+            self.min_limit = min(self.min_limit, self.max_limit)
+            self.limit = min(self.limit, float(self.max_limit))
+            self._cond.notify_all()
+
+    def metrics(self):
+        """
+        Get governor state for monitoring.
+
+        Returns:
+            dict: Concurrency, circuit state, counters and latency percentiles
+        """
+        with self._cond:
+            samples = sorted(self.latencies)
+            data = {
+                "concurrency_limit": round(self.limit, 2),
+                "max_limit": self.max_limit,
+                "in_flight": self.in_flight,
+                "circuit_state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                **self.counters,
+            }
+        if samples:
+            data["latency_p50"] = samples[len(samples) // 2]
+            data["latency_p95"] = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        data["hedge_delay"] = self.hedge_delay()
+        return data
+
+
+# Global instance shared by all LLM calls
+llm_governor = RequestGovernor()
@@ -1,5 +1,5 @@
-from ringle.mock_data import get_system_prompt
+from ringle.students import student_directory
 
-def get_bot_system_prompt():
-    """Retrieve the system prompt with current context."""
-    return get_system_prompt()
+def get_bot_system_prompt(phone_number=None, telegram_id=None):
+    """Retrieve the system prompt with the student's context (cached per student)."""
+    return student_directory.get_system_prompt(phone_number=phone_number, telegram_id=telegram_id)
@@ -0,0 +1,164 @@
+"""
+Channel-aware chunk packing.
+
+Runs after split_message_into_chunks. Semantic chunks are fitted to what
+the delivery channel can carry:
+
+- SMS is billed and throttled per segment: 160 GSM-7 characters (153 per
+  part when concatenated) or 70 UCS-2 characters (67 per part) as soon as
+  the text has one non-GSM character, e.g. Korean. Adjacent chunks are
+  grouped so the reply uses as few segments as possible; when grouping
+  does not save a segment the chunks stay separate messages.
+- Telegram rejects messages over 4096 characters (UTF-16 code units).
+
+Chunks over a channel's hard limit are split at whitespace. Other services
+(iMessage, Web) are passed through unchanged.
+"""
+
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = set("^{}\\[~]|€\f")  # Sent as escape + char (2 septets)
+
+GSM7_SINGLE, GSM7_PART = 160, 153
+UCS2_SINGLE, UCS2_PART = 70, 67
+SMS_MAX_SEGMENTS = 10       # Longer concatenated SMS are unreliable across carriers
+SMS_JOINER = "\n"
+
+# Hard per-message limits, in UTF-16 code units
+CHANNEL_CHAR_LIMITS = {
+    "Telegram": 4096,
+}
+
+
+def is_gsm7(text):
+    """True if `text` can be sent with the GSM-7 alphabet."""
+    return all(c in GSM7_BASIC or c in GSM7_EXTENDED for c in text)
+
+
+def utf16_length(text):
+    """Length in UTF-16 code units (characters outside the BMP count twice)."""
+    return sum(2 if ord(c) > 0xFFFF else 1 for c in text)
+
+
+def sms_segments(text):
+    """
+    Number of SMS segments needed to send `text`.
+
+    A character is never split across parts (GSM-7 escapes and UTF-16
+    surrogate pairs stay together), as on real handsets.
+
+    Returns:
+        int: Segment count (0 for empty text)
+    """
+    if not text:
+        return 0
+    if is_gsm7(text):
+        widths = [2 if c in GSM7_EXTENDED else 1 for c in text]
+        single, part = GSM7_SINGLE, GSM7_PART
+    else:
+        widths = [2 if ord(c) > 0xFFFF else 1 for c in text]
+        single, part = UCS2_SINGLE, UCS2_PART
+
+    if sum(widths) <= single:
+        return 1
+    segments, used = 1, 0
+    for width in widths:
+        if used + width > part:
+            segments += 1
+            used = 0
+        used += width
+    return segments
+
+
+def split_to_limit(text, measure, limit):
+    """
+    Split `text` into pieces with measure(piece) <= limit, preferring
+    whitespace boundaries.
+
+    Args:
+        text: Text to split
+        measure: Monotonic size function (e.g. utf16_length, sms_segments)
+        limit: Maximum size per piece
+
+    Returns:
+        list: Pieces in order
+    """
+    pieces = []
+    text = text.strip()
+    while text and measure(text) > limit:
+        # Longest prefix that fits
+        low, high = 1, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if measure(text[:mid]) <= limit:
+                low = mid
+            else:
+                high = mid - 1
+        cut = low
+        # Back off to the last whitespace unless that would leave a tiny piece
+        space = max(text.rfind(" ", 0, cut + 1), text.rfind("\n", 0, cut + 1))
+        if space > cut // 2:
+            cut = space
+        pieces.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def pack_sms(chunks, max_segments=SMS_MAX_SEGMENTS):
+    """
+    Group adjacent chunks into SMS messages with the fewest total segments.
+
+    Among groupings with the same segment count, the one sending more
+    messages wins, so semantic chunks are only merged when that saves a
+    segment.
+
+    Returns:
+        list: Messages to send
+    """
+    pieces = [piece for chunk in chunks for piece in split_to_limit(chunk, sms_segments, max_segments)]
+    if not pieces:
+        return []
+
+    # best[i]: (segments, -messages, start of last group) for pieces[:i]
+    best = [(0, 0, 0)] + [None] * len(pieces)
+    for end in range(1, len(pieces) + 1):
+        for start in range(end - 1, -1, -1):
+            segments = sms_segments(SMS_JOINER.join(pieces[start:end]))
+            if segments > max_segments:
+                break
+            cost = (best[start][0] + segments, best[start][1] - 1, start)
+            if best[end] is None or cost[:2] < best[end][:2]:
+                best[end] = cost
+
+    messages = []
+    end = len(pieces)
+    while end > 0:
+        start = best[end][2]
+        messages.append(SMS_JOINER.join(pieces[start:end]))
+        end = start
+    messages.reverse()
+    return messages
+
+
+def pack_chunks(chunks, service):
+    """
+    Fit semantic chunks to the delivery channel.
+
+    Args:
+        chunks: Output of split_message_into_chunks
+        service: Service name (SMS, iMessage, Telegram, Web)
+
+    Returns:
+        list: Messages to send
+    """
+    if service == "SMS":
+        return pack_sms(chunks)
+
+    limit = CHANNEL_CHAR_LIMITS.get(service)
+    if limit is None:
+        return list(chunks)
+    return [piece for chunk in chunks for piece in split_to_limit(chunk, utf16_length, limit)]
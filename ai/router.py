@@ -0,0 +1,180 @@
+"""
+Latency-aware model routing.
+
+Each turn is classified by message length, detected language and whether
+the student likely needs a correction, and sent to a model tier with its
+own max_tokens. Observed latency is tracked per model (EWMA); when a
+tier's model gets slower than its latency target, part of its traffic is
+shifted to the next cheaper tier until it recovers.
+"""
+
+import json
+import random
+import re
+import threading
+from collections import namedtuple
+
+from config import get_settings
+
+Route = namedtuple("Route", ["tier", "model", "max_tokens"])
+
+# Tiers from cheapest to most capable.
+# fallback: tier to shift traffic to when this tier's model is slow.
+DEFAULT_TIERS = {
+    "quick": {"model": "gpt-4o-mini", "max_tokens": 150, "latency_target": 2.0, "fallback": None},
+    "standard": {"model": "gpt-4o-mini", "max_tokens": 400, "latency_target": 4.0, "fallback": "quick"},
+    "correction": {"model": "gpt-4o", "max_tokens": 600, "latency_target": 6.0, "fallback": "standard"},
+    "summary": {"model": "gpt-4o-mini", "max_tokens": 300, "latency_target": 8.0, "fallback": None},
+}
+
+QUICK_MAX_WORDS = 4         # "thanks!", "ok see you" ...
+CORRECTION_MIN_WORDS = 25   # Long messages usually deserve a careful reply
+MAX_SHIFT = 0.9             # Always keep some traffic to notice recovery
+EWMA_ALPHA = 0.2
+
+# Cheap signals that the student wants or needs grammar help
+GRAMMAR_QUESTION = re.compile(
+    r"\b(grammar|correct|mistake|wrong|meaning|difference between|how do (i|you) say)\b"
+    r"|맞아|맞나요|틀렸|문법|무슨 뜻|어떻게 말",
+    re.IGNORECASE,
+)
+COMMON_ERRORS = re.compile(
+    r"\b(i|he|she|it) (are|were|am not)\b"
+    r"|\b(he|she|it) (have|do|go|want)\b"
+    r"|\b(goed|buyed|eated|runned|teached|thinked|a (apple|hour|email|office))\b"
+    r"|(?-i:(^|[.!?]\s+)i\b)",  # Lowercase "i" as a sentence
+    re.IGNORECASE,
+)
+
+
+def validate_tiers(tiers):
+    """
+    Check a tier table before the router uses it.
+
+    Raises:
+        ValueError: A tier lacks a model or a positive max_tokens/latency_target,
+            or its fallback chain names a missing tier or loops
+    """
+    for name, cfg in tiers.items():
+        if not isinstance(cfg.get("model"), str) or not cfg["model"]:
+            raise ValueError(f"tier {name!r} needs a model")
+        max_tokens = cfg.get("max_tokens")
+        if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens <= 0:
+            raise ValueError(f"tier {name!r} needs a positive integer max_tokens")
+        if float(cfg["latency_target"]) <= 0:
+            raise ValueError(f"tier {name!r} needs a positive latency_target")
+        seen = {name}
+        fallback = cfg.get("fallback")
+        while fallback is not None:
+            if fallback not in tiers:
+                raise ValueError(f"tier {name!r} falls back to unknown tier {fallback!r}")
+            if fallback in seen:
+                raise ValueError(f"tier {name!r} has a fallback loop")
+            seen.add(fallback)
+            fallback = tiers[fallback].get("fallback")
+
+
+def load_tiers():
+    """
+    Default tiers, with overrides from the MODEL_TIERS env var (JSON).
+    An override that does not parse or validate is logged and ignored as a whole.
+    """
+    tiers = {name: dict(cfg) for name, cfg in DEFAULT_TIERS.items()}
+    override = get_settings().model_tiers
+    if not override:
+        return tiers
+    try:
+        for name, cfg in json.loads(override).items():
+            tiers.setdefault(name, {"latency_target": 4.0, "fallback": None}).update(cfg)
+        validate_tiers(tiers)
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError, KeyError) as e:
+        print(f"[Router] Ignoring invalid MODEL_TIERS: {e}")
+        return {name: dict(cfg) for name, cfg in DEFAULT_TIERS.items()}
+    return tiers
+
+
+def needs_correction(text):
+    """Heuristic: does this message look like it needs grammar feedback?"""
+    return bool(GRAMMAR_QUESTION.search(text) or COMMON_ERRORS.search(text))
+
+
+def classify_turn(text, language="en"):
+    """
+    Pick a tier for a user message.
+
+    Args:
+        text: User message
+        language: Detected language ("ko" or "en")
+
+    Returns:
+        str: Tier name
+    """
+    words = len(text.split())
+    if language == "ko" or needs_correction(text) or words >= CORRECTION_MIN_WORDS:
+        # Korean means the student is struggling to say it in English
+        return "correction"
+    if words <= QUICK_MAX_WORDS:
+        return "quick"
+    return "standard"
+
+
+class ModelRouter:
+    def __init__(self, tiers=None):
+        self.tiers = tiers or load_tiers()
+        self.latency = {}   # model -> EWMA seconds
+        self.samples = {}   # model -> observed requests
+        self.routed = {name: 0 for name in self.tiers}
+        self.shifted = {name: 0 for name in self.tiers}
+        self._lock = threading.Lock()
+
+    def tier(self, name):
+        """Route for a fixed tier (e.g. "summary"), without classification."""
+        cfg = self.tiers[name]
+        return Route(name, cfg["model"], cfg["max_tokens"])
+
+    def shift_probability(self, name):
+        """Fraction of a tier's traffic to move away, based on its model's latency."""
+        cfg = self.tiers[name]
+        observed = self.latency.get(cfg["model"])
+        if not cfg.get("fallback") or observed is None or observed <= cfg["latency_target"]:
+            return 0.0
+        return min(MAX_SHIFT, (observed - cfg["latency_target"]) / cfg["latency_target"])
+
+    def route(self, text, language="en"):
+        """
+        Choose the model and max_tokens for a turn.
+
+        Returns:
+            Route: (tier, model, max_tokens)
+        """
+        name = classify_turn(text, language)
+        with self._lock:
+            # Walk down the fallback chain while the current tier is degraded
+            while random.random() < self.shift_probability(name):
+                self.shifted[name] += 1
+                name = self.tiers[name]["fallback"]
+            self.routed[name] += 1
+        return self.tier(name)
+
+    def record_latency(self, model, seconds):
+        """Feed an observed request latency into the model's EWMA."""
+        with self._lock:
+            previous = self.latency.get(model)
+            self.latency[model] = seconds if previous is None else (
+                EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+            )
+            self.samples[model] = self.samples.get(model, 0) + 1
+
+    def metrics(self):
+        """Routing counts and per-model latency."""
+        with self._lock:
+            return {
+                "routed": dict(self.routed),
+                "shifted": dict(self.shifted),
+                "latency_ewma": {model: round(value, 3) for model, value in self.latency.items()},
+                "samples": dict(self.samples),
+            }
+
+
+# Global router instance
+model_router = ModelRouter()
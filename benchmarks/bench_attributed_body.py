@@ -0,0 +1,113 @@
+"""
+Benchmark for attributedBody text extraction (imessage/typedstream.py).
+
+Generates blobs with the synthetic chat.db encoder (short chat lines,
+Korean, emoji, long texts with 16-bit length prefixes, attachments) and
+times extract_text per blob and fill_text over query-sized batches. Every
+decoded string is checked against the text it was built from.
+
+With --db, also reads every message of a synthetic chat.db (see
+benchmarks/synthetic_chat_db.py) and times fetching and decoding the
+NULL-text rows through SQLite.
+
+Usage:
+    python benchmarks/bench_attributed_body.py --blobs 200000
+    python benchmarks/bench_attributed_body.py --db benchmarks/.data/chat_1000000_10000.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from imessage.typedstream import extract_text, fill_text
+from synthetic_chat_db import WORDS, encode_attributed_body
+
+KOREAN = "어제 회사에 갔어요 영어로 어떻게 말해요 수업 숙제 발표 회의 이메일".split()
+EMOJI = ["😀", "🙏", "👍", "🎉", "😂"]
+
+
+def make_texts(count, seed=42):
+    """Mix of message shapes seen in a real inbox."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            text = " ".join(rng.choices(WORDS, k=rng.randint(2, 14)))
+        elif kind < 0.8:
+            text = " ".join(rng.choices(KOREAN, k=rng.randint(2, 10)))
+        elif kind < 0.9:
+            text = " ".join(rng.choices(WORDS, k=rng.randint(2, 8))) + " " + rng.choice(EMOJI)
+        elif kind < 0.97:
+            text = " ".join(rng.choices(WORDS, k=rng.randint(40, 120)))  # > 127 bytes
+        else:
+            text = "\ufffc"  # Attachment
+        texts.append(text)
+    return texts
+
+
+def bench_blobs(count, batch):
+    texts = make_texts(count)
+    blobs = [encode_attributed_body(text, mutable=i % 10 == 0) for i, text in enumerate(texts)]
+    expected = [text.strip() if text != "\ufffc" else None for text in texts]
+    size = sum(len(blob) for blob in blobs)
+    print(f"{count:,} blobs, {size / 1e6:.1f} MB (avg {size / count:.0f} bytes)")
+
+    start = time.perf_counter()
+    decoded = [extract_text(blob) for blob in blobs]
+    elapsed = time.perf_counter() - start
+    assert decoded == expected, "extract_text returned a wrong string"
+    print(f"  extract_text   {elapsed / count * 1e6:7.2f} us/blob   {count / elapsed:12,.0f} blobs/s")
+
+    rows = [(i, None, "iMessage", blob) for i, blob in enumerate(blobs)]
+    start = time.perf_counter()
+    filled = []
+    for offset in range(0, count, batch):
+        filled.extend(fill_text(rows[offset:offset + batch], 1, 3))
+    elapsed = time.perf_counter() - start
+    assert [row[1] for row in filled] == expected, "fill_text returned a wrong string"
+    print(f"  fill_text      {elapsed / count * 1e6:7.2f} us/row    {count / elapsed:12,.0f} rows/s   (batches of {batch})")
+
+
+def bench_db(path, batch):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    start = time.perf_counter()
+    rows = conn.execute("SELECT ROWID, text, handle_id, attributedBody FROM message").fetchall()
+    fetched = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filled = []
+    for offset in range(0, len(rows), batch):
+        filled.extend(fill_text(rows[offset:offset + batch], 1, 3))
+    decoded = time.perf_counter() - start
+    conn.close()
+
+    body_only = sum(1 for row in rows if row[1] is None)
+    recovered = sum(1 for row, out in zip(rows, filled) if row[1] is None and out[1])
+    print(f"\n{path}: {len(rows):,} messages, {body_only:,} with NULL text")
+    print(f"  fetch          {fetched:7.2f} s")
+    print(f"  fill_text      {decoded:7.2f} s   ({decoded / max(1, body_only) * 1e6:.2f} us per NULL-text row)")
+    print(f"  recovered text for {recovered:,} rows ({body_only - recovered:,} attachments without text)")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blobs", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=200, help="Rows per fill_text call (a poll or history page)")
+    parser.add_argument("--db", help="Synthetic chat.db to decode end to end")
+    args = parser.parse_args()
+
+    bench_blobs(args.blobs, args.batch)
+    if args.db:
+        bench_db(args.db, args.batch)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,144 @@
+"""
+Benchmark for WebSocket broadcast fan-out.
+
+Connects thousands of simulated sockets to a ConnectionManager and sends a
+series of broadcasts. A share of the sockets is slow (every send takes
+--slow-delay) and a few are stalled (sends never complete), like browsers
+on a bad network or a suspended laptop. Reports how long the healthy
+sockets wait for their messages and what the slow-consumer policy did.
+
+--sequential runs the old behaviour (awaiting send_text on each socket in
+turn) for comparison; expect it to be bounded by the slowest socket.
+
+Usage:
+    python benchmarks/bench_broadcast.py --sockets 5000 --messages 20
+    python benchmarks/bench_broadcast.py --sockets 500 --messages 5 --sequential
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels import web
+from channels.web import ConnectionManager
+
+
+class SimulatedSocket:
+    def __init__(self, delay=0.0, stalled=False):
+        self.delay = delay
+        self.stalled = stalled
+        self.received = 0
+        self.latencies = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.stalled:
+            await asyncio.Event().wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        self.latencies.append(time.perf_counter() - float(text))
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+
+def make_sockets(count, slow_share, stalled, slow_delay):
+    slow = int(count * slow_share)
+    sockets = [SimulatedSocket(stalled=True) for _ in range(stalled)]
+    sockets += [SimulatedSocket(delay=slow_delay) for _ in range(slow)]
+    sockets += [SimulatedSocket() for _ in range(count - len(sockets))]
+    return sockets
+
+
+async def run_manager(sockets, messages, interval, policy, outbox_limit):
+    manager = ConnectionManager(policy=policy, outbox_limit=outbox_limit)
+    for ws in sockets:
+        await manager.connect(ws)
+
+    enqueue_times = []
+    start = time.perf_counter()
+    for _ in range(messages):
+        t = time.perf_counter()
+        await manager.broadcast(repr(t), key="tick")
+        enqueue_times.append(time.perf_counter() - t)
+        await asyncio.sleep(interval)
+
+    # Wait until every healthy socket has everything
+    healthy = [ws for ws in sockets if not ws.delay and not ws.stalled]
+    while any(ws.received < messages for ws in healthy):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    metrics = manager.metrics()
+    manager.shutdown()
+    return elapsed, enqueue_times, metrics
+
+
+async def run_sequential(sockets, messages, interval):
+    # Stalled sockets would block forever; the old code had no way out
+    sockets = [ws for ws in sockets if not ws.stalled]
+    enqueue_times = []
+    start = time.perf_counter()
+    for _ in range(messages):
+        t = time.perf_counter()
+        for ws in sockets:
+            await ws.send_text(repr(t))
+        enqueue_times.append(time.perf_counter() - t)
+        await asyncio.sleep(interval)
+    return time.perf_counter() - start, enqueue_times, None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between broadcasts")
+    parser.add_argument("--slow-share", type=float, default=0.05, help="Fraction of slow sockets")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Seconds per send on a slow socket")
+    parser.add_argument("--stalled", type=int, default=10, help="Sockets whose sends never complete")
+    parser.add_argument("--outbox-limit", type=int, default=web.OUTBOX_LIMIT)
+    parser.add_argument("--policy", choices=("coalesce", "drop"), default=web.SLOW_CONSUMER_POLICY)
+    parser.add_argument("--sequential", action="store_true", help="Old one-socket-at-a-time broadcast")
+    args = parser.parse_args()
+
+    sockets = make_sockets(args.sockets, args.slow_share, args.stalled, args.slow_delay)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.sequential:
+            elapsed, enqueue_times, metrics = asyncio.run(run_sequential(sockets, args.messages, args.interval))
+        else:
+            elapsed, enqueue_times, metrics = asyncio.run(
+                run_manager(sockets, args.messages, args.interval, args.policy, args.outbox_limit))
+
+    healthy = [ws for ws in sockets if not ws.delay and not ws.stalled]
+    latencies = [lat * 1000 for ws in healthy for lat in ws.latencies]
+    enqueue_ms = [t * 1000 for t in enqueue_times]
+
+    mode = "sequential" if args.sequential else f"manager (policy={args.policy}, outbox={args.outbox_limit})"
+    print(f"Sockets: {args.sockets} ({len(healthy)} healthy), broadcasts: {args.messages}, mode: {mode}")
+    print(f"broadcast() call p50: {percentile(enqueue_ms, 0.5):.2f} ms, max: {max(enqueue_ms):.2f} ms")
+    print(f"Healthy delivery latency p50: {percentile(latencies, 0.5):.2f} ms, "
+          f"p95: {percentile(latencies, 0.95):.2f} ms, max: {max(latencies):.2f} ms")
+    print(f"All healthy sockets served after {elapsed:.2f}s")
+    if metrics:
+        closed = sum(1 for ws in sockets if ws.closed_with is not None)
+        print(f"Coalesced: {metrics['coalesced']}, slow consumers dropped: {metrics['slow_disconnects']} "
+              f"(closed: {closed}), still connected: {metrics['connections']}")
+
+
+if __name__ == "__main__":
+    main_cli()
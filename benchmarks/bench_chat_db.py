@@ -0,0 +1,244 @@
+"""
+Benchmark suite for imessage/reader.py on a synthetic chat.db.
+
+Builds (or reuses) a schema-faithful chat.db with benchmarks/synthetic_chat_db.py
+and times the poller's queries for a busy, a mid-ranked and a long-tail
+conversation:
+
+    get_last_message_rowid   startup
+    get_new_messages         single-handle poll (nothing new, and 100 rows behind)
+    catchup_page             catch-up after downtime (200-row page)
+    get_conversation_history every turn (limit 20)
+
+and the cost of one poll cycle as the number of watched students grows:
+one shared-cursor query over all handles versus one query per handle.
+
+Each run is appended to benchmarks/results/chat_db_reader.jsonl and compared
+with the previous run at the same scale; --fail-on-regression exits with 1
+when a query got slower than --threshold times its previous p50.
+
+Usage:
+    python benchmarks/bench_chat_db.py --messages 10000000 --handles 50000
+    python benchmarks/bench_chat_db.py --messages 300000 --handles 5000 --iterations 50
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from imessage import reader
+from synthetic_chat_db import GENERATOR_VERSION, build_chat_db, handle_address, load_meta
+
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results", "chat_db_reader.jsonl")
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def time_query(conn, func, iterations, budget, timeout):
+    """
+    Time `func`; stops early once `budget` seconds are spent (at least one
+    sample). A single call running longer than `timeout` is interrupted and
+    reported as timed out.
+    """
+    samples = []
+    deadline = time.perf_counter() + budget
+    for _ in range(iterations):
+        timer = threading.Timer(timeout, conn.interrupt)
+        timer.start()
+        start = time.perf_counter()
+        try:
+            func()
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            return {"p50_ms": timeout * 1000, "p95_ms": timeout * 1000, "samples": len(samples) + 1, "timed_out": True}
+        finally:
+            timer.cancel()
+        samples.append((time.perf_counter() - start) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    return {
+        "p50_ms": round(percentile(samples, 0.5), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "samples": len(samples),
+    }
+
+
+def rowid_behind(conn, handle, rows):
+    """ROWID such that `rows` incoming messages of `handle` come after it."""
+    row = conn.execute(
+        "SELECT message.ROWID FROM message JOIN handle ON message.handle_id = handle.ROWID "
+        "WHERE handle.id = ? AND message.is_from_me = 0 ORDER BY message.ROWID DESC LIMIT 1 OFFSET ?",
+        (handle, rows),
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def run_suite(conn, handles, iterations, budget, timeout):
+    results = {}
+    for kind, handle in handles.items():
+        latest = reader.get_last_message_rowid(conn, handle)
+        behind = rowid_behind(conn, handle, 100)
+        watched = reader.resolve_handles(conn, [handle])
+        count = conn.execute(
+            "SELECT COUNT(*) FROM message JOIN handle ON message.handle_id = handle.ROWID WHERE handle.id = ?",
+            (handle,),
+        ).fetchone()[0]
+        results[kind] = {
+            "handle": handle,
+            "messages": count,
+            "get_last_message_rowid": time_query(conn, lambda: reader.get_last_message_rowid(conn, handle), iterations, budget, timeout),
+            "get_new_messages_idle": time_query(conn, lambda: reader.get_new_messages(conn, handle, latest), iterations, budget, timeout),
+            "get_new_messages_100": time_query(conn, lambda: reader.get_new_messages(conn, handle, behind), iterations, budget, timeout),
+            "catchup_page": time_query(conn, lambda: reader.get_new_messages_for_handles(conn, watched, behind, latest, 200), iterations, budget, timeout),
+            "get_conversation_history": time_query(conn, lambda: reader.get_conversation_history(conn, handle, limit=20), iterations, budget, timeout),
+        }
+    return results
+
+
+def run_poll_suite(conn, handle_count, iterations, budget, timeout, behind=1000):
+    """
+    One poll cycle for 1, 50 and 500 watched students (capped at the handle
+    count), `behind` rows after the cursor.
+    """
+    inbox = reader.get_inbox_rowid(conn)
+    cursor = max(0, inbox - behind)
+    results = {"behind": behind}
+    for students in sorted({min(n, handle_count) for n in (1, 50, 500)}):
+        addresses = [handle_address(rank) for rank in range(1, students + 1)]
+        watched = reader.resolve_handles(conn, addresses)
+        results[f"shared_cursor_{students}"] = time_query(
+            conn, lambda: reader.get_new_messages_for_handles(conn, watched, cursor), iterations, budget, timeout)
+        results[f"per_handle_{students}"] = time_query(
+            conn, lambda: [reader.get_new_messages(conn, address, cursor) for address in addresses],
+            iterations, budget, timeout)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(scale):
+    """Most recent stored run on the same synthetic data (scale and generator version), or None."""
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    previous = None
+    with open(RESULTS_PATH) as f:
+        for line in f:
+            record = json.loads(line)
+            old = record["scale"]
+            if (old["messages"], old["handles"], old.get("generator_version")) == \
+                    (scale["messages"], scale["handles"], scale["generator_version"]):
+                previous = record
+    return previous
+
+
+def compare(current, previous, threshold):
+    """Print p50 changes; returns the list of regressions."""
+    regressions = []
+    print(f"\nCompared with {previous['commit'] or '?'} ({previous['timestamp']}):")
+    for kind, queries in current["results"].items():
+        old_queries = previous["results"].get(kind, {})
+        for name, stats in queries.items():
+            if not isinstance(stats, dict) or name not in old_queries:
+                continue
+            old, new = old_queries[name]["p50_ms"], stats["p50_ms"]
+            ratio = new / old if old else 1.0
+            flag = ""
+            if ratio > threshold:
+                flag = "  <-- REGRESSION"
+                regressions.append((kind, name, old, new))
+            print(f"  {kind:8s} {name:26s} {old:9.3f} -> {new:9.3f} ms (x{ratio:.2f}){flag}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--handles", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--budget", type=float, default=5.0, help="Max seconds spent timing one query")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Interrupt a single call after this many seconds")
+    parser.add_argument("--db", help="chat.db to use (default: cached under benchmarks/.data)")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate the database")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p50 ratio counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true", help="Do not append to the results file")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(DATA_DIR, f"chat_{args.messages}_{args.handles}.db")
+    meta = load_meta(path)
+    if args.rebuild or not os.path.exists(path) or not meta or \
+            (meta["messages"], meta["handles"]) != (args.messages, args.handles) or \
+            meta.get("generator_version") != GENERATOR_VERSION:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        print(f"Building {path} ({args.messages:,} messages, {args.handles:,} handles)...")
+        meta = build_chat_db(path, args.messages, args.handles)
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    results = run_suite(conn, meta["sample_handles"], args.iterations, args.budget, args.timeout)
+    results["poll"] = run_poll_suite(conn, meta["handles"], args.iterations, args.budget, args.timeout)
+    conn.close()
+
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "scale": {"messages": meta["messages"], "handles": meta["handles"], "size_mb": meta["size_mb"],
+                  "generator_version": meta["generator_version"]},
+        "iterations": args.iterations,
+        "results": results,
+    }
+
+    print(f"\nchat.db: {meta['messages']:,} messages, {meta['handles']:,} handles, {meta['size_mb']} MB "
+          f"(SQLite {sqlite3.sqlite_version})")
+    for kind, queries in results.items():
+        if kind == "poll":
+            print(f"\npoll cycle ({queries['behind']:,} new rows since the cursor)")
+        else:
+            print(f"\n{kind} conversation {queries['handle']} ({queries['messages']:,} messages)")
+        for name, stats in queries.items():
+            if isinstance(stats, dict):
+                if stats.get("timed_out"):
+                    print(f"  {name:26s} TIMED OUT (> {args.timeout:.0f} s)")
+                    continue
+                print(f"  {name:26s} p50 {stats['p50_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms"
+                      f"   ({stats['samples']} runs)")
+
+    previous = load_previous(record["scale"])
+    regressions = compare(record, previous, args.threshold) if previous else []
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nSaved to {os.path.relpath(RESULTS_PATH)}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
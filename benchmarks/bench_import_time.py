@@ -0,0 +1,80 @@
+"""
+Import-time benchmark for startup (uses python -X importtime).
+
+Imports `main` in a fresh interpreter several times, reports the best
+total and the slowest top-level imports, and fails (exit code 1) when
+startup goes over budget or pulls in a heavy module that should stay lazy.
+
+Usage:
+    python benchmarks/bench_import_time.py --budget-ms 300
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported when actually used (first LLM call / Telegram enabled)
+LAZY_MODULES = ("openai", "telegram", "httpx")
+
+
+def measure_import(module="main"):
+    """
+    Import `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: {name: (self_us, cumulative_us, depth)} for every imported module
+    """
+    env = dict(os.environ)
+    # Optional channels stay disabled, as on a machine without their config
+    env.pop("TELEGRAM_BOT_TOKEN", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to try (best run is reported)")
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Fail if import takes longer")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda modules: modules[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"import {args.module}: best {total_ms:.1f} ms over {args.runs} runs "
+          f"(worst {max(r[args.module][1] for r in runs) / 1000:.1f} ms)")
+    print("Slowest top-level imports:")
+    top_level = [(cum, name) for name, (_, cum, depth) in best.items() if depth == 1]
+    for cum, name in sorted(top_level, reverse=True)[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in best]
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark for long-term memory retrieval (memory/search.py).
+
+Builds a memory.db with millions of Telegram messages and thousands of
+summaries in a temporary directory, writing through the normal tables so
+the FTS triggers do the indexing, then times top-k retrieval and checks
+its recall against a plain scan of the conversation's own rows (a fast
+search that misses the student's matching memories is not a win).
+
+Usage:
+    python benchmarks/bench_memory_search.py --rows 2000000 --queries 500
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory import storage
+from memory.search import extract_terms, search_memory
+
+TOPICS = [
+    "business email", "job interview", "presentation", "meeting agenda", "travel plans",
+    "restaurant reservation", "weekend hobbies", "quarterly report", "negotiation", "small talk",
+]
+
+
+def make_vocabulary(size, seed):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+def build_database(rows, users, summaries, seed=42):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(20000, seed)
+    # Zipf-like word frequencies, like real chat text
+    weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+
+    def sentence(n):
+        words = rng.choices(vocabulary, cum_weights=weights, k=n)
+        return " ".join(words) + " " + rng.choice(TOPICS)
+
+    storage.init_database()
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    batch = 50000
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        count = min(batch, rows - offset)
+        conn.executemany(
+            "INSERT INTO telegram_messages (user_id, role, text) VALUES (?, ?, ?)",
+            [(rng.randrange(users), rng.choice(("user", "assistant")), sentence(rng.randint(5, 25)))
+             for _ in range(count)],
+        )
+        conn.commit()
+        print(f"  inserted {offset + count:,}/{rows:,} messages", end="\r")
+    conn.executemany(
+        "INSERT INTO conversation_summaries (session_date, message_count, summary, key_points, conversation) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [("2026-01-01", 20, sentence(40), '["%s", "%s"]' % (sentence(6), sentence(6)), f"telegram:{rng.randrange(users)}")
+         for _ in range(summaries)],
+    )
+    conn.commit()
+    conn.close()
+    elapsed = time.perf_counter() - start
+    print(f"\nBuilt {rows:,} messages + {summaries:,} summaries in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} rows/s incl. incremental indexing)")
+    return vocabulary, weights
+
+
+def own_matches(conn, user_id, message):
+    """Rows of the user's own conversation sharing a term with the message (ground truth)."""
+    terms = set(extract_terms(message))
+    texts = [row[0] for row in conn.execute("SELECT text FROM telegram_messages WHERE user_id = ?", (user_id,))]
+    for summary, key_points in conn.execute(
+            "SELECT summary, key_points FROM conversation_summaries WHERE conversation = ?", (f"telegram:{user_id}",)):
+        texts.extend([summary, key_points])
+    return sum(1 for text in texts if terms & set(extract_terms(text)))
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Telegram messages to store")
+    parser.add_argument("--users", type=int, default=5000, help="Distinct Telegram users")
+    parser.add_argument("--summaries", type=int, default=20000, help="Conversation summaries to store")
+    parser.add_argument("--queries", type=int, default=500, help="Retrieval queries to time")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "memory.db")
+        vocabulary, weights = build_database(args.rows, args.users, args.summaries)
+        size_mb = os.path.getsize(storage.DB_PATH) / 1e6
+        print(f"Database size: {size_mb:,.0f} MB")
+
+        rng = random.Random(7)
+        timings = []
+        hits = answerable = missed = 0
+        returned = expected = 0
+        conn = sqlite3.connect(storage.DB_PATH)
+        for _ in range(args.queries):
+            words = rng.choices(vocabulary, cum_weights=weights, k=rng.randint(4, 15))
+            message = " ".join(words) + " " + rng.choice(TOPICS) + "?"
+            user_id = rng.randrange(args.users)
+            start = time.perf_counter()
+            results = search_memory(message, f"telegram:{user_id}", limit=args.top_k)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += bool(results)
+
+            matches = own_matches(conn, user_id, message)
+            answerable += bool(matches)
+            missed += bool(matches) and not results
+            returned += len(results)
+            expected += min(args.top_k, matches)
+        conn.close()
+
+        print(f"Queries: {args.queries}, with results: {hits}, "
+              f"with matches in their own conversation: {answerable}, empty despite matches: {missed}")
+        print(f"Recall: {1 - missed / answerable if answerable else 1:.3f} of answerable queries, "
+              f"{returned / expected if expected else 1:.3f} of the top-{args.top_k} slots that could be filled")
+        print(f"Latency p50: {percentile(timings, 0.50):.2f} ms, "
+              f"p95: {percentile(timings, 0.95):.2f} ms, max: {max(timings):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark for concurrent /ws web sessions.
+
+Drives main.websocket_endpoint with in-process fake sockets (no network),
+each holding a multi-turn conversation; turns run on a ChannelRuntime
+with the web channel, as in the app. The LLM is replaced by a stub
+with a configurable delay, and memory.db lives in a temporary directory,
+so the numbers show the channel's own overhead under concurrency.
+
+Usage:
+    python benchmarks/bench_web_sessions.py --sockets 1000 --turns 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import WebSocketDisconnect
+
+import main
+from channels.runtime import ChannelRuntime
+from channels.web import WebSessionStore
+from memory import storage, async_storage
+
+
+class FakeWebSocket:
+    """Minimal stand-in for starlette's WebSocket, driven by a script of messages."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.query_params = {}
+        self.replies = asyncio.Queue()
+        self.turn_latencies = []
+        self._sent_at = None
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        # Wait for the previous turn's reply, like a person would
+        if self._sent_at is not None:
+            await self.replies.get()
+            self.turn_latencies.append(time.perf_counter() - self._sent_at)
+        if not self.messages:
+            raise WebSocketDisconnect()
+        self._sent_at = time.perf_counter()
+        return self.messages.pop(0)
+
+    async def send_text(self, text):
+        data = json.loads(text)
+        if data.get("role") == "bot" and self._sent_at is not None:
+            self.replies.put_nowait(data)
+
+    async def close(self, code=1000):
+        pass
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def run(sockets, turns):
+    fakes = [FakeWebSocket([f"Hello, this is message {t} from student {s}" for t in range(turns)])
+             for s in range(sockets)]
+    runtime = ChannelRuntime(main.handle_channel_message, workers=main.get_settings().channel_workers)
+    runtime.add_channel(main.web_channel)
+    await runtime.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(main.websocket_endpoint(ws) for ws in fakes))
+    elapsed = time.perf_counter() - start
+    await runtime.stop()
+    return fakes, elapsed
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Simulated generation time (s)")
+    parser.add_argument("--persist", action="store_true", help="Persist web sessions to memory.db")
+    args = parser.parse_args()
+
+    def fake_generate(*_args, **_kwargs):
+        if args.llm_delay:
+            time.sleep(args.llm_delay)
+        return "Nice! Tell me more about that."
+
+    main.generate_response = fake_generate
+    main.web_sessions = WebSessionStore(persist=args.persist)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = os.path.join(tmp, "memory.db")
+        storage.init_database()
+        # The pipeline logs every step; keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            fakes, elapsed = asyncio.run(run(args.sockets, args.turns))
+        async_storage.shutdown()
+
+    latencies = [lat * 1000 for ws in fakes for lat in ws.turn_latencies]
+    print(f"Sockets: {args.sockets}, turns each: {args.turns}, persist: {args.persist}, "
+          f"llm delay: {args.llm_delay * 1000:.0f} ms")
+    print(f"Completed turns: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:,.0f} turns/s)")
+    print(f"Turn latency p50: {percentile(latencies, 0.5):.1f} ms, p95: {percentile(latencies, 0.95):.1f} ms, "
+          f"max: {max(latencies):.1f} ms")
+    print(f"Sessions in store: {len(main.web_sessions.sessions)}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,329 @@
+"""
+Synthetic macOS Messages database (chat.db) for Linux benchmarks.
+
+Builds `message`, `handle`, `chat`, `chat_message_join` and
+`chat_handle_join` with the columns imessage/reader.py touches plus the
+ones Messages' own indexes cover, and the same indexes as a real chat.db
+(macOS 13/14). Dates use Apple's epoch (nanoseconds since 2001-01-01).
+Like Messages on macOS 13+, every message carries an `attributedBody`
+typedstream blob, and a share of them has `text` = NULL.
+
+Traffic is skewed like a real inbox: messages per handle follow a
+Zipf-like distribution, so handle rank 1 is a very busy conversation and
+most handles have only a handful of messages. A share of the messages
+goes to group chats, a share is attachments (only an object-replacement
+character in the blob) and a share has its text only in `attributedBody`.
+
+Usage:
+    python benchmarks/synthetic_chat_db.py /tmp/chat.db --messages 10000000 --handles 50000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import time
+
+APPLE_EPOCH = 978307200  # 2001-01-01 in Unix time
+GENERATOR_VERSION = 2     # Bumped when the generated data changes; cached databases are rebuilt
+
+SCHEMA = """
+CREATE TABLE handle (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+    id TEXT NOT NULL,
+    country TEXT,
+    service TEXT NOT NULL,
+    uncanonicalized_id TEXT,
+    person_centric_id TEXT,
+    UNIQUE (id, service)
+);
+
+CREATE TABLE chat (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    style INTEGER,
+    state INTEGER,
+    account_id TEXT,
+    chat_identifier TEXT,
+    service_name TEXT,
+    room_name TEXT,
+    account_login TEXT,
+    is_archived INTEGER DEFAULT 0,
+    last_addressed_handle TEXT,
+    display_name TEXT,
+    group_id TEXT,
+    is_filtered INTEGER DEFAULT 0,
+    last_read_message_timestamp INTEGER DEFAULT 0
+);
+
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    text TEXT,
+    replace INTEGER DEFAULT 0,
+    service_center TEXT,
+    handle_id INTEGER DEFAULT 0,
+    subject TEXT,
+    country TEXT,
+    attributedBody BLOB,
+    version INTEGER DEFAULT 0,
+    type INTEGER DEFAULT 0,
+    service TEXT,
+    account TEXT,
+    account_guid TEXT,
+    error INTEGER DEFAULT 0,
+    date INTEGER,
+    date_read INTEGER,
+    date_delivered INTEGER,
+    is_delivered INTEGER DEFAULT 0,
+    is_finished INTEGER DEFAULT 0,
+    is_emote INTEGER DEFAULT 0,
+    is_from_me INTEGER DEFAULT 0,
+    is_empty INTEGER DEFAULT 0,
+    is_delayed INTEGER DEFAULT 0,
+    is_auto_reply INTEGER DEFAULT 0,
+    is_prepared INTEGER DEFAULT 0,
+    is_read INTEGER DEFAULT 0,
+    is_system_message INTEGER DEFAULT 0,
+    is_sent INTEGER DEFAULT 0,
+    cache_has_attachments INTEGER DEFAULT 0,
+    other_handle INTEGER DEFAULT 0,
+    associated_message_guid TEXT DEFAULT NULL,
+    associated_message_type INTEGER DEFAULT 0,
+    expire_state INTEGER DEFAULT 0,
+    thread_originator_guid TEXT DEFAULT NULL
+);
+
+CREATE TABLE chat_handle_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    handle_id INTEGER REFERENCES handle (ROWID) ON DELETE CASCADE,
+    UNIQUE (chat_id, handle_id)
+);
+
+CREATE TABLE chat_message_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE,
+    message_date INTEGER DEFAULT 0,
+    PRIMARY KEY (chat_id, message_id)
+);
+"""
+
+# Created after the bulk load (much faster than maintaining them row by row)
+INDEXES = """
+CREATE INDEX chat_idx_chat_identifier_service_name ON chat (chat_identifier, service_name);
+CREATE INDEX chat_idx_is_archived ON chat (is_archived);
+CREATE INDEX chat_handle_join_idx_handle_id ON chat_handle_join (handle_id);
+CREATE INDEX chat_message_join_idx_message_id_only ON chat_message_join (message_id);
+CREATE INDEX chat_message_join_idx_message_date_id_chat_id ON chat_message_join (chat_id, message_date, message_id);
+CREATE INDEX message_idx_is_read ON message (is_read, is_from_me, is_finished);
+CREATE INDEX message_idx_failed ON message (is_finished, is_from_me, error);
+CREATE INDEX message_idx_handle ON message (handle_id, date);
+CREATE INDEX message_idx_handle_id ON message (handle_id);
+CREATE INDEX message_idx_cache_has_attachments ON message (cache_has_attachments);
+CREATE INDEX message_idx_expire_state ON message (expire_state);
+CREATE INDEX message_idx_other_handle ON message (other_handle);
+CREATE INDEX message_idx_associated_message ON message (associated_message_guid);
+CREATE INDEX message_idx_thread_originator_guid ON message (thread_originator_guid);
+CREATE INDEX message_idx_date ON message (date);
+"""
+
+WORDS = (
+    "i you we they the a an to of in on at for with about yesterday today tomorrow meeting email "
+    "office class tutor homework practice english grammar sentence question answer went goed bought "
+    "really very good great thanks sorry please maybe think want need call later morning evening "
+    "weekend project report client presentation interview coffee lunch dinner travel plan"
+).split()
+
+
+# NSAttributedString typedstream as written by Messages: class chain, the
+# UTF-8 string, then the attribute runs (one run covering the whole text)
+_BODY_HEADER = (b"\x04\x0bstreamtyped\x81\xe8\x03\x84\x01@\x84\x84\x84\x12NSAttributedString\x00"
+                b"\x84\x84\x08NSObject\x00\x85\x92")
+_BODY_STRING_CLASS = b"\x84\x84\x84\x08NSString\x01\x94\x84\x01+"
+_BODY_MUTABLE_STRING_CLASS = b"\x84\x84\x84\x0fNSMutableString\x01\x84\x84\x08NSString\x01\x95\x84\x01+"
+_BODY_ATTRIBUTES = (b"\x92\x84\x84\x84\x0cNSDictionary\x00\x94\x84\x01i\x01\x92\x84\x96\x96"
+                    b"\x1d__kIMMessagePartAttributeName\x86\x92\x84\x84\x84\x08NSNumber\x00"
+                    b"\x84\x84\x07NSValue\x00\x94\x84\x01*\x84\x99\x99\x00\x86\x86\x86")
+
+
+def _typedstream_int(value):
+    if value < 0x80:
+        return bytes([value])
+    if value < 0x8000:
+        return b"\x81" + value.to_bytes(2, "little")
+    return b"\x82" + value.to_bytes(4, "little")
+
+
+def encode_attributed_body(text, mutable=False):
+    """attributedBody blob for `text`, laid out like the ones in a real chat.db."""
+    data = text.encode("utf-8")
+    utf16_units = len(text.encode("utf-16-le")) // 2
+    return (_BODY_HEADER + (_BODY_MUTABLE_STRING_CLASS if mutable else _BODY_STRING_CLASS)
+            + _typedstream_int(len(data)) + data
+            + b"\x86\x84\x02iI\x01" + _typedstream_int(utf16_units) + _BODY_ATTRIBUTES)
+
+
+ATTACHMENT_BODY = encode_attributed_body("\ufffc")
+
+
+def handle_address(rank):
+    """Phone number for a handle rank (rank 1 is the busiest conversation)."""
+    return f"+8210{rank:08d}"
+
+
+def apple_time(unix_seconds):
+    return int((unix_seconds - APPLE_EPOCH) * 1_000_000_000)
+
+
+def build_chat_db(path, messages=1_000_000, handles=10_000, group_share=0.1, null_text_share=0.05,
+                  body_only_share=0.3, days=365, seed=42, batch=100_000, log=print):
+    """
+    Build a synthetic chat.db at `path` (overwritten).
+
+    Returns:
+        dict: scale and a few handles worth benchmarking (also written to `path + ".json"`)
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+    start = time.perf_counter()
+
+    # Handles and one 1:1 chat per handle (chat ROWID == handle ROWID)
+    conn.executemany(
+        "INSERT INTO handle (ROWID, id, country, service, uncanonicalized_id, person_centric_id) VALUES (?, ?, 'kr', ?, ?, NULL)",
+        ((rank, handle_address(rank), "SMS" if rank % 7 == 0 else "iMessage", handle_address(rank))
+         for rank in range(1, handles + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO chat (ROWID, guid, style, state, account_id, chat_identifier, service_name, account_login) "
+        "VALUES (?, ?, 45, 3, 'synthetic', ?, ?, 'E:me@example.com')",
+        ((rank, f"iMessage;-;{handle_address(rank)}", handle_address(rank), "iMessage") for rank in range(1, handles + 1)),
+    )
+    conn.executemany("INSERT INTO chat_handle_join (chat_id, handle_id) VALUES (?, ?)",
+                     ((rank, rank) for rank in range(1, handles + 1)))
+
+    # Group chats of 3-8 members; every handle's rank weight also drives group activity
+    group_count = max(1, handles // 50) if group_share > 0 else 0
+    groups = []
+    for g in range(group_count):
+        chat_id = handles + 1 + g
+        members = rng.sample(range(1, handles + 1), min(handles, rng.randint(3, 8)))
+        groups.append((chat_id, members))
+        conn.execute(
+            "INSERT INTO chat (ROWID, guid, style, state, account_id, chat_identifier, service_name, display_name) "
+            "VALUES (?, ?, 43, 3, 'synthetic', ?, 'iMessage', ?)",
+            (chat_id, f"iMessage;+;chat{chat_id}", f"chat{chat_id}", f"Group {g + 1}"),
+        )
+        conn.executemany("INSERT INTO chat_handle_join (chat_id, handle_id) VALUES (?, ?)",
+                         ((chat_id, member) for member in members))
+    conn.commit()
+
+    # Zipf-like conversation sizes
+    handle_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, handles + 1)))
+    handle_ranks = range(1, handles + 1)
+    first_date = time.time() - days * 86400
+    step = days * 86400 / max(1, messages)
+
+    for offset in range(0, messages, batch):
+        count = min(batch, messages - offset)
+        senders = rng.choices(handle_ranks, cum_weights=handle_weights, k=count)
+        message_rows = []
+        join_rows = []
+        for i, rank in enumerate(senders):
+            rowid = offset + i + 1
+            date = apple_time(first_date + rowid * step)
+            is_from_me = rng.random() < 0.5
+            if groups and rng.random() < group_share:
+                chat_id, members = groups[rank % len(groups)]
+                handle_id = 0 if is_from_me else rng.choice(members)
+            else:
+                chat_id, handle_id = rank, rank
+            if rng.random() < null_text_share:
+                # Attachment: no text, placeholder character in the blob
+                text, body = None, ATTACHMENT_BODY
+            else:
+                text = " ".join(rng.choices(WORDS, k=rng.randint(2, 14)))
+                body = encode_attributed_body(text)
+                if rng.random() < body_only_share:
+                    text = None
+            message_rows.append((
+                rowid, f"SYN-{rowid:012d}", text, body, handle_id, "iMessage", date,
+                date + 5_000_000_000 if not is_from_me else 0, date + 1_000_000_000,
+                int(is_from_me), 1, 1, 1, int(body is ATTACHMENT_BODY),
+            ))
+            join_rows.append((chat_id, rowid, date))
+        conn.executemany(
+            "INSERT INTO message (ROWID, guid, text, attributedBody, handle_id, service, date, date_read, "
+            "date_delivered, is_from_me, is_finished, is_sent, is_read, cache_has_attachments) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            message_rows,
+        )
+        conn.executemany("INSERT INTO chat_message_join (chat_id, message_id, message_date) VALUES (?, ?, ?)", join_rows)
+        conn.commit()
+        if log:
+            done = offset + count
+            log(f"  {done:,}/{messages:,} messages ({done / (time.perf_counter() - start):,.0f}/s)")
+
+    if log:
+        log("  Building indexes...")
+    conn.executescript(INDEXES)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+    meta = {
+        "messages": messages,
+        "handles": handles,
+        "group_share": group_share,
+        "null_text_share": null_text_share,
+        "body_only_share": body_only_share,
+        "generator_version": GENERATOR_VERSION,
+        "seed": seed,
+        "build_seconds": round(time.perf_counter() - start, 1),
+        "size_mb": round(os.path.getsize(path) / 1e6, 1),
+        # Busiest, a mid-ranked and a long-tail conversation
+        "sample_handles": {
+            "busiest": handle_address(1),
+            "mid": handle_address(max(1, handles // 100)),
+            "tail": handle_address(handles),
+        },
+    }
+    with open(path + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_meta(path):
+    """Metadata written next to a generated database, or None."""
+    try:
+        with open(path + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--handles", type=int, default=10_000)
+    parser.add_argument("--group-share", type=float, default=0.1)
+    parser.add_argument("--null-text-share", type=float, default=0.05)
+    parser.add_argument("--body-only-share", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    meta = build_chat_db(args.path, args.messages, args.handles, args.group_share, args.null_text_share,
+                         args.body_only_share, seed=args.seed)
+    print(json.dumps(meta, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,11 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import AsyncGenerator, Optional, Tuple
+from typing import AsyncGenerator, List, Optional, Tuple
 
 class BaseChannel(ABC):
     """
     Abstract base class for all communication channels (iMessage, Terminal, etc.).
+    Channels are run by channels.runtime.ChannelRuntime.
     """
 
+    # Service name passed to the pipeline unless a message's metadata says otherwise
+    name = "base"
+
     @abstractmethod
     async def connect(self):
         """
@@ -24,10 +28,10 @@ class BaseChannel(ABC):
     async def listen(self) -> AsyncGenerator[Tuple[str, str, dict], None]:
         """
         Async generator that yields new messages.
-        
+
         Yields:
             Tuple[str, str, dict]: (sender_id, text, metadata)
-            
+
             - sender_id: Unique identifier for the sender (e.g., phone number)
             - text: The message content
             - metadata: Additional context (e.g., service type, message ID, raw object)
@@ -38,7 +42,7 @@ class BaseChannel(ABC):
     async def send(self, target: str, message: str, metadata: Optional[dict] = None):
         """
         Send a message to the target.
-        
+
         Args:
             target: The recipient identifier (matches sender_id from listen)
             message: The text to send
@@ -52,3 +56,23 @@ class BaseChannel(ABC):
         Simulate typing activity for the target.
         """
         pass
+
+    async def history(self, sender_id: str, metadata: dict) -> Optional[List[dict]]:
+        """
+        Conversation history for the pipeline ([{'role': ..., 'content': ...}]),
+        read when the message is processed. None lets the pipeline load it itself.
+        """
+        return metadata.get("history")
+
+    async def done(self, sender_id: str, metadata: dict):
+        """
+        Called once the pipeline has finished with a message (successfully or not),
+        e.g. to advance a persisted cursor.
+        """
+        pass
+
+    async def close(self):
+        """
+        Release connections on shutdown.
+        """
+        pass
@@ -1,93 +1,217 @@
 import asyncio
-from typing import AsyncGenerator, Tuple, Optional
+import time
+from typing import AsyncGenerator, Callable, List, Optional, Tuple
 from channels.base import BaseChannel
-from imessage.reader import get_db_connection, get_last_message_rowid, get_new_messages
-from imessage.manager import MessageManager
+from imessage.reader import get_db_connection, get_inbox_rowid, resolve_handles, get_new_messages_for_handles, get_conversation_history
+from imessage.manager import message_manager, MessagePriority
+from imessage.catchup import cursor_source, backlog_source, read_backlog, coalesce_backlog
+from imessage import catchup
 from imessage.typer import simulate_typing_activity
+from memory import async_storage
+from state.context import contexts
+from state.deadline import TurnDeadline
+
+POLL_INTERVAL = 1.0            # Seconds between chat.db polls
+HANDLE_REFRESH_INTERVAL = 60   # Seconds between re-reading chat.db handles for watched addresses
+INBOX_LIMIT = 64               # Messages read from chat.db but not yet taken by the runtime
+HISTORY_LIMIT = 20
 
 class IMessageChannel(BaseChannel):
     """
     Adapter for iMessage/SMS communication on macOS.
+
+    One chat.db query per poll covers every watched address. The shared
+    cursor in memory.db only moves past a message once the runtime has
+    finished its turn (see done()), so a crash mid-turn replays it as backlog.
     """
-    def __init__(self, target_phone: str):
-        self.target_phone = target_phone
-        self.manager = MessageManager()
-        self.last_seen_rowid = 0
+    name = "iMessage"
+
+    def __init__(self, addresses: Callable[[], List[str]]):
+        """
+        Args:
+            addresses: Returns the phone numbers/emails to answer (re-read with the handles)
+        """
+        self.addresses = addresses
         self.conn = None
-        self.running = False
+        self.handles = {}
+        self.handles_resolved_at = 0.0
+        # Highest rowid read. Kept here, not in the contexts' last_seen_rowid,
+        # which turns set to their own rowid and may run behind the poll.
+        self.last_rowid = 0
+        self.inbox = asyncio.Queue(maxsize=INBOX_LIMIT)
+        self.pending = set()         # Rowids handed out and not yet done
+        self.answered = set()        # Addresses that had a live turn since startup
+        self.backlog = None          # (after, until) rowids of messages that came in while down
+        self.backlog_turns = 0       # Catch-up turns handed out and not yet done
+        self.backlog_drained = asyncio.Event()
+        self.tasks = []
 
     async def connect(self):
-        """Connects to chat.db and starts the message manager."""
-        print(f"Connecting to iMessage (Target: {self.target_phone})...")
+        """Open chat.db, resolve the watched handles and restore the cursor."""
         self.conn = get_db_connection()
-        
-        if self.conn:
-            try:
-                self.last_seen_rowid = get_last_message_rowid(self.conn, self.target_phone)
-                print(f"IMessageChannel connected. Initial Last Row ID: {self.last_seen_rowid}")
-            except Exception as e:
-                print(f"Error fetching last row ID: {e}")
-        
-        # Start the background manager for sending
-        asyncio.create_task(self.manager.start())
-        self.running = True
+        if not self.conn:
+            raise ConnectionError("chat.db not available")
+
+        addresses = await asyncio.to_thread(self.addresses)
+        self.refresh_handles(addresses)
+        print(f"[iMessage] Watching {len(addresses)} addresses ({len(self.handles)} chat.db handles)")
+
+        # One cursor for every watched handle: each poll is a single ROWID-range query
+        last_rowid = self.last_rowid = get_inbox_rowid(self.conn)
+        print(f"[iMessage] Initial Last Row ID: {last_rowid}")
+
+        # Messages after the saved cursor (or an unfinished catch-up) came in while we were down.
+        # Single-number setups saved a per-handle cursor (for TARGET_PHONE_NUMBER, listed
+        # first) before the shared one existed.
+        legacy_key = cursor_source(addresses[0]) if addresses else None
+        saved = [await async_storage.load_poll_cursor(cursor_source()),
+                 await async_storage.load_poll_cursor(backlog_source())]
+        if legacy_key:
+            saved.append(await async_storage.load_poll_cursor(legacy_key))
+        saved = [rowid for rowid in saved if rowid is not None]
+        await async_storage.save_poll_cursor(cursor_source(), last_rowid)
+        if legacy_key:
+            await async_storage.delete_poll_cursor(legacy_key)
+        if saved and min(saved) < last_rowid:
+            self.backlog = (min(saved), last_rowid)
+            print(f"[Catch-up] Backlog after row {self.backlog[0]} (live polling resumes at {last_rowid})")
+            await async_storage.save_poll_cursor(backlog_source(), self.backlog[0])
+
+    def refresh_handles(self, addresses=None):
+        # New contacts get a handle row the first time they write
+        if addresses is None:
+            addresses = self.addresses()
+        self.handles = resolve_handles(self.conn, addresses)
+        self.handles_resolved_at = time.monotonic()
 
     async def status(self) -> str:
         return "connected" if self.conn else "disconnected"
 
     async def listen(self) -> AsyncGenerator[Tuple[str, str, dict], None]:
         """
-        Polls chat.db for new messages.
-        Yields: (sender_id, text, metadata={service, is_from_me, rowid})
+        Polls chat.db for new messages (and replays the backlog, paced).
+        Yields: (address, text, metadata={service, rowid, conn, user_id, deadline})
         """
-        if not self.conn:
-             print("Reconnecting to DB...")
-             self.conn = get_db_connection()
-             if not self.conn:
-                 await asyncio.sleep(5)
-                 return
-
-        print(f"Started listening on iMessage for {self.target_phone}...")
-        while self.running:
+        self.tasks = [asyncio.create_task(self.poll())]
+        if self.backlog:
+            self.tasks.append(asyncio.create_task(self.catch_up(*self.backlog)))
+        try:
+            while True:
+                yield await self.inbox.get()
+        finally:
+            for task in self.tasks:
+                task.cancel()
+
+    async def poll(self):
+        print("[iMessage] Polling chat.db...")
+        while True:
             try:
-                # get_new_messages returns [(rowid, text, service), ...] 
-                # Note: I verified in debug steps that is_from_me was NOT in the tuple in reader.py, 
-                # but I did remove the WHERE clause filter.
-                # Let's double check reader.py content. 
-                # If I only removed the filter, the SELECT count is 3: ROWID, text, service.
-                
-                new_msgs = get_new_messages(self.conn, self.target_phone, self.last_seen_rowid)
-                
-                for rowid, text, service in new_msgs:
-                    # Update local cursor immediately to avoid re-reading
-                    self.last_seen_rowid = max(self.last_seen_rowid, rowid)
-                    
-                    # Yield message
-                    # We might want to add is_from_me to the SELECT in reader.py if we need it here,
-                    # but for now, rely on previous logic. 
-                    # Wait, if I want to distinguish "from me", I should add it to reader.py officially.
-                    # But if I stick to current reader.py:
-                    yield (self.target_phone, text, {"service": service, "rowid": rowid})
-                    
+                if time.monotonic() - self.handles_resolved_at > HANDLE_REFRESH_INTERVAL:
+                    self.refresh_handles()
+
+                # Poll for new messages from every watched handle at once
+                new_msgs = get_new_messages_for_handles(self.conn, self.handles, self.last_rowid)
+                if new_msgs:
+                    print(f"[iMessage] Found {len(new_msgs)} new messages")
+
+                    # New user message detected - interrupt pending responses
+                    if contexts.is_any_busy():
+                        cleared = message_manager.clear_pending_messages()
+                        if cleared > 0:
+                            print(f"[Interrupt] Cleared {cleared} pending messages due to new user input")
+
+                    for rowid, address, text, service in new_msgs:
+                        # Text-less rows (attachments, reactions) only move the cursor
+                        if not text:
+                            continue
+                        self.pending.add(rowid)
+                        self.answered.add(address)
+                        # The turn's latency budget starts when the message is read, so
+                        # the wait for a runtime worker counts against it
+                        await self.inbox.put((address, text, {
+                            "service": service, "rowid": rowid, "conn": self.conn, "user_id": address,
+                            "deadline": TurnDeadline(),
+                        }))
+
+                    self.last_rowid = new_msgs[-1][0]
+                    await self.save_cursor()
             except Exception as e:
-                print(f"IMessage listen error: {e}")
-                
-            await asyncio.sleep(1)
+                print(f"[iMessage] Poll error: {e}")
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def catch_up(self, after_rowid, until_rowid):
+        """
+        Hand out one coalesced turn per student for messages that arrived while
+        the bot was down. Paced, and waits for live turns to finish first.
+        """
+        backlog, total = await read_backlog(self.conn, self.handles, after_rowid, until_rowid)
+        if backlog:
+            print(f"[Catch-up] {total} messages from {len(backlog)} students arrived while offline")
+        for address, rows in backlog.items():
+            turn = coalesce_backlog(rows)
+            if not turn:
+                continue
+            await catchup.catchup_pacer.wait(contexts.is_any_busy)
+            if address in self.answered:
+                # A live turn already answered with the full history, backlog included
+                print(f"[Catch-up] {address}: superseded by live messages")
+                continue
+            _, service, text = turn
+            self.backlog_turns += 1
+            self.backlog_drained.clear()
+            await self.inbox.put((address, text, {
+                "service": service, "conn": self.conn, "user_id": address, "backlog": True,
+                "deadline": TurnDeadline(),
+            }))
+        if self.backlog_turns:
+            await self.backlog_drained.wait()
+        await async_storage.delete_poll_cursor(backlog_source())
+        self.backlog = None
+        print("[Catch-up] Done")
+
+    async def save_cursor(self):
+        """Persist the cursor up to (not past) the oldest message still being answered."""
+        rowid = min(self.pending) - 1 if self.pending else self.last_rowid
+        await async_storage.save_poll_cursor(cursor_source(), rowid)
+
+    async def history(self, sender_id: str, metadata: dict) -> Optional[List[dict]]:
+        """Live turns read history from chat.db in the pipeline; catch-up turns get it here."""
+        if not metadata.get("backlog"):
+            return None
+        return [{"role": "assistant" if is_from_me else "user", "content": msg_text}
+                for is_from_me, msg_text in get_conversation_history(self.conn, sender_id, limit=HISTORY_LIMIT)]
+
+    async def done(self, sender_id: str, metadata: dict):
+        if metadata.get("backlog"):
+            self.backlog_turns -= 1
+            if not self.backlog_turns:
+                self.backlog_drained.set()
+            return
+        self.pending.discard(metadata.get("rowid"))
+        await self.save_cursor()
 
     async def send(self, target: str, message: str, metadata: Optional[dict] = None):
         """
-        Queues the message for sending via MessageManager.
+        Queues the message for sending via the global MessageManager.
         """
         service = "iMessage"
         if metadata and "service" in metadata:
             service = metadata["service"]
-            
-        self.manager.add_message(target, message, service)
+
+        message_manager.add_message(target, message, service=service, priority=MessagePriority.HIGH)
 
     async def typing(self, target: str):
         """
         Triggers the typing indicator simulation.
         """
-        # Note: MessageManager already does this based on delay, 
+        # Note: MessageManager already does this based on delay,
         # but this allows explicit control if needed.
         await asyncio.to_thread(simulate_typing_activity, target)
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.conn:
+            self.conn.close()
+            self.conn = None
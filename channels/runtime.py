@@ -0,0 +1,173 @@
+"""
+Channel runtime.
+
+Runs any number of BaseChannel implementations: each channel's listen()
+stream is fanned into bounded per-conversation queues, and a fixed pool of
+worker tasks runs the shared pipeline on them.
+
+- Messages of one conversation are processed one at a time, in order.
+- Conversations are served round-robin, one message per turn, so a busy
+  student cannot starve the others.
+- When a conversation has CONVERSATION_QUEUE_LIMIT messages waiting, its
+  next messages are folded into its last waiting turn (backpressure for
+  that sender only) instead of buffering without bound. The channel's
+  listener never waits, so other conversations keep flowing.
+
+Adding a channel means implementing BaseChannel and calling add_channel().
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from channels.base import BaseChannel
+
+CONVERSATION_QUEUE_LIMIT = 8   # Waiting turns per conversation before new messages are folded in
+RUNTIME_WORKERS = 16           # Turns processed concurrently across all conversations
+LISTEN_RETRY_DELAY = 5.0       # Seconds before restarting a listen() stream that failed
+
+# pipeline(channel, sender_id, text, metadata)
+Pipeline = Callable[[BaseChannel, str, str, dict], Awaitable[None]]
+
+
+class Conversation:
+    """Pending messages of one (channel, sender) pair."""
+
+    __slots__ = ("channel", "sender_id", "queue", "scheduled")
+
+    def __init__(self, channel: BaseChannel, sender_id):
+        self.channel = channel
+        self.sender_id = sender_id
+        self.queue = deque()      # (text, metadata, enqueued_at, metadata of folded-in messages)
+        self.scheduled = False    # In the ready queue or being processed
+
+
+class ChannelRuntime:
+    """
+    Fan-in of channel streams into per-conversation queues, drained by a worker pool.
+
+    Args:
+        pipeline: Async callable run for every message
+        workers: Number of worker tasks
+        queue_limit: Maximum waiting turns per conversation
+    """
+
+    def __init__(self, pipeline: Pipeline, workers: int = RUNTIME_WORKERS,
+                 queue_limit: int = CONVERSATION_QUEUE_LIMIT):
+        self.pipeline = pipeline
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.channels: List[BaseChannel] = []
+        self.conversations: Dict[tuple, Conversation] = {}
+        self.ready: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.active = 0
+        self.stats = {"received": 0, "processed": 0, "failed": 0, "coalesced": 0, "max_wait_ms": 0.0}
+
+    def add_channel(self, channel: BaseChannel):
+        self.channels.append(channel)
+        if self.tasks:
+            # Already running: connect and listen right away
+            self.tasks.append(asyncio.create_task(self._run_channel(channel)))
+
+    async def start(self):
+        """Start the worker pool, then connect every channel and start listening."""
+        self.ready = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        for channel in self.channels:
+            self.tasks.append(asyncio.create_task(self._run_channel(channel)))
+        print(f"[Runtime] Started {self.workers} workers for {len(self.channels)} channels")
+
+    async def submit(self, channel: BaseChannel, sender_id, text: str, metadata: Optional[dict] = None):
+        """
+        Queue a message for its conversation. Never waits: once the conversation
+        has `queue_limit` turns waiting, the message is folded into the last one
+        (texts joined, newest metadata; every message is still acknowledged).
+        """
+        key = (channel.name, sender_id)
+        conversation = self.conversations.get(key)
+        if conversation is None:
+            conversation = self.conversations[key] = Conversation(channel, sender_id)
+
+        self.stats["received"] += 1
+        if len(conversation.queue) >= self.queue_limit:
+            last_text, last_metadata, enqueued_at, folded = conversation.queue.pop()
+            self.stats["coalesced"] += 1
+            conversation.queue.append((f"{last_text}\n{text}", metadata or {}, enqueued_at, folded + [last_metadata]))
+            return
+
+        conversation.queue.append((text, metadata or {}, time.monotonic(), []))
+        if not conversation.scheduled:
+            conversation.scheduled = True
+            self.ready.put_nowait(conversation)
+
+    async def _run_channel(self, channel: BaseChannel):
+        try:
+            await channel.connect()
+        except Exception as e:
+            print(f"[Runtime] {channel.name} failed to connect: {e}")
+            return
+
+        while True:
+            try:
+                async for sender_id, text, metadata in channel.listen():
+                    await self.submit(channel, sender_id, text, metadata)
+                print(f"[Runtime] {channel.name} stopped listening")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Runtime] {channel.name} listen error: {e}")
+                await asyncio.sleep(LISTEN_RETRY_DELAY)
+
+    async def _worker(self):
+        while True:
+            conversation = await self.ready.get()
+            text, metadata, enqueued_at, folded = conversation.queue.popleft()
+            wait_ms = (time.monotonic() - enqueued_at) * 1000
+            self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], round(wait_ms, 1))
+
+            self.active += 1
+            try:
+                await self.pipeline(conversation.channel, conversation.sender_id, text, metadata)
+                self.stats["processed"] += 1
+            except Exception as e:
+                print(f"[Runtime] {conversation.channel.name} turn for {conversation.sender_id} failed: {e}")
+                self.stats["failed"] += 1
+            finally:
+                self.active -= 1
+                for handled in folded + [metadata]:
+                    try:
+                        await conversation.channel.done(conversation.sender_id, handled)
+                    except Exception as e:
+                        print(f"[Runtime] {conversation.channel.name} done() failed: {e}")
+
+            if conversation.queue:
+                # Back of the line: other conversations get a turn first
+                self.ready.put_nowait(conversation)
+            else:
+                conversation.scheduled = False
+                self.conversations.pop((conversation.channel.name, conversation.sender_id), None)
+
+    def metrics(self) -> dict:
+        return {
+            "channels": [channel.name for channel in self.channels],
+            "workers": self.workers,
+            "active": self.active,
+            "conversations": len(self.conversations),
+            "queued": sum(len(c.queue) for c in self.conversations.values()),
+            **self.stats,
+        }
+
+    async def stop(self):
+        """Cancel listeners and workers (queued messages are dropped), then close channels."""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for channel in self.channels:
+            try:
+                await channel.close()
+            except Exception as e:
+                print(f"[Runtime] Error closing {channel.name}: {e}")
@@ -1,18 +1,38 @@
-import os
 import asyncio
+import hmac
+import secrets
+from typing import AsyncGenerator, List, Optional, Tuple
 from telegram import Update
 from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes
-from memory.storage import save_telegram_message, get_telegram_history
-from dotenv import load_dotenv
+from memory import async_storage
+from channels.base import BaseChannel
+from channels.telegram_outbox import TelegramOutbox
+from state.deadline import TurnDeadline
+from config import get_settings
 
-load_dotenv()
+INBOX_LIMIT = 64     # Received messages not yet taken by the runtime
+HISTORY_LIMIT = 20
 
-class TelegramBot:
-    def __init__(self, process_message_callback):
-        self.token = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.process_message_callback = process_message_callback
+class TelegramBot(BaseChannel):
+    """
+    Telegram channel. Updates arrive by webhook or polling and are handed
+    to the channel runtime through listen().
+    """
+    name = "Telegram"
+
+    def __init__(self):
+        settings = get_settings()
+        self.token = settings.telegram_bot_token
+        # Webhook mode is used when a public URL is configured; otherwise we poll
+        self.webhook_url = settings.telegram_webhook_url
+        self.webhook_secret = settings.telegram_webhook_secret
         self.application = None
+        # Filled by handle_message; a full inbox holds back the update handlers
+        self.inbox = asyncio.Queue(maxsize=INBOX_LIMIT)
+        # Paces and rate-limits outgoing replies per chat and globally
+        self.outbox = TelegramOutbox()
         self.running = False
+        self.mode = None  # "webhook" or "polling" once started
 
     async def initialize(self):
         """Initialize the Telegram Application."""
@@ -22,7 +42,8 @@ class TelegramBot:
             return
 
         print("[Telegram] Building application...")
-        self.application = ApplicationBuilder().token(self.token).build()
+        # concurrent_updates lets one slow conversation not block the others
+        self.application = ApplicationBuilder().token(self.token).concurrent_updates(True).build()
 
         # Add handlers
         self.application.add_handler(CommandHandler("start", self.start_command))
@@ -47,13 +68,127 @@ class TelegramBot:
         # We use updater.start_polling() 
         # Note: drop_pending_updates=True might be safer for testing
         await self.application.updater.start_polling()
+        self.mode = "polling"
         print("[Telegram] Polling started.")
 
+    async def start_webhook(self):
+        """
+        Register our webhook with Telegram and start processing updates.
+        Updates are then delivered by the FastAPI route in main.py.
+        Falls back to polling if no URL is configured or registration fails.
+        """
+        if not self.application:
+            print("[Telegram] Application not initialized, skipping webhook.")
+            return
+
+        if not self.webhook_url:
+            print("[Telegram] TELEGRAM_WEBHOOK_URL not set, falling back to polling.")
+            await self.start_polling()
+            return
+
+        if not self.webhook_secret:
+            # Never accept unverified updates: register a random secret for this run
+            self.webhook_secret = secrets.token_urlsafe(32)
+            print("[Telegram] TELEGRAM_WEBHOOK_SECRET not set, using a random secret for this run.")
+
+        try:
+            await self.application.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        except Exception as e:
+            print(f"[Telegram] Error setting webhook: {e}. Falling back to polling.")
+            await self.start_polling()
+            return
+
+        self.running = True
+        await self.application.start()
+        self.mode = "webhook"
+        print(f"[Telegram] Webhook set: {self.webhook_url}")
+
+    async def connect(self):
+        """Initialize the Application and start receiving updates."""
+        await self.initialize()
+        if not self.application:
+            raise ConnectionError("TELEGRAM_BOT_TOKEN not set")
+        if self.webhook_url:
+            await self.start_webhook()
+        else:
+            await self.start_polling()
+
+    async def status(self) -> str:
+        return self.mode or "disconnected"
+
+    async def listen(self) -> AsyncGenerator[Tuple[str, str, dict], None]:
+        """
+        Yields received messages.
+        Yields: (user_id, text, metadata={service, message, deadline, user_id, message_id})
+        """
+        while True:
+            yield await self.inbox.get()
+
+    async def history(self, sender_id, metadata: dict) -> Optional[List[dict]]:
+        # Up to and ending with this turn's own message (saved when it arrived); later
+        # messages of the student are answered in their own turns
+        return await async_storage.get_telegram_history(sender_id, limit=HISTORY_LIMIT,
+                                                        until_id=metadata.get("message_id"))
+
+    async def send(self, target, message: str, metadata: Optional[dict] = None):
+        """Reply to the received message (metadata["message"]) via the rate-limited outbox."""
+        incoming = metadata["message"]
+
+        async def deliver():
+            print(f"[Telegram] Sending reply chunk: {message[:20]}...")
+            await incoming.reply_text(message)
+            if metadata.get("deadline"):
+                metadata["deadline"].check("delivery")
+            # Save bot response once it has actually been sent
+            await async_storage.save_telegram_message(target, "assistant", message)
+
+        deadline = metadata.get("deadline")
+        # Paced per turn from the moment the student's message arrived
+        self.outbox.submit(incoming.chat_id, message, deliver, turn=metadata.get("message_id"),
+                           started_at=deadline.started_at if deadline else None)
+
+    async def typing(self, target):
+        await self.application.bot.send_chat_action(chat_id=target, action="typing")
+
+    async def close(self):
+        await self.stop()
+
+    def verify_secret(self, token):
+        """
+        Check the X-Telegram-Bot-Api-Secret-Token header of a webhook request.
+
+        Returns:
+            bool: True if the request may be processed (never without a secret)
+        """
+        if not self.webhook_secret:
+            return False
+        return hmac.compare_digest(token or "", self.webhook_secret)
+
+    async def process_webhook_update(self, data):
+        """
+        Feed a raw webhook payload into the Application.
+        The update is queued and handled concurrently by the Application,
+        so the HTTP request returns without waiting for the reply.
+
+        Args:
+            data: Decoded JSON body of the webhook request
+        """
+        if not self.application:
+            raise RuntimeError("Telegram application not initialized")
+        update = Update.de_json(data, self.application.bot)
+        await self.application.update_queue.put(update)
+
     async def stop(self):
         """Stop the bot."""
+        await self.outbox.stop()
         if self.application:
             print("[Telegram] Stopping bot...")
-            await self.application.updater.stop()
+            if self.application.updater and self.application.updater.running:
+                await self.application.updater.stop()
             await self.application.stop()
             await self.application.shutdown()
             self.running = False
@@ -62,24 +197,17 @@ class TelegramBot:
         await update.message.reply_text("Hello! I am RingleBot. How can I help you today?")
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # The turn's latency budget starts when the update arrives
+        deadline = TurnDeadline()
         print(f"[Telegram] Received message: {update.message.text} from {update.effective_user.id}")
         user_id = update.effective_user.id
         text = update.message.text
         
         # Save user message
-        save_telegram_message(user_id, "user", text)
-        
-        # Define callback to send chunks back
-        async def reply_callback(chunk):
-            print(f"[Telegram] Sending reply chunk: {chunk[:20]}...")
-            await update.message.reply_text(chunk)
-            # Save bot response
-            save_telegram_message(user_id, "assistant", chunk)
-
-        # Retrieve history
-        history = get_telegram_history(user_id, limit=20)
+        message_id = await async_storage.save_telegram_message(user_id, "user", text)
         
-        # Pass to main pipeline
-        # Note: We don't need 'conn' (iMessage DB) here, so we pass None
-        # We assume process_message_callback handles the logic
-        await self.process_message_callback(text, "Telegram", None, reply_callback, history=history)
+        # Processed by the channel runtime (see listen)
+        await self.inbox.put((user_id, text, {
+            "service": "Telegram", "message": update.message, "deadline": deadline, "user_id": user_id,
+            "message_id": message_id,
+        }))
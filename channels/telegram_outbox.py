@@ -0,0 +1,244 @@
+import asyncio
+import time
+from collections import deque
+from telegram.error import RetryAfter
+from ai.utils import calculate_chunk_delay
+from imessage.manager import ChunkPacer
+
+# Telegram's documented limits: about 1 message/sec into a single chat and
+# about 30 messages/sec across all chats for one bot.
+PER_CHAT_RATE = 1.0
+PER_CHAT_BURST = 1
+GLOBAL_RATE = 30.0
+GLOBAL_BURST = 30
+MAX_RETRIES = 3
+CHAT_IDLE_TTL = 30 * 60  # Seconds before an idle chat's bucket, stats and pacing are dropped
+PRUNE_INTERVAL = 60      # Seconds between idle-chat sweeps
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` stored."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self):
+        """Seconds until one token is available (0 if available now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class TelegramOutbox:
+    """
+    Outbound scheduler for Telegram replies.
+
+    Each chat gets its own FIFO drained by a short-lived worker task, so
+    chunks stay in order within a chat while chats proceed independently.
+    Before sending, a chunk waits for what is left of its natural typing
+    delay (a ChunkPacer, as in MessageManager: generation time since the
+    user's message counts towards it), then for a token from both its chat
+    bucket and the global bucket. RetryAfter (flood wait) errors pause the
+    chat for the requested time and retry.
+    """
+
+    def __init__(self, per_chat_rate=PER_CHAT_RATE, per_chat_burst=PER_CHAT_BURST,
+                 global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST, pacing=calculate_chunk_delay):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.pacer = ChunkPacer(delay=pacing)
+        self.chat_buckets = {}
+        self.queues = {}   # chat_id -> deque of (enqueued_at, text, deliver, turn)
+        self.workers = {}  # chat_id -> asyncio.Task
+        self.stats = {}    # chat_id -> delivery/queueing stats
+        self.idle_since = {}  # chat_id -> time.monotonic() when its queue last drained
+        self.pruned_at = time.monotonic()
+        self.evicted = 0
+        self.totals = {"sent": 0, "failed": 0, "retry_after": 0}  # Not reset by eviction
+
+    def submit(self, chat_id, text, deliver, turn=None, started_at=None):
+        """
+        Queue a chunk for delivery.
+
+        Args:
+            chat_id: Telegram chat id (ordering and rate limits are per chat)
+            text: Chunk text (used for pacing)
+            deliver: Async callable with no arguments that sends the chunk
+            turn: Id of the turn the chunk answers (e.g. its message id); None
+                paces the chunk with its full delay
+            started_at: time.monotonic() when the turn's message arrived
+                (its TurnDeadline.started_at; default: now)
+        """
+        self.prune()
+        self.idle_since.pop(chat_id, None)
+        if turn is not None and not self.pacer.in_turn(chat_id, turn):
+            self.pacer.start_turn(chat_id, turn, started_at)
+        self.pacer.queued(chat_id, turn)
+        queue = self.queues.setdefault(chat_id, deque())
+        queue.append((time.monotonic(), text, deliver, turn))
+        self._chat_stats(chat_id)["pending"] = len(queue)
+
+        if chat_id not in self.workers:
+            self.workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+
+    async def _drain(self, chat_id):
+        queue = self.queues[chat_id]
+        try:
+            while queue:
+                enqueued_at, text, deliver, turn = queue.popleft()
+                self._chat_stats(chat_id)["pending"] = len(queue)
+
+                pacing = self.pacer.wait_time(chat_id, turn, text)
+                if pacing > 0:
+                    await asyncio.sleep(pacing)
+                await self._acquire(chat_id)
+
+                if await self._deliver(chat_id, deliver):
+                    self.pacer.sent(chat_id, turn)
+                    # Queueing delay = time waiting beyond the intended typing delay
+                    self._record_delay(chat_id, time.monotonic() - enqueued_at - pacing)
+        finally:
+            self.queues.pop(chat_id, None)
+            self.workers.pop(chat_id, None)
+            self.idle_since[chat_id] = time.monotonic()
+
+    def prune(self, now=None):
+        """
+        Forget chats idle for longer than CHAT_IDLE_TTL (their bucket would be
+        full again anyway). Sweeps at most every PRUNE_INTERVAL seconds.
+
+        Returns:
+            int: Chats evicted
+        """
+        now = now if now is not None else time.monotonic()
+        if now - self.pruned_at < PRUNE_INTERVAL:
+            return 0
+        self.pruned_at = now
+        expired = [chat_id for chat_id, since in self.idle_since.items()
+                   if now - since > CHAT_IDLE_TTL and chat_id not in self.workers]
+        for chat_id in expired:
+            del self.idle_since[chat_id]
+            self.chat_buckets.pop(chat_id, None)
+            self.stats.pop(chat_id, None)
+            self.pacer.turns.pop(chat_id, None)
+        self.evicted += len(expired)
+        return len(expired)
+
+    async def _acquire(self, chat_id):
+        """Wait until both the chat bucket and the global bucket have a token."""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+
+        while True:
+            wait = max(bucket.wait_time(), self.global_bucket.wait_time())
+            if wait <= 0:
+                bucket.consume()
+                self.global_bucket.consume()
+                return
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, chat_id, deliver):
+        """Send with flood-wait handling. Returns True if the chunk was sent."""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                await deliver()
+                self._count(chat_id, "sent")
+                return True
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if hasattr(retry_after, "total_seconds"):
+                    retry_after = retry_after.total_seconds()
+                self._count(chat_id, "retry_after")
+                print(f"[TelegramOutbox] Flood wait for chat {chat_id}: retrying in {retry_after}s (attempt {attempt + 1})")
+                await asyncio.sleep(retry_after)
+            except Exception as e:
+                print(f"[TelegramOutbox] Failed to send to chat {chat_id}: {e}")
+                self._count(chat_id, "failed")
+                return False
+
+        print(f"[TelegramOutbox] Giving up on chat {chat_id} after {MAX_RETRIES} retries")
+        self._count(chat_id, "failed")
+        return False
+
+    def _count(self, chat_id, key):
+        self._chat_stats(chat_id)[key] += 1
+        self.totals[key] += 1
+
+    def _chat_stats(self, chat_id):
+        stats = self.stats.get(chat_id)
+        if stats is None:
+            stats = self.stats[chat_id] = {
+                "pending": 0,
+                "sent": 0,
+                "failed": 0,
+                "retry_after": 0,
+                "last_queue_delay": 0.0,
+                "max_queue_delay": 0.0,
+                "total_queue_delay": 0.0,
+            }
+        return stats
+
+    def _record_delay(self, chat_id, delay):
+        stats = self._chat_stats(chat_id)
+        delay = max(delay, 0.0)
+        stats["last_queue_delay"] = delay
+        stats["max_queue_delay"] = max(stats["max_queue_delay"], delay)
+        stats["total_queue_delay"] += delay
+
+    def get_queue_status(self):
+        """
+        Get per-chat queueing stats.
+
+        Returns:
+            dict: chat_id -> {pending, sent, failed, retry_after,
+                  last_queue_delay, max_queue_delay, avg_queue_delay}
+        """
+        status = {}
+        for chat_id, stats in self.stats.items():
+            entry = dict(stats)
+            total = entry.pop("total_queue_delay")
+            entry["avg_queue_delay"] = total / stats["sent"] if stats["sent"] else 0.0
+            status[chat_id] = entry
+        return status
+
+    def metrics(self):
+        """
+        Outbox state for /metrics.
+
+        Returns:
+            dict: Lifetime totals, the per-chat queueing stats of chats seen
+                  recently (see get_queue_status) and chunk pacing
+        """
+        chats = self.get_queue_status()
+        return {
+            "chats": len(chats),
+            "active_chats": len(self.workers),
+            "evicted_chats": self.evicted,
+            "pending": sum(entry["pending"] for entry in chats.values()),
+            **self.totals,
+            "max_queue_delay": max((entry["max_queue_delay"] for entry in chats.values()), default=0.0),
+            "per_chat": chats,
+            "pacing": self.pacer.metrics(),
+        }
+
+    async def stop(self):
+        """Cancel all chat workers. Unsent chunks are dropped."""
+        workers = list(self.workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import re
+import time
+import uuid
+from collections import deque
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Tuple
+
+from channels.base import BaseChannel
+from memory import async_storage
+
+HISTORY_LIMIT = 20          # Messages passed to the pipeline (same as other channels)
+SESSION_IDLE_TTL = 30 * 60  # Keep disconnected sessions this long for reconnects
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Outbound delivery to browsers
+OUTBOX_LIMIT = 64           # Queued messages per socket before it counts as a slow consumer
+SEND_TIMEOUT = 10.0         # A single send taking longer than this drops the socket
+SLOW_CONSUMER_POLICY = "coalesce"  # "coalesce": shed/merge broadcasts first; "drop": disconnect at once
+SLOW_CONSUMER_CLOSE_CODE = 1013    # "Try again later"
+
+
+class WebSession:
+    """
+    Conversation state for one browser tab on /ws.
+    History lives in memory; with persistence enabled every message is
+    also written to memory.db so the session survives restarts.
+    """
+
+    def __init__(self, session_id: str, persist: bool = False):
+        self.session_id = session_id
+        self.persist = persist
+        self.history = deque(maxlen=HISTORY_LIMIT)  # (seq, message)
+        self.last_seq = 0
+        self.connections = 0
+        self.last_active = time.monotonic()
+
+    def append(self, message: dict) -> int:
+        """Add a message to the in-memory history and return its sequence number."""
+        self.last_seq += 1
+        self.history.append((self.last_seq, message))
+        return self.last_seq
+
+    async def add_message(self, role: str, text: str) -> int:
+        seq = self.append({"role": role, "content": text})
+        self.last_active = time.monotonic()
+        if self.persist:
+            await async_storage.save_web_message(self.session_id, role, text)
+        return seq
+
+    def get_history(self, until: Optional[int] = None) -> List[dict]:
+        """
+        Recent history in OpenAI format (oldest first).
+
+        Args:
+            until: Sequence number of the message being answered. User messages
+                added after it (still waiting for their own turn) are left out,
+                and it comes last, after the replies to earlier messages.
+        """
+        if until is None:
+            return [message for _, message in self.history]
+        kept = [(seq, message) for seq, message in self.history if message["role"] != "user" or seq <= until]
+        return [message for seq, message in kept if seq != until] + [message for seq, message in kept if seq == until]
+
+
+class WebSessionStore:
+    """Per-socket sessions for the web channel, keyed by session id."""
+
+    def __init__(self, persist: bool = False):
+        self.persist = persist
+        self.sessions: Dict[str, WebSession] = {}
+
+    async def open(self, session_id: Optional[str] = None) -> WebSession:
+        """
+        Attach a socket to a session.
+
+        Args:
+            session_id: Id sent by a reconnecting client; a new session is
+                created if it is missing, malformed or unknown.
+
+        Returns:
+            WebSession
+        """
+        self.prune()
+
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            session_id = uuid.uuid4().hex
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = WebSession(session_id, persist=self.persist)
+            if self.persist:
+                for message in await async_storage.get_web_history(session_id, limit=HISTORY_LIMIT):
+                    session.append(message)
+            self.sessions[session_id] = session
+
+        session.connections += 1
+        session.last_active = time.monotonic()
+        return session
+
+    def close(self, session: WebSession):
+        """Detach a socket; the session is kept until it has been idle for the TTL."""
+        session.connections = max(0, session.connections - 1)
+        session.last_active = time.monotonic()
+
+    def prune(self):
+        """Drop disconnected sessions idle for longer than SESSION_IDLE_TTL."""
+        cutoff = time.monotonic() - SESSION_IDLE_TTL
+        expired = [sid for sid, s in self.sessions.items() if s.connections == 0 and s.last_active < cutoff]
+        for session_id in expired:
+            del self.sessions[session_id]
+        return len(expired)
+
+
+class WebConnection:
+    """
+    One /ws socket with a bounded outbound queue.
+    A dedicated writer task drains the queue, so a slow browser only ever
+    delays its own messages.
+    """
+
+    def __init__(self, websocket, limit: int = OUTBOX_LIMIT):
+        self.websocket = websocket
+        self.limit = limit
+        self.outbox = deque()  # [droppable, key, text, on_sent]; direct replies are never droppable
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+
+    def offer(self, text: str, droppable: bool = False, key: Optional[str] = None,
+              policy: str = SLOW_CONSUMER_POLICY, on_sent: Optional[Callable[[], None]] = None) -> str:
+        """
+        Queue a message without waiting.
+
+        Args:
+            text: Serialized message
+            droppable: True for broadcasts, which may be shed under pressure
+            key: Broadcasts with the same key replace each other when the queue is full
+            policy: "coalesce" or "drop"
+            on_sent: Optional callback once this message has been written to the socket
+
+        Returns:
+            str: "queued", "coalesced", or "overflow" (the consumer should be dropped)
+        """
+        if len(self.outbox) < self.limit:
+            self.outbox.append([droppable, key, text, on_sent])
+            self.wakeup.set()
+            return "queued"
+
+        if policy == "coalesce" and droppable:
+            # Make room: a queued broadcast with the same key is superseded,
+            # otherwise the oldest broadcast is shed
+            broadcasts = [i for i, item in enumerate(self.outbox) if item[0]]
+            same_key = [i for i in broadcasts if key is not None and self.outbox[i][1] == key]
+            victims = same_key or broadcasts
+            if victims:
+                del self.outbox[victims[0]]
+                self.outbox.append([droppable, key, text, on_sent])
+                return "coalesced"
+        return "overflow"
+
+    async def run(self, on_sent=None):
+        """Send queued messages in order until cancelled or a send fails."""
+        while True:
+            while not self.outbox:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            _, _, text, sent_callback = self.outbox.popleft()
+            await asyncio.wait_for(self.websocket.send_text(text), SEND_TIMEOUT)
+            if sent_callback:
+                sent_callback()
+            if on_sent:
+                on_sent()
+
+
+class ConnectionManager:
+    """
+    Active /ws sockets, each with its own writer task.
+    Sending only enqueues, so replies and broadcasts never wait on a
+    socket; broadcasts fan out to all writers at once. A socket whose
+    queue overflows is handled by the slow-consumer policy.
+    """
+
+    def __init__(self, policy: str = SLOW_CONSUMER_POLICY, outbox_limit: int = OUTBOX_LIMIT):
+        self.policy = policy
+        self.outbox_limit = outbox_limit
+        self.connections: Dict[object, WebConnection] = {}  # websocket -> connection
+        self.closing = set()  # Close tasks for dropped sockets (kept referenced)
+        self.stats = {"sent": 0, "broadcasts": 0, "coalesced": 0, "slow_disconnects": 0, "send_errors": 0}
+
+    async def connect(self, websocket) -> WebConnection:
+        await websocket.accept()
+        connection = WebConnection(websocket, limit=self.outbox_limit)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.connections[websocket] = connection
+        return connection
+
+    def disconnect(self, websocket):
+        """Forget a socket and stop its writer (safe to call more than once)."""
+        connection = self.connections.pop(websocket, None)
+        if connection and connection.writer and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    async def broadcast(self, message: str, key: Optional[str] = None) -> int:
+        """
+        Queue a message for every connected socket.
+
+        Args:
+            message: Already serialized text (encoded once for all sockets)
+            key: Optional coalescing key (e.g. "status"), see WebConnection.offer
+
+        Returns:
+            int: Number of sockets the message was queued for
+        """
+        self.stats["broadcasts"] += 1
+        queued = 0
+        for connection in list(self.connections.values()):
+            if self._offer(connection, message, droppable=True, key=key):
+                queued += 1
+        # Let the writers start before the caller queues the next message
+        await asyncio.sleep(0)
+        return queued
+
+    async def send_json(self, websocket, data: dict, on_sent: Optional[Callable[[], None]] = None):
+        """
+        Queue a direct message for one socket.
+
+        Args:
+            websocket: Target socket
+            data: Message to serialize
+            on_sent: Optional callback run by the writer once the message is on the socket
+        """
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        # Same encoding as starlette's WebSocket.send_json
+        self._offer(connection, json.dumps(data, separators=(",", ":"), ensure_ascii=False), on_sent=on_sent)
+
+    def _offer(self, connection: WebConnection, text: str, droppable=False, key=None, on_sent=None) -> bool:
+        result = connection.offer(text, droppable=droppable, key=key, policy=self.policy, on_sent=on_sent)
+        if result == "coalesced":
+            self.stats["coalesced"] += 1
+        elif result == "overflow":
+            self._drop_slow_consumer(connection)
+            return False
+        return True
+
+    def _drop_slow_consumer(self, connection: WebConnection):
+        print(f"[WebSocket] Dropping slow consumer ({len(connection.outbox)} messages queued)")
+        self.stats["slow_disconnects"] += 1
+        self.disconnect(connection.websocket)
+        task = asyncio.create_task(self._close(connection.websocket))
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
+    async def _close(self, websocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), SEND_TIMEOUT)
+        except Exception:
+            pass  # Already gone
+
+    def _count_sent(self):
+        self.stats["sent"] += 1
+
+    async def _write(self, connection: WebConnection):
+        try:
+            await connection.run(on_sent=self._count_sent)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._drop_slow_consumer(connection)
+        except Exception as e:
+            print(f"[WebSocket] Send failed: {e}")
+            self.stats["send_errors"] += 1
+            self.disconnect(connection.websocket)
+
+    def metrics(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "queued": sum(len(c.outbox) for c in self.connections.values()),
+            "policy": self.policy,
+            **self.stats,
+        }
+
+    def shutdown(self):
+        """Stop all writer tasks."""
+        for websocket in list(self.connections):
+            self.disconnect(websocket)
+
+
+class WebChannel(BaseChannel):
+    """
+    The /ws channel. Socket handlers hand their messages to receive(), and
+    listen() yields them to the channel runtime like any other channel, so
+    web turns share its per-conversation queues, backpressure and workers
+    (one conversation per session).
+
+    Message metadata: {"websocket": ..., "session": WebSession, "seq": int, "deadline": ...}
+    """
+    name = "Web"
+
+    def __init__(self, connections: ConnectionManager):
+        self.connections = connections
+        self.inbox: Optional[asyncio.Queue] = None  # Created on the runtime's loop by connect()
+
+    async def connect(self):
+        self.inbox = asyncio.Queue()
+
+    async def status(self) -> str:
+        return f"{len(self.connections.connections)} sockets"
+
+    async def receive(self, session: WebSession, text: str, metadata: dict):
+        """
+        Record a message from a socket and queue it for the runtime.
+
+        Args:
+            session: Session of the socket
+            text: Message text
+            metadata: Turn metadata ("websocket", "deadline", ...)
+
+        Raises:
+            RuntimeError: If the channel is not running (no runtime started)
+        """
+        if self.inbox is None:
+            raise RuntimeError("Web channel is not running")
+        seq = await session.add_message("user", text)
+        self.inbox.put_nowait((session.session_id, text, {**metadata, "session": session, "seq": seq}))
+
+    async def listen(self) -> AsyncGenerator[Tuple[str, str, dict], None]:
+        while True:
+            yield await self.inbox.get()
+
+    async def history(self, sender_id: str, metadata: dict) -> Optional[List[dict]]:
+        return metadata["session"].get_history(until=metadata.get("seq"))
+
+    async def send(self, target: str, message: str, metadata: Optional[dict] = None):
+        deadline = metadata.get("deadline")
+        # Queuing is instant; the delivery checkpoint is judged when the writer
+        # has actually put the message on the socket
+        on_sent = (lambda: deadline.check("delivery")) if deadline else None
+        await self.connections.send_json(metadata["websocket"], {"role": "bot", "content": message}, on_sent=on_sent)
+        await metadata["session"].add_message("assistant", message)
+
+    async def typing(self, target: str):
+        pass
+
+    async def close(self):
+        self.inbox = None
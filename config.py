@@ -0,0 +1,111 @@
+"""
+Central configuration and shared clients.
+
+The environment (.env) is read once, the first time settings are needed.
+Heavy clients are built lazily on first use, so importing a module never
+pays for the OpenAI SDK or an HTTP connection pool it might not need.
+"""
+
+import os
+import threading
+
+from dotenv import load_dotenv
+
+# Shared HTTP pool for all OpenAI calls (chat replies, summaries, key points)
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 120.0  # seconds; keeps warm TLS connections around
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_READ_TIMEOUT = 60.0
+
+
+class Settings:
+    def __init__(self):
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.target_phone_number = os.getenv("TARGET_PHONE_NUMBER")
+        self.trigger_prefix = os.getenv("TRIGGER_PREFIX", "/")
+        self.use_trigger = os.getenv("USE_TRIGGER", "True").lower() == "true"
+
+        self.telegram_bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
+        self.telegram_webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+        self.telegram_webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+
+        # Student/tutor/last-class records (.json, .csv or SQLite .db with a `students` table)
+        self.students_file = os.getenv("STUDENTS_FILE")
+
+        self.web_persist_sessions = os.getenv("WEB_PERSIST_SESSIONS", "False").lower() == "true"
+
+        # memory.db retention (see memory/maintenance.py)
+        self.memory_retention_days = float(os.getenv("MEMORY_RETENTION_DAYS", "30"))
+        self.memory_keep_summaries = int(os.getenv("MEMORY_KEEP_SUMMARIES", "50"))
+        self.memory_archive_path = os.getenv("MEMORY_ARCHIVE_PATH")  # Copy pruned rows here (optional)
+
+        # Pipeline worker processes (0 = run turns in the server process, as in dev)
+        self.workers = int(os.getenv("WORKERS", "0"))
+        # Turns run concurrently by the channel runtime (across conversations)
+        self.channel_workers = int(os.getenv("CHANNEL_WORKERS", "16"))
+
+        self.turn_budget_seconds = float(os.getenv("TURN_BUDGET_SECONDS", "15"))
+        self.model_tiers = os.getenv("MODEL_TIERS")
+        # Per-call-type TTL overrides for the LLM result cache, JSON (see ai/cache.py)
+        self.llm_cache_ttls = os.getenv("LLM_CACHE_TTLS")
+
+
+_lock = threading.Lock()
+_settings = None
+_http_client = None
+_openai_client = None
+
+
+def get_settings():
+    """Load .env (once) and return the process-wide Settings."""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                load_dotenv()
+                _settings = Settings()
+    return _settings
+
+
+def get_http_client():
+    """Shared httpx connection pool, created on first use."""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                import httpx
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                )
+    return _http_client
+
+
+def get_openai_client():
+    """Shared OpenAI client, created on first use (imports the SDK lazily)."""
+    global _openai_client
+    if _openai_client is None:
+        settings = get_settings()
+        http_client = get_http_client()
+        with _lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                # Retries belong to the governor (backoff, breaker, deadline)
+                _openai_client = OpenAI(
+                    api_key=settings.openai_api_key, http_client=http_client, max_retries=0
+                )
+    return _openai_client
+
+
+def close_clients():
+    """Close the shared HTTP pool (on shutdown)."""
+    global _http_client, _openai_client
+    with _lock:
+        client, _http_client, _openai_client = _http_client, None, None
+    if client is not None:
+        client.close()
@@ -0,0 +1,97 @@
+"""
+Catch-up after downtime.
+
+The poller keeps one chat.db cursor for all watched handles in memory.db.
+On startup, messages between the saved cursor and the newest row arrived
+while the bot was down; they are read in pages and folded into one turn
+per conversation instead of one LLM call per message. Catch-up turns are
+paced and wait for live turns to finish, so live traffic always goes first.
+"""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from imessage.reader import get_new_messages_for_handles
+
+CATCHUP_PAGE_SIZE = 200
+CATCHUP_PAGE_DELAY = 0.05     # Pause between pages so the live poller keeps the loop
+CATCHUP_MAX_MESSAGES = 20     # Newest backlog messages folded into the coalesced turn
+CATCHUP_TURN_INTERVAL = 10.0  # Minimum seconds between catch-up turns
+CATCHUP_IDLE_POLL = 1.0       # Re-check interval while a live turn is running
+
+
+def cursor_source(handle_id=None):
+    """memory.db key of the live poll cursor (shared by all watched handles by default)."""
+    return f"imessage:{handle_id}" if handle_id else "imessage"
+
+
+def backlog_source(handle_id=None):
+    """memory.db key marking where an unfinished catch-up starts."""
+    return f"{cursor_source(handle_id)}:backlog"
+
+
+async def read_backlog(conn, handles, after_rowid, until_rowid,
+                       page_size=CATCHUP_PAGE_SIZE, max_messages=CATCHUP_MAX_MESSAGES):
+    """
+    Read incoming messages in (after_rowid, until_rowid] page by page.
+
+    Args:
+        handles: dict of handle ROWID -> address (see reader.resolve_handles)
+
+    Returns:
+        tuple: ({address: newest `max_messages` rows with text as (rowid, text, service)},
+                total number of rows read)
+    """
+    rows = defaultdict(lambda: deque(maxlen=max_messages))
+    total = 0
+    cursor = after_rowid
+    while True:
+        page = get_new_messages_for_handles(conn, handles, cursor, until_rowid, page_size)
+        total += len(page)
+        for rowid, address, text, service in page:
+            if text:
+                rows[address].append((rowid, text, service))
+        if len(page) < page_size:
+            return {address: list(backlog) for address, backlog in rows.items()}, total
+        cursor = page[-1][0]
+        await asyncio.sleep(CATCHUP_PAGE_DELAY)
+
+
+def coalesce_backlog(rows):
+    """
+    Fold backlog rows into a single turn.
+
+    Returns:
+        tuple: (last rowid, service, combined text), or None if nothing to answer
+    """
+    if not rows:
+        return None
+    last_rowid, _, service = rows[-1]
+    return last_rowid, service, "\n".join(text for _, text, _ in rows)
+
+
+class CatchUpPacer:
+    """Spaces catch-up turns and lets live turns go first."""
+
+    def __init__(self, interval=CATCHUP_TURN_INTERVAL):
+        self.interval = interval
+        self.next_allowed = 0.0
+
+    async def wait(self, is_busy):
+        """
+        Wait for a catch-up turn slot.
+
+        Args:
+            is_busy: callable returning True while a live turn is in progress
+        """
+        while True:
+            delay = self.next_allowed - time.monotonic()
+            if delay <= 0 and not is_busy():
+                self.next_allowed = time.monotonic() + self.interval
+                return
+            await asyncio.sleep(max(delay, CATCHUP_IDLE_POLL if is_busy() else 0.0))
+
+
+# Global pacer shared by all catch-up turns
+catchup_pacer = CatchUpPacer()
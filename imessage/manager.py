@@ -1,5 +1,7 @@
 import asyncio
+import heapq
 import random
+import time
 from enum import IntEnum
 from imessage.sender import send_message
 from ai.utils import calculate_chunk_delay
@@ -12,57 +14,184 @@ class MessagePriority(IntEnum):
     LOW = 3       # System messages
 
 
+class ChunkPacer:
+    """
+    Paces chunks like a person typing, crediting time the reader already waited.
+
+    Each chunk's natural delay (calculate_chunk_delay) is measured from the
+    previous chunk of the turn, or from the user's message for the first one,
+    so generation time counts towards it: only the delay still missing is
+    slept, and a turn that is already late sends its first chunk at once.
+    """
+
+    def __init__(self, delay=calculate_chunk_delay):
+        self.delay = delay
+        self.turns = {}  # target -> {session_id, arrived_at, first_queued_at, last_sent_at}
+        self.stats = {
+            "chunks": 0,
+            "immediate_first_chunks": 0,
+            "natural_delay": 0.0,
+            "removed_delay": 0.0,
+            "turns": 0,
+            "generation_time": 0.0,
+            "last_generation_time": None,
+        }
+
+    def start_turn(self, target, session_id, arrived_at=None):
+        """
+        Start pacing a new turn for a recipient.
+
+        Args:
+            target: Recipient of the turn
+            session_id: Response session of the turn
+            arrived_at: time.monotonic() when the user's message arrived (default: now)
+        """
+        self.turns[target] = {
+            "session_id": session_id,
+            "arrived_at": arrived_at if arrived_at is not None else time.monotonic(),
+            "first_queued_at": None,
+            "last_sent_at": None,
+        }
+
+    def _turn(self, target, session_id):
+        turn = self.turns.get(target)
+        return turn if turn and turn["session_id"] == session_id else None
+
+    def in_turn(self, target, session_id):
+        """True if `session_id` is the recipient's turn being paced."""
+        return self._turn(target, session_id) is not None
+
+    def queued(self, target, session_id):
+        """Note a queued chunk; the turn's first one ends its generation time."""
+        turn = self._turn(target, session_id)
+        if turn and turn["first_queued_at"] is None:
+            turn["first_queued_at"] = time.monotonic()
+            generation_time = turn["first_queued_at"] - turn["arrived_at"]
+            self.stats["turns"] += 1
+            self.stats["generation_time"] += generation_time
+            self.stats["last_generation_time"] = generation_time
+
+    def wait_time(self, target, session_id, text):
+        """
+        Seconds to wait before sending a chunk (records the delay removed).
+
+        Returns:
+            float: Natural delay minus the time already elapsed, at least 0
+        """
+        natural = self.delay(text)
+        turn = self._turn(target, session_id)
+        if turn is None:
+            # Not part of a paced turn (e.g. system messages): full delay
+            wait = natural
+        else:
+            first = turn["last_sent_at"] is None
+            since = turn["arrived_at"] if first else turn["last_sent_at"]
+            wait = max(0.0, natural - (time.monotonic() - since))
+            if first and wait == 0:
+                self.stats["immediate_first_chunks"] += 1
+
+        self.stats["chunks"] += 1
+        self.stats["natural_delay"] += natural
+        self.stats["removed_delay"] += natural - wait
+        return wait
+
+    def sent(self, target, session_id):
+        """Note that a chunk went out; the next one is paced from now."""
+        turn = self._turn(target, session_id)
+        if turn:
+            turn["last_sent_at"] = time.monotonic()
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Chunk and turn counts, natural and removed delay, and average generation time
+        """
+        stats = dict(self.stats)
+        turns = stats.pop("turns")
+        stats["avg_generation_time"] = stats.pop("generation_time") / turns if turns else None
+        stats["turns"] = turns
+        return stats
+
+
 class MessageManager:
+    """
+    Outbound iMessage/SMS chunks.
+
+    add_message() puts chunks on a priority queue; start() hands them to a
+    short-lived sender task per recipient (like TelegramOutbox), so each
+    student's chunks are paced and sent in order while other students'
+    chunks go out independently. osascript runs in a thread, off the loop.
+    """
+
     def __init__(self):
         self.queue = asyncio.PriorityQueue()
         self.is_running = False
-        self.current_task = None  # Track currently sending message
         self.task_counter = 0     # Maintain order for same priority
         self.session_id = 0       # Track response sessions
+        self.target_sessions = {} # Latest session per recipient (one student's turn never cancels another's)
+        self.pacer = ChunkPacer()
+        self.deadlines = {}       # Recipient -> (session_id, TurnDeadline) of their latest turn
+        self.pending = {}         # Recipient -> heap of queue items waiting for their sender
+        self.senders = {}         # Recipient -> asyncio.Task draining their chunks
+        self.current_tasks = {}   # Recipient -> chunk being paced/sent right now
 
     async def start(self):
-        """Start the background worker."""
+        """Start the background dispatcher."""
         self.is_running = True
         print("MessageManager started.")
         while self.is_running:
-            # Wait for a chunk from the queue
             # Item format: (priority, counter, session_id, target_number, text, service)
-            print("DEBUG: Waiting for message from queue...")
-            priority, counter, msg_session_id, target_number, text, service = await self.queue.get()
-            
-            # Check if this message is from an old session (interrupted)
-            if msg_session_id < self.session_id:
-                print(f"DEBUG: Skipping message from old session {msg_session_id} (current: {self.session_id})")
-                self.queue.task_done()
-                continue
-            
-            # Set current task
-            self.current_task = {
-                "priority": priority,
-                "session_id": msg_session_id,
-                "text": text[:50] + "..." if len(text) > 50 else text
-            }
-            
-            print(f"DEBUG: Got message from queue (priority={priority}, session={msg_session_id}): {text[:50]}...")
-            
-            if text:
-                # Calculate natural delay
-                delay = calculate_chunk_delay(text)
-                print(f"DEBUG: Waiting {delay:.2f}s before sending...")
-                
-                # Simple delay without typing simulation
+            item = await self.queue.get()
+            target_number = item[3]
+            heapq.heappush(self.pending.setdefault(target_number, []), item)
+            if target_number not in self.senders:
+                self.senders[target_number] = asyncio.create_task(self._drain(target_number))
+
+    async def _drain(self, target_number):
+        """Send one recipient's chunks in priority order, then exit."""
+        pending = self.pending[target_number]
+        try:
+            while pending:
+                try:
+                    await self._send(heapq.heappop(pending))
+                finally:
+                    self.queue.task_done()
+        finally:
+            self.pending.pop(target_number, None)
+            self.senders.pop(target_number, None)
+            self.current_tasks.pop(target_number, None)
+
+    async def _send(self, item):
+        priority, counter, msg_session_id, target_number, text, service = item
+
+        # Check if this message is from an old session (interrupted)
+        current_session = self.current_session(target_number)
+        if msg_session_id < current_session:
+            print(f"DEBUG: Skipping message from old session {msg_session_id} (current: {current_session})")
+            return
+
+        self.current_tasks[target_number] = {
+            "priority": priority,
+            "session_id": msg_session_id,
+            "text": text[:50] + "..." if len(text) > 50 else text
+        }
+        print(f"DEBUG: Got message from queue (priority={priority}, session={msg_session_id}): {text[:50]}...")
+
+        if text:
+            # Natural delay, minus the time the user already waited
+            delay = self.pacer.wait_time(target_number, msg_session_id, text)
+            print(f"DEBUG: Waiting {delay:.2f}s before sending...")
+            if delay > 0:
                 await asyncio.sleep(delay)
-                
-                # Send the message
-                print(f"DEBUG: Sending message: {text}")
-                send_message(target_number, text, service)
-                print(f"DEBUG: Message sent!")
-            
-            # Clear current task
-            self.current_task = None
-            
-            # Mark task as done
-            self.queue.task_done()
+
+            # osascript blocks; only this recipient's sender waits for it
+            print(f"DEBUG: Sending message: {text}")
+            await asyncio.to_thread(send_message, target_number, text, service)
+            self.pacer.sent(target_number, msg_session_id)
+            self._check_delivery(target_number, msg_session_id)
+            print(f"DEBUG: Message sent!")
+
+        self.current_tasks.pop(target_number, None)
 
     def add_message(self, target_number, text, service="iMessage", priority=MessagePriority.NORMAL):
         """
@@ -75,9 +204,43 @@ class MessageManager:
             priority: MessagePriority level (default: NORMAL)
         """
         self.task_counter += 1
-        # Use current session_id from context (will be set in main.py)
-        self.queue.put_nowait((priority, self.task_counter, self.session_id, target_number, text, service))
-        print(f"DEBUG: Added message to queue (priority={priority}, session={self.session_id})")
+        # Use the recipient's current session (set from context in main.py)
+        session_id = self.current_session(target_number)
+        self.queue.put_nowait((priority, self.task_counter, session_id, target_number, text, service))
+        self.pacer.queued(target_number, session_id)
+        print(f"DEBUG: Added message to queue (priority={priority}, session={session_id})")
+
+    def set_session(self, session_id, target_number=None, started_at=None, deadline=None):
+        """
+        Make `session_id` the current response session.
+        
+        Args:
+            session_id: Session id from context.start_response_session()
+            target_number: Recipient the turn answers; only that recipient's
+                older chunks are skipped (None = global session)
+            started_at: time.monotonic() when the user's message arrived;
+                chunk pacing credits the time since then (default: now)
+            deadline: The turn's TurnDeadline; its "delivery" checkpoint is
+                checked as each chunk is actually sent
+        """
+        self.session_id = session_id
+        if target_number is not None:
+            self.target_sessions[target_number] = session_id
+            self.pacer.start_turn(target_number, session_id, started_at)
+            if deadline is not None:
+                self.deadlines[target_number] = (session_id, deadline)
+            else:
+                self.deadlines.pop(target_number, None)
+
+    def _check_delivery(self, target_number, session_id):
+        """Record a delivery miss if a chunk of the turn went out after its checkpoint."""
+        turn = self.deadlines.get(target_number)
+        if turn and turn[0] == session_id:
+            turn[1].check("delivery")
+
+    def current_session(self, target_number):
+        """Current session for a recipient (the global one if it never had a turn)."""
+        return self.target_sessions.get(target_number, self.session_id)
 
     def start_new_session(self):
         """
@@ -101,13 +264,17 @@ class MessageManager:
         """
         # Don't actually clear the queue (causes manager to block)
         # Instead, just increment session_id so old messages get skipped
-        pending = self.queue.qsize()
+        pending = self.pending_count()
         
         if pending > 0:
             print(f"[MessageManager] {pending} messages will be skipped (old session)")
         
         return pending
 
+    def pending_count(self):
+        """Chunks not sent yet (queued or waiting for their recipient's sender)."""
+        return self.queue.qsize() + sum(len(pending) for pending in self.pending.values())
+
     def get_queue_status(self):
         """
         Get current queue status for debugging.
@@ -116,16 +283,21 @@ class MessageManager:
             dict: Status information
         """
         return {
-            "pending": self.queue.qsize(),
-            "current_sending": self.current_task is not None,
-            "current_text": self.current_task.get("text") if self.current_task else None,
-            "current_session": self.current_task.get("session_id") if self.current_task else None,
-            "latest_session": self.session_id
+            "pending": self.pending_count(),
+            "current_sending": bool(self.current_tasks),
+            "sending_to": len(self.current_tasks),
+            "recipients": len(self.senders),
+            "latest_session": self.session_id,
+            "pacing": self.pacer.metrics()
         }
 
     async def stop(self):
-        """Stop the worker gracefully."""
+        """Stop the dispatcher and the recipients' senders (unsent chunks are dropped)."""
         self.is_running = False
+        senders = list(self.senders.values())
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
 
 # Global instance
 message_manager = MessageManager()
@@ -1,5 +1,8 @@
 import sqlite3
 import os
+import re
+
+from imessage.typedstream import fill_text
 
 DB_PATH = os.path.expanduser("~/Library/Messages/chat.db")
 
@@ -31,18 +34,84 @@ def get_last_message_rowid(conn, handle_id):
     result = cursor.fetchone()
     return result[0] if result else 0
 
+def get_inbox_rowid(conn):
+    """ROWID of the newest message in chat.db (the shared poll cursor starts here)."""
+    result = conn.execute("SELECT MAX(ROWID) FROM message").fetchone()
+    return result[0] or 0
+
+def address_key(address):
+    """Comparable form of a handle address: digits of a phone number, or a lower-cased email."""
+    address = str(address).strip()
+    if "@" in address:
+        return address.lower()
+    return re.sub(r"\D", "", address)
+
+def resolve_handles(conn, addresses):
+    """
+    Map watched addresses to their handle ROWIDs.
+    
+    Phone numbers match regardless of formatting ("+82 10-1234-5678" and
+    "+821012345678"). An address usually has one handle row per service
+    (iMessage and SMS); all of them are returned.
+    
+    Returns:
+        dict: handle ROWID -> address as stored in chat.db (handle.id)
+    """
+    wanted = {address_key(address) for address in addresses if address}
+    wanted.discard("")
+    # The handle table is small (one row per contact and service); one scan
+    # is cheaper than a lookup per address
+    return {rowid: handle_id for rowid, handle_id in conn.execute("SELECT ROWID, id FROM handle")
+            if address_key(handle_id) in wanted}
+
+def get_new_messages_for_handles(conn, handles, after_rowid, until_rowid=None, limit=None):
+    """
+    Fetch incoming messages from any watched handle with one ROWID-range query.
+    
+    The scan walks the message primary key from the cursor and only checks
+    the handle of each new row, so the cost depends on how many messages
+    arrived, not on how many handles are watched.
+    
+    Args:
+        handles: dict of handle ROWID -> address (see resolve_handles)
+        after_rowid: Exclusive lower bound (the shared poll cursor)
+        until_rowid: Inclusive upper bound (None = no bound)
+        limit: Maximum rows (None = all)
+    
+    Returns:
+        list: [(rowid, address, text, service), ...] in ROWID order
+    """
+    if not handles:
+        return []
+    placeholders = ",".join("?" * len(handles))
+    # CROSS JOIN and the unary + keep SQLite on the ROWID range instead of
+    # walking each handle's index
+    query = f"""
+    SELECT message.ROWID, message.handle_id, message.text, handle.service, message.attributedBody
+    FROM message
+    CROSS JOIN handle ON message.handle_id = handle.ROWID
+    WHERE message.ROWID > ? AND message.ROWID <= ? AND message.is_from_me = 0
+      AND +message.handle_id IN ({placeholders})
+    ORDER BY message.ROWID ASC
+    LIMIT ?
+    """
+    upper = until_rowid if until_rowid is not None else 2 ** 63 - 1
+    rows = conn.execute(query, (after_rowid, upper, *handles, limit if limit is not None else -1)).fetchall()
+    return [(rowid, handles[handle_rowid], text, service)
+            for rowid, handle_rowid, text, service in fill_text(rows, 2, 4)]
+
 def get_new_messages(conn, handle_id, last_seen_rowid):
-    """Fetch new messages since the last seen ROWID."""
+    """Fetch new messages since the last seen ROWID (text falls back to attributedBody)."""
     cursor = conn.cursor()
     query = """
-    SELECT message.ROWID, message.text, handle.service
+    SELECT message.ROWID, message.text, handle.service, message.attributedBody
     FROM message
     JOIN handle ON message.handle_id = handle.ROWID
     WHERE handle.id = ? AND message.ROWID > ? AND message.is_from_me = 0
     ORDER BY message.date ASC
     """
     cursor.execute(query, (handle_id, last_seen_rowid))
-    return cursor.fetchall()
+    return fill_text(cursor.fetchall(), 1, 3)
 
 def get_conversation_history(conn, handle_id, limit=10):
     """Fetch recent conversation history for context."""
@@ -50,23 +119,22 @@ def get_conversation_history(conn, handle_id, limit=10):
     # Use chat_message_join to get all messages in the conversation
     # This properly includes both sent and received messages
     query = """
-    SELECT message.is_from_me, message.text
-    FROM message
-    JOIN chat_message_join ON message.ROWID = chat_message_join.message_id
-    JOIN chat ON chat_message_join.chat_id = chat.ROWID
-    JOIN handle ON chat.ROWID IN (
-        SELECT chat_handle_join.chat_id 
-        FROM chat_handle_join 
-        WHERE chat_handle_join.handle_id = (SELECT ROWID FROM handle WHERE id = ?)
+    SELECT message.is_from_me, message.text, message.attributedBody
+    FROM chat_message_join
+    JOIN message ON message.ROWID = chat_message_join.message_id
+    WHERE chat_message_join.chat_id IN (
+        SELECT chat_handle_join.chat_id
+        FROM chat_handle_join
+        JOIN handle ON handle.ROWID = chat_handle_join.handle_id
+        WHERE handle.id = ?
     )
-    WHERE message.text IS NOT NULL
-    GROUP BY message.ROWID
+    AND (message.text IS NOT NULL OR message.attributedBody IS NOT NULL)
     ORDER BY message.date DESC
     LIMIT ?
     """
     cursor.execute(query, (handle_id, limit))
-    rows = cursor.fetchall()
+    # Rows whose blob holds no text (attachments only) are dropped
+    rows = [row for row in fill_text(cursor.fetchall(), 1, 2) if row[1]]
     
     # Return in chronological order (oldest first)
     return rows[::-1]
-
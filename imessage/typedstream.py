@@ -0,0 +1,98 @@
+"""
+Plain-text extraction from `message.attributedBody`.
+
+On recent macOS `message.text` is often NULL and the content only exists
+in `attributedBody`, an NSAttributedString archived as a NeXTSTEP
+typedstream. Fully unarchiving it is slow and needs Apple's class
+definitions; the string itself always sits right after the NSString class
+chain as a length-prefixed UTF-8 run:
+
+    ... NSString \\x01 \\x94|\\x95 \\x84 \\x01 '+' <length> <utf-8 bytes> ...
+
+so we locate that run with two byte searches and decode only it.
+"""
+
+OBJECT_REPLACEMENT = "\ufffc"  # Placeholder for attachments inside the text
+
+_CLASS_MARKER = b"NSString"
+_TYPE_MARKER = b"\x84\x01+"      # Type encoding "+" (C string of bytes)
+_INT16 = 0x81                    # Typedstream integer tags
+_INT32 = 0x82
+
+
+def _read_length(blob, pos):
+    """
+    Read a typedstream integer at `pos`.
+
+    Returns:
+        tuple: (value, position after it), or (None, pos) if malformed
+    """
+    if pos >= len(blob):
+        return None, pos
+    tag = blob[pos]
+    if tag == _INT16:
+        if pos + 3 > len(blob):
+            return None, pos
+        return int.from_bytes(blob[pos + 1:pos + 3], "little"), pos + 3
+    if tag == _INT32:
+        if pos + 5 > len(blob):
+            return None, pos
+        return int.from_bytes(blob[pos + 1:pos + 5], "little"), pos + 5
+    if tag >= 0x80:
+        return None, pos
+    return tag, pos + 1
+
+
+def extract_text(blob):
+    """
+    Pull the plain string out of an attributedBody blob.
+
+    Args:
+        blob: attributedBody bytes (or None)
+
+    Returns:
+        str or None: Message text without attachment placeholders,
+        None if the blob is empty, malformed or holds no text
+    """
+    if not blob:
+        return None
+    blob = bytes(blob)
+    start = blob.find(_CLASS_MARKER)
+    if start < 0:
+        return None
+    start = blob.find(_TYPE_MARKER, start + len(_CLASS_MARKER))
+    if start < 0:
+        return None
+    length, pos = _read_length(blob, start + len(_TYPE_MARKER))
+    if length is None or pos + length > len(blob):
+        return None
+    text = blob[pos:pos + length].decode("utf-8", errors="replace")
+    text = text.replace(OBJECT_REPLACEMENT, "").strip()
+    return text or None
+
+
+def fill_text(rows, text_index, body_index):
+    """
+    Bulk-resolve message text over query results.
+
+    Each row carries both `message.text` and `message.attributedBody`;
+    the blob is only decoded when `text` is NULL. The blob column is
+    dropped from the output.
+
+    Args:
+        rows: Result rows (tuples)
+        text_index: Column index of message.text
+        body_index: Column index of message.attributedBody (after text_index)
+
+    Returns:
+        list: Rows without the blob column, text filled in where possible
+    """
+    decode = extract_text
+    filled = []
+    append = filled.append
+    for row in rows:
+        text = row[text_index]
+        if text is None:
+            text = decode(row[body_index])
+        append(row[:text_index] + (text,) + row[text_index + 1:body_index] + row[body_index + 1:])
+    return filled
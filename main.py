@@ -1,48 +1,158 @@
 import asyncio
-import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from typing import List, Optional
 
-from imessage.reader import get_db_connection, get_last_message_rowid, get_new_messages, get_conversation_history
+from imessage.reader import get_conversation_history
 from imessage.sender import send_message # Keep for direct use if needed, but mostly via manager
-from imessage.manager import message_manager, MessagePriority
-from ai.chat import generate_response
+from imessage.manager import message_manager
+from ai.chat import generate_response, ERROR_REPLY
+from ai.governor import llm_governor
+from ai.cache import llm_cache
+from ai.router import model_router
 from ai.grammar import get_bot_system_prompt
+from ringle.students import student_directory
 from ai.utils import split_message_into_chunks
+from ai.packing import pack_chunks
 from state.user import user
-from state.context import context, UserState
+from state.context import contexts, UserState
+from state.deadline import TurnDeadline, get_deadline_metrics
+from state.snapshot import context_snapshots, snapshot_loop, snapshot_stats
 from memory.summary import generate_summary, extract_key_points
-from memory.storage import init_database
-from channels.telegram import TelegramBot # Import TelegramBot
+from memory import async_storage
+from memory.search import format_memory_context
+from memory.storage import conversation_key
+from memory.maintenance import maintenance_loop, maintenance_stats
+from memory.mistakes import MISTAKES_TOP_N, student_key, update_mistake_index, format_mistakes_context
+from config import get_settings, close_clients
+from channels.base import BaseChannel
+from channels.imessage import IMessageChannel
+from channels.runtime import ChannelRuntime
+from channels.web import WebSessionStore, ConnectionManager, WebChannel
+from warmup import warm_up, warmup_state, keep_llm_connection_alive, ping_llm
+from workers import WorkerPool, merge_metrics
 
 # Setup Templates
 templates = Jinja2Templates(directory="templates")
 
-# Connection Manager for WebSockets
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+# WebSocket connections (each drained by its own writer task) and sessions
+manager = ConnectionManager()
+web_sessions = WebSessionStore(persist=get_settings().web_persist_sessions)
+web_channel = WebChannel(manager)
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+# Runs the iMessage and Telegram channels (set in lifespan)
+channel_runtime: Optional[ChannelRuntime] = None
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+# Pipeline worker processes (set in lifespan when WORKERS > 0, see serve.py)
+worker_pool: Optional[WorkerPool] = None
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-            
-    async def send_json(self, websocket: WebSocket, data: dict):
-        await websocket.send_json(data)
+# Telegram bot instance (set in lifespan, used by the webhook route)
+telegram_bot = None  # channels.telegram.TelegramBot, imported only when enabled
+TELEGRAM_WEBHOOK_PATH = "/telegram/webhook"
 
-manager = ConnectionManager()
+# Number of relevant past items added to the prompt
+MEMORY_TOP_K = 5
+
+# Background summary and mistake-index tasks (kept referenced until done)
+summary_tasks = set()
+# Periodic context snapshots of this process (see state/snapshot.py)
+snapshot_task = None
+
+def owner_conversation():
+    """Conversation key of the configured student (TARGET_PHONE_NUMBER): owns the legacy profile and summaries."""
+    return conversation_key("iMessage", user.phone_number)
+
+def turn_conversation(service, conn, user_id=None, conversation_id=None):
+    """
+    Identify a turn's conversation.
+    
+    Returns:
+        tuple: (iMessage/SMS handle or None, memory.db conversation key)
+    """
+    handle = (user_id or user.phone_number) if conn else None
+    return handle, conversation_key(service, handle or user_id or conversation_id)
+
+async def load_conversation_context(conversation):
+    """This conversation's context, with its latest summary loaded on first use."""
+    ctx = contexts.get(conversation)
+    if conversation is not None and not ctx._loaded_initial_summary:
+        await asyncio.to_thread(ctx.load_latest_summary, conversation)
+    return ctx
+
+async def refresh_summary(formatted_history, conversation):
+    """Generate and store a new summary outside the reply's latency budget."""
+    # LLM calls are blocking (and may back off), so run them off the event loop
+    summary, key_points = await asyncio.gather(
+        asyncio.to_thread(generate_summary, formatted_history),
+        asyncio.to_thread(extract_key_points, formatted_history),
+    )
+    # Keep the previous summary if the LLM was unavailable
+    if summary:
+        # Only the summarized conversation's context picks it up
+        ctx = contexts.get(conversation)
+        ctx.update_summary(summary, key_points)
+        # Save to database, tagged with the conversation it summarizes
+        await ctx.save_summary_to_db_async(conversation)
+
+def expire_response_session(ctx, session_id):
+    """Stop reporting BOT_RESPONDING once a turn's budget has run out."""
+    if ctx.response_session_id == session_id and ctx.is_bot_busy():
+        print(f"[Deadline] Response session {session_id} exceeded its budget")
+        ctx.finish_response_session()
+
+def begin_response_session(deadline: TurnDeadline, ctx, target: Optional[str] = None):
+    """
+    Start a response session that expires with the turn's budget.
+    
+    Args:
+        ctx: Context of the turn's conversation
+        target: iMessage/SMS recipient of the turn; only their pending chunks are superseded
+    """
+    session_id = contexts.start_response_session(ctx)
+    message_manager.set_session(session_id, target, deadline.started_at, deadline)
+    asyncio.get_running_loop().call_later(deadline.remaining(), expire_response_session, ctx, session_id)
+    return session_id
 
-async def process_user_message(text: str, service: str, conn, reply_callback, rowid: Optional[int] = None, history: Optional[List[dict]] = None):
+async def run_turn(text: str, service: str, conn, reply_callback, rowid: Optional[int] = None, history: Optional[List[dict]] = None, deadline: Optional[TurnDeadline] = None, user_id=None, conversation_id=None):
+    """
+    Run a turn in this process, or on the worker that owns the conversation.
+    Same arguments as process_user_message, plus:
+    
+    Args:
+        conversation_id: Sharding key within the service (defaults to user_id)
+    """
+    if worker_pool is None:
+        return await process_user_message(text, service, conn, reply_callback, rowid, history, deadline, user_id,
+                                          conversation_id)
+    
+    deadline = deadline or TurnDeadline()
+    # Interrupts and iMessage delivery stay in this process; keep their session in step
+    handle, memory_key = turn_conversation(service, conn, user_id, conversation_id)
+    begin_response_session(deadline, contexts.get(memory_key), handle)
+    await worker_pool.run_turn(
+        conversation_id or user_id, text, service, reply_callback,
+        use_chat_db=conn is not None, rowid=rowid, history=history, deadline=deadline, user_id=user_id,
+    )
+
+async def prepare_worker():
+    """Per-process setup of a pipeline worker (see workers.py)."""
+    # Every worker has its own governor: together they keep the single-process budget
+    llm_governor.share_budget(get_settings().workers)
+    # Each worker owns its contexts: restore its snapshot, else the configured student's latest summary
+    if not context_snapshots.restore() and owner_conversation():
+        await load_conversation_context(owner_conversation())
+    global snapshot_task
+    snapshot_task = asyncio.create_task(snapshot_loop(context_snapshots))
+    await async_storage.get_all_profile_data(owner_conversation() or "")
+    await asyncio.to_thread(student_directory.load)
+    try:
+        await asyncio.to_thread(ping_llm)
+    except Exception as e:
+        print(f"[Worker] LLM warm-up failed: {e}")
+
+async def process_user_message(text: str, service: str, conn, reply_callback, rowid: Optional[int] = None, history: Optional[List[dict]] = None, deadline: Optional[TurnDeadline] = None, user_id=None, conversation_id=None):
     """
     Core message processing pipeline.
     
@@ -53,8 +163,16 @@ async def process_user_message(text: str, service: str, conn, reply_callback, ro
         reply_callback: Async function to handle response chunks (arg: text)
         rowid: Optional rowid if from iMessage DB
         history: Optional list of history messages [{'role': ..., 'content': ...}]
+        deadline: Optional TurnDeadline (started now if not given by the channel)
+        user_id: Optional channel user id (Telegram id, or the iMessage/SMS handle)
+        conversation_id: Conversation id within the channel (identifies web sessions)
     """
     print(f"Processing message ({service}): {text}")
+    deadline = deadline or TurnDeadline()
+    # iMessage/SMS handle of this turn, and the memory.db key of its conversation:
+    # its summaries, search results, profile and context are its own
+    handle, memory_key = turn_conversation(service, conn, user_id, conversation_id)
+    context = await load_conversation_context(memory_key)
     
     # Update context
     if rowid:
@@ -66,8 +184,7 @@ async def process_user_message(text: str, service: str, conn, reply_callback, ro
         print(f"[{service}] Language: {detected_lang}, State: {context.current_state}")
     
     # Start new response session
-    session_id = context.start_response_session()
-    message_manager.session_id = session_id
+    begin_response_session(deadline, context, handle)
     
     # Get recent history
     formatted_history = []
@@ -76,7 +193,7 @@ async def process_user_message(text: str, service: str, conn, reply_callback, ro
          formatted_history = history
     elif conn:
         # Get recent history (limit 20)
-        history_rows = get_conversation_history(conn, user.phone_number, limit=20)
+        history_rows = get_conversation_history(conn, handle, limit=20)
         print(f"DEBUG: Loaded {len(history_rows)} messages from history")
         
         # Convert to OpenAI format
@@ -105,6 +222,20 @@ async def process_user_message(text: str, service: str, conn, reply_callback, ro
     # Wait, if history IS passed, does it include the current one?
     # In telegram.py I save it first. So yes. 
     
+    # Long-term memory: past items relevant to this message + the user profile
+    # + the student's most frequent mistakes
+    telegram_id = user_id if service == "Telegram" else None
+    mistake_key = student_key(phone_number=handle, telegram_id=telegram_id)
+    recent_contents = {msg["content"] for msg in formatted_history}
+    # The profile is served from the write-through cache (loaded once per student, off the loop)
+    memory_items, mistakes, profile = await asyncio.gather(
+        async_storage.search_memory(text, memory_key, limit=MEMORY_TOP_K, exclude=recent_contents),
+        async_storage.get_top_mistakes(mistake_key, MISTAKES_TOP_N) if mistake_key else asyncio.sleep(0, []),
+        async_storage.get_all_profile_data(memory_key) if memory_key is not None else asyncio.sleep(0, None),
+    )
+    memory_context = format_memory_context(memory_items, profile) + format_mistakes_context(mistakes)
+    
+    deadline.check("history")
     print(f"DEBUG: Formatted history ({len(formatted_history)} messages):")
     # for i, msg in enumerate(formatted_history[-5:]):  # Show last 5
     #     print(f"  [{i}] {msg['role']}: {msg['content'][:50]}...")
@@ -115,119 +246,144 @@ async def process_user_message(text: str, service: str, conn, reply_callback, ro
     # Check if we should generate a summary
     if context.should_generate_summary():
         print(f"[Auto-Summary] Generating summary after {msg_count} messages...")
-        summary = generate_summary(formatted_history)
-        key_points = extract_key_points(formatted_history)
-        context.update_summary(summary, key_points)
-        # Save to database
-        context.save_summary_to_db()
+        # Runs in the background so it never eats into this turn's budget;
+        # the new summary is used from the next turn on
+        task = asyncio.create_task(refresh_summary(list(formatted_history), memory_key))
+        summary_tasks.add(task)
+        task.add_done_callback(summary_tasks.discard)
     
     # Generate AI response with summary context
-    system_prompt = get_bot_system_prompt()
-    summary_context = context.get_summary_context()
+    system_prompt = get_bot_system_prompt(
+        phone_number=handle,
+        telegram_id=telegram_id,
+    )
+    summary_context = context.get_summary_context() + memory_context
     print(f"DEBUG: Generating AI response...")
     
-    response = generate_response(system_prompt, formatted_history, summary_context)
+    route = model_router.route(text, context.current_language)
+    print(f"DEBUG: Routed to {route.tier} tier ({route.model}, max_tokens={route.max_tokens})")
+    response = await asyncio.to_thread(generate_response, system_prompt, formatted_history, summary_context, deadline, route)
     print(f"DEBUG: AI response: {response[:100]}...")
     
+    # Add this exchange's corrections to the student's mistake index (off the latency budget;
+    # quick-tier turns like "thanks!" have nothing to correct)
+    if mistake_key and response != ERROR_REPLY and route.tier != "quick":
+        task = asyncio.create_task(update_mistake_index(mistake_key, text, response))
+        summary_tasks.add(task)
+        task.add_done_callback(summary_tasks.discard)
+    
     # Split and send chunks
-    chunks = split_message_into_chunks(response)
+    chunks = pack_chunks(split_message_into_chunks(response), service)
     print(f"DEBUG: Split into {len(chunks)} chunks")
     
     for i, chunk in enumerate(chunks, 1):
         # Call the callback (adds to queue or sends via WS)
         await reply_callback(chunk)
+    # The "delivery" checkpoint is checked by the channels when chunks actually go out
 
     # Note: We don't call finish_response_session() here because messages might still be queued/sending
 
-# Background task for polling messages
-async def message_poller():
-    print(f"Starting poller for {user.phone_number}...")
-    
-    # Initialize database and load previous summary
-    init_database()
-    context.load_latest_summary()
-    
-    conn = get_db_connection()
-    if not conn:
-        print("Database connection failed. Poller stopped.")
-        return
+async def handle_channel_message(channel: BaseChannel, sender_id, text: str, metadata: dict):
+    """
+    Shared pipeline entry for every channel (run by the channel runtime).
 
-    # Initial state
-    try:
-        last_rowid = get_last_message_rowid(conn, user.phone_number)
-        context.update_last_seen(last_rowid)
-        print(f"Initial Last Row ID: {context.last_seen_rowid}")
-        
-        # Proactive greeting (optional, good for testing)
-        # send_message(user.phone_number, "RingleBot is back online!")
+    Args:
+        channel: Channel the message came from (used for history and replies)
+        sender_id: Conversation id within the channel
+        text: The message text
+        metadata: Channel metadata; "service", "conn", "rowid", "deadline" and
+            "user_id" are passed on to run_turn when present
+    """
+    async def reply_callback(chunk):
+        await channel.send(sender_id, chunk, metadata)
 
-        while True:
-            # Poll for new messages
-            # print(f"Polling... Last seen: {context.last_seen_rowid}") # Very verbose
-            new_msgs = get_new_messages(conn, user.phone_number, context.last_seen_rowid)
-            
-            if new_msgs:
-                print(f"DEBUG: Found {len(new_msgs)} new messages. Last seen: {context.last_seen_rowid}")
-                
-                # New user message detected - interrupt pending responses
-                if context.is_bot_busy():
-                    cleared = message_manager.clear_pending_messages()
-                    if cleared > 0:
-                        print(f"[Interrupt] Cleared {cleared} pending messages due to new user input")
-
-            for rowid, text, service in new_msgs:
-                if text:
-                    # Define callback for iMessage: add to queue
-                    async def imessage_callback(chunk):
-                         message_manager.add_message(
-                            user.phone_number, 
-                            chunk,
-                            priority=MessagePriority.HIGH
-                        )
-                    
-                    # Process the message
-                    await process_user_message(text, service, conn, imessage_callback, rowid)
-                    
-                    # Log queue status
-                    status = message_manager.get_queue_status()
-                    print(f"[Queue Status] Pending: {status['pending']}, Session: {status['latest_session']}")
-                    
-                    # Update state with the rowid of the incoming message we just processed
-                    context.update_last_seen(rowid)
-            
-            await asyncio.sleep(1) # Non-blocking sleep
-            
-    except Exception as e:
-        print(f"Poller error: {e}")
-    finally:
-        conn.close()
+    history = await channel.history(sender_id, metadata)
+    await run_turn(text, metadata.get("service", channel.name), metadata.get("conn"), reply_callback,
+                   metadata.get("rowid"), history=history, deadline=metadata.get("deadline"),
+                   user_id=metadata.get("user_id", sender_id), conversation_id=sender_id)
+
+def watched_handles():
+    """
+    Addresses the iMessage channel answers: TARGET_PHONE_NUMBER (comma-separated
+    for several) plus every student with a phone number in STUDENTS_FILE.
+    """
+    handles = list(user.phone_numbers)
+    handles.extend(phone for phone in student_directory.phone_numbers() if phone not in handles)
+    return handles
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Start the poller and the message manager
+    # Startup: Start the channels and the message manager
     user.validate()
     
-    # Initialize Telegram Bot
-    print("[Main] Initializing Telegram Bot...")
-    try:
-        telegram_bot = TelegramBot(process_user_message)
-        await telegram_bot.initialize()
-        await telegram_bot.start_polling()
-        print("[Main] Telegram Bot started.")
-    except Exception as e:
-        print(f"[Main] Error starting Telegram Bot: {e}")
+    global telegram_bot, worker_pool, channel_runtime, snapshot_task
+
+    # Initialize database and restore the contexts (snapshot, else the configured student's latest summary)
+    await async_storage.init_database()
+    if owner_conversation():
+        # Summaries and the profile from the single-student setup belong to the configured student
+        await async_storage.assign_legacy_memory(owner_conversation())
+    if not context_snapshots.restore() and owner_conversation():
+        await load_conversation_context(owner_conversation())
+    # Load the profile cache once so per-turn reads are dictionary lookups
+    await async_storage.get_all_profile_data(owner_conversation() or "")
+    # Student lookups in turns never load the roster on the event loop
+    await asyncio.to_thread(student_directory.load)
+
+    # Production mode: turns run in worker processes, this process is the single writer
+    workers = get_settings().workers
+    if workers > 0:
+        worker_pool = WorkerPool(workers)
+        worker_pool.start()
+
+    channel_runtime = ChannelRuntime(handle_channel_message, workers=get_settings().channel_workers)
+    channel_runtime.add_channel(IMessageChannel(watched_handles))
+    channel_runtime.add_channel(web_channel)
+
+    # Telegram Bot (python-telegram-bot is only imported when enabled)
+    if get_settings().telegram_bot_token:
+        print("[Main] Adding Telegram channel...")
+        try:
+            from channels.telegram import TelegramBot
+            telegram_bot = TelegramBot()
+            channel_runtime.add_channel(telegram_bot)
+        except Exception as e:
+            print(f"[Main] Error creating Telegram Bot: {e}")
+    else:
+        print("[Main] TELEGRAM_BOT_TOKEN not set, Telegram disabled.")
+    
+    # Warm connections, caches and templates; /ready turns 200 when done
+    warmup_task = asyncio.create_task(warm_up(templates))
+    keepalive_task = asyncio.create_task(keep_llm_connection_alive())
+    # Retention for memory.db (throttled, runs on the storage writer thread)
+    maintenance_task = asyncio.create_task(maintenance_loop())
+    # Periodic context snapshots for a warm restart
+    snapshot_task = asyncio.create_task(snapshot_loop(context_snapshots))
     
-    print("[Main] Starting message poller...")
-    poller_task = asyncio.create_task(message_poller())
+    print("[Main] Starting channels...")
+    await channel_runtime.start()
     manager_task = asyncio.create_task(message_manager.start())
     
     yield
     
     # Shutdown
-    await telegram_bot.stop()
-    poller_task.cancel()
+    warmup_task.cancel()
+    keepalive_task.cancel()
+    maintenance_task.cancel()
+    await channel_runtime.stop()
+    channel_runtime = None
+    # Cancelling saves a final snapshot
+    snapshot_task.cancel()
+    await asyncio.gather(snapshot_task, return_exceptions=True)
+    snapshot_task = None
     await message_manager.stop()
     manager_task.cancel()
+    manager.shutdown()
+    if worker_pool:
+        await worker_pool.stop()
+        worker_pool = None
+    async_storage.shutdown()
+    close_clients()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -235,37 +391,101 @@ app = FastAPI(lifespan=lifespan)
 async def get_chat_interface(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
+@app.get("/ready")
+async def get_readiness():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    return JSONResponse(warmup_state.as_dict(), status_code=200 if warmup_state.ready else 503)
+
+# Pipeline metrics that are not additive across workers (the highest value is reported)
+PIPELINE_GAUGES = ("latency_p50", "latency_p95", "hedge_delay", "latency_ewma", "ttls", "turn_budget")
+
+def pipeline_metrics():
+    """Metrics of this process's turn pipeline (workers report these to the front)."""
+    return {
+        "llm": llm_governor.metrics(),
+        "llm_cache": llm_cache.metrics(),
+        "deadlines": get_deadline_metrics(),
+        "router": model_router.metrics(),
+    }
+
+async def collect_pipeline_metrics():
+    """Pipeline metrics of every worker, merged (counts summed, per-worker circuit states counted)."""
+    reports = await worker_pool.collect_metrics()
+    merged = merge_metrics([report for report in reports if report], PIPELINE_GAUGES)
+    for counts in merged.get("llm_cache", {}).get("by_type", {}).values():
+        hits = counts.get("memory_hits", 0) + counts.get("disk_hits", 0)
+        lookups = hits + counts.get("misses", 0)
+        counts["hit_rate"] = round(hits / lookups, 3) if lookups else None
+    merged["reporting_workers"] = sum(1 for report in reports if report)
+    return merged
+
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime metrics for monitoring."""
+    # In worker mode the pipeline runs in the workers: report their merged state
+    pipeline = await collect_pipeline_metrics() if worker_pool else pipeline_metrics()
+    return {
+        **pipeline,
+        "web": manager.metrics(),
+        "workers": worker_pool.metrics() if worker_pool else None,
+        "students": student_directory.metrics(),
+        "channels": channel_runtime.metrics() if channel_runtime else None,
+        "imessage": message_manager.get_queue_status(),
+        "telegram": telegram_bot.outbox.metrics() if telegram_bot else None,
+        "maintenance": maintenance_stats,
+        "context_snapshot": snapshot_stats,
+    }
+
+@app.post(TELEGRAM_WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    """
+    Receive Telegram updates in webhook mode.
+    Can be exercised locally by POSTing a recorded update, e.g.
+    fixtures/telegram_update.json (see README).
+    """
+    # Only live while the bot is actually in webhook mode (not when polling)
+    if not telegram_bot or not telegram_bot.application or telegram_bot.mode != "webhook":
+        raise HTTPException(status_code=404, detail="Telegram webhook not enabled")
+    if not telegram_bot.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    data = await request.json()
+    await telegram_bot.process_webhook_update(data)
+    return {"ok": True}
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    # Each socket gets its own session; web traffic never touches chat.db
+    try:
+        session = await web_sessions.open(websocket.query_params.get("session"))
+    except Exception:
+        manager.disconnect(websocket)
+        raise
     try:
-        # Send initial status
+        # Send initial status (and the session id, so a reconnect can resume)
+        await manager.send_json(websocket, {"role": "session", "session_id": session.session_id})
         await manager.send_json(websocket, {"role": "bot", "content": "Connected to RingleBot Brain."})
         
         while True:
             data = await websocket.receive_text()
+            deadline = TurnDeadline()
             print(f"[WebSocket] Received: {data}")
             
             # 1. Echo user message back to UI (optional, UI can do it optimistically)
             # await manager.send_json(websocket, {"role": "user", "content": data})
             
-            # 2. Process message
-            conn = get_db_connection()
-            if conn:
-                try:
-                    # Callback to send chunks back to WebSocket
-                    async def ws_callback(chunk):
-                        await manager.send_json(websocket, {"role": "bot", "content": chunk})
-                    
-                    await process_user_message(data, "Web", conn, ws_callback, rowid=None)
-                finally:
-                    conn.close()
-            else:
-                 await manager.send_json(websocket, {"role": "bot", "content": "Error: Database connection failed."})
+            # 2. Queue the turn on the channel runtime (one conversation per session);
+            # replies go back to this socket (see WebChannel)
+            await web_channel.receive(session, data, {
+                "websocket": websocket, "deadline": deadline, "user_id": None,
+            })
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         print("[WebSocket] Client disconnected")
+    finally:
+        manager.disconnect(websocket)
+        web_sessions.close(session)
 
 if __name__ == "__main__":
     import uvicorn
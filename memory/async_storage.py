@@ -0,0 +1,236 @@
+"""
+Async facade over memory.storage.
+Runs the blocking SQLite calls off the event loop so a slow disk never
+stalls other conversations. Writes are serialized on a single writer
+thread (SQLite only allows one writer at a time anyway); reads share a
+small bounded pool. The sync functions in memory.storage stay available
+for scripts like test_memory.py.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from memory import storage, search
+
+READ_WORKERS = 4
+MAX_PENDING = 256  # In-flight storage calls before callers start waiting
+
+_lock = threading.Lock()
+_writer = None
+_readers = None
+_pending = None
+_pending_loop = None
+_write_forwarder = None  # Set in worker processes: writes go to the front process
+
+
+def _get_executors():
+    """Create the writer thread and reader pool on first use."""
+    global _writer, _readers
+    with _lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-writer")
+        if _readers is None:
+            _readers = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="storage-reader")
+        return _writer, _readers
+
+
+def _get_pending():
+    """Semaphore bounding queued calls, bound to the running loop."""
+    global _pending, _pending_loop
+    loop = asyncio.get_running_loop()
+    if _pending is None or _pending_loop is not loop:
+        _pending = asyncio.Semaphore(MAX_PENDING)
+        _pending_loop = loop
+    return _pending
+
+
+async def _run(write, func, *args, **kwargs):
+    if write and _write_forwarder is not None:
+        return await _write_forwarder(func.__name__, args, kwargs)
+    writer, readers = _get_executors()
+    executor = writer if write else readers
+    loop = asyncio.get_running_loop()
+    async with _get_pending():
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def init_database():
+    """Async version of storage.init_database."""
+    return await _run(True, storage.init_database)
+
+
+async def save_summary(summary, key_points, message_count, conversation=None, created_at=None):
+    """Async version of storage.save_summary."""
+    return await _run(True, storage.save_summary, summary, key_points, message_count, conversation, created_at)
+
+
+async def load_recent_summaries(limit=5, conversation=None):
+    """Async version of storage.load_recent_summaries."""
+    return await _run(False, storage.load_recent_summaries, limit, conversation)
+
+
+async def get_latest_summary(conversation=None):
+    """Async version of storage.get_latest_summary."""
+    return await _run(False, storage.get_latest_summary, conversation)
+
+
+async def assign_legacy_memory(conversation):
+    """Async version of storage.assign_legacy_memory."""
+    return await _run(True, storage.assign_legacy_memory, conversation)
+
+
+async def save_user_profile(key, value, conversation=""):
+    """Async version of storage.save_user_profile."""
+    return await _run(True, storage.save_user_profile, key, value, conversation)
+
+
+async def load_user_profile(key, conversation=""):
+    """Async version of storage.load_user_profile."""
+    return await _run(False, storage.load_user_profile, key, conversation)
+
+
+async def get_all_profile_data(conversation=""):
+    """Async version of storage.get_all_profile_data."""
+    return await _run(False, storage.get_all_profile_data, conversation)
+
+
+async def invalidate_profile_cache(key=None, conversation=None):
+    """Async version of storage.invalidate_profile_cache."""
+    return await _run(False, storage.invalidate_profile_cache, key, conversation)
+
+
+async def save_telegram_message(user_id, role, text):
+    """Async version of storage.save_telegram_message."""
+    return await _run(True, storage.save_telegram_message, user_id, role, text)
+
+
+async def get_telegram_history(user_id, limit=20, until_id=None):
+    """Async version of storage.get_telegram_history."""
+    return await _run(False, storage.get_telegram_history, user_id, limit, until_id)
+
+
+async def save_web_message(session_id, role, text):
+    """Async version of storage.save_web_message."""
+    return await _run(True, storage.save_web_message, session_id, role, text)
+
+
+async def get_web_history(session_id, limit=20):
+    """Async version of storage.get_web_history."""
+    return await _run(False, storage.get_web_history, session_id, limit)
+
+
+async def save_poll_cursor(source, last_rowid):
+    """Async version of storage.save_poll_cursor."""
+    return await _run(True, storage.save_poll_cursor, source, last_rowid)
+
+
+async def load_poll_cursor(source):
+    """Async version of storage.load_poll_cursor."""
+    return await _run(False, storage.load_poll_cursor, source)
+
+
+async def delete_poll_cursor(source):
+    """Async version of storage.delete_poll_cursor."""
+    return await _run(True, storage.delete_poll_cursor, source)
+
+
+async def record_mistakes(student_key, mistakes):
+    """Async version of storage.record_mistakes."""
+    return await _run(True, storage.record_mistakes, student_key, mistakes)
+
+
+async def get_top_mistakes(student_key, limit=5):
+    """Async version of storage.get_top_mistakes."""
+    return await _run(False, storage.get_top_mistakes, student_key, limit)
+
+
+async def get_expired_telegram_users(cutoff):
+    """Async version of storage.get_expired_telegram_users."""
+    return await _run(False, storage.get_expired_telegram_users, cutoff)
+
+
+async def get_expired_telegram_messages(user_id, cutoff, limit):
+    """Async version of storage.get_expired_telegram_messages."""
+    return await _run(False, storage.get_expired_telegram_messages, user_id, cutoff, limit)
+
+
+async def delete_telegram_messages(ids, archive_path=None):
+    """Async version of storage.delete_telegram_messages."""
+    return await _run(True, storage.delete_telegram_messages, ids, archive_path)
+
+
+async def delete_expired_web_messages(cutoff, limit, archive_path=None):
+    """Async version of storage.delete_expired_web_messages."""
+    return await _run(True, storage.delete_expired_web_messages, cutoff, limit, archive_path)
+
+
+async def prune_summaries(keep, limit, archive_path=None):
+    """Async version of storage.prune_summaries."""
+    return await _run(True, storage.prune_summaries, keep, limit, archive_path)
+
+
+async def delete_stale_mistakes(cutoff, limit):
+    """Async version of storage.delete_stale_mistakes."""
+    return await _run(True, storage.delete_stale_mistakes, cutoff, limit)
+
+
+async def incremental_vacuum(pages):
+    """Async version of storage.incremental_vacuum."""
+    return await _run(True, storage.incremental_vacuum, pages)
+
+
+async def analyze():
+    """Async version of storage.analyze."""
+    return await _run(True, storage.analyze)
+
+
+async def get_database_size():
+    """Async version of storage.get_database_size."""
+    return await _run(False, storage.get_database_size)
+
+
+async def search_memory(text, conversation=None, limit=5, exclude=None):
+    """Async version of search.search_memory."""
+    return await _run(False, search.search_memory, text, conversation, limit, exclude)
+
+
+def set_write_forwarder(forwarder):
+    """
+    Route writes elsewhere instead of the local writer thread.
+    Used by worker processes (see workers.py) so that memory.db keeps a
+    single writer across processes; reads stay local.
+
+    Args:
+        forwarder: async callable (func_name, args, kwargs) -> result, or None to reset
+    """
+    global _write_forwarder
+    _write_forwarder = forwarder
+
+
+def submit_write(func_name, args=(), kwargs=None):
+    """
+    Queue a storage write by name on the writer thread.
+
+    Returns:
+        concurrent.futures.Future
+    """
+    func = getattr(storage, func_name)
+    writer, _ = _get_executors()
+    return writer.submit(func, *args, **(kwargs or {}))
+
+
+def shutdown(wait=True):
+    """
+    Stop the storage threads.
+    Pending writes are flushed first when wait is True.
+    """
+    global _writer, _readers
+    with _lock:
+        writer, readers = _writer, _readers
+        _writer = _readers = None
+    if writer:
+        writer.shutdown(wait=wait)
+    if readers:
+        readers.shutdown(wait=wait)
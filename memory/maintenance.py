@@ -0,0 +1,161 @@
+"""
+Background retention for memory.db.
+
+Without it telegram_messages, web_messages and conversation_summaries grow
+forever. Every MAINTENANCE_INTERVAL the job:
+
+1. Rolls Telegram messages older than the retention window into a summary
+   per user (kept searchable), then deletes the raw rows
+2. Deletes web messages older than the window
+3. Keeps only the newest summaries of each conversation, and drops
+   one-off mistakes not seen within the window from the mistake index
+4. Deletes expired entries of the persistent LLM result cache
+5. Returns free pages to the file system (incremental vacuum) and
+   refreshes planner statistics (ANALYZE)
+
+Deleted rows are copied to MEMORY_ARCHIVE_PATH first when it is set.
+All writes go through the async_storage writer thread in small batches
+with a pause in between, so live writes queued meanwhile run first and
+never wait for more than one batch.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from ai.cache import llm_cache
+from config import get_settings
+from memory import async_storage
+from memory.storage import conversation_key
+from memory.summary import generate_summary, extract_key_points
+
+MAINTENANCE_INTERVAL = 6 * 60 * 60  # Seconds between runs
+MAINTENANCE_START_DELAY = 10 * 60   # First run after startup traffic has settled
+ROLLUP_BATCH = 100                  # Old messages folded into one summary
+DELETE_BATCH = 500                  # Rows deleted per write transaction
+VACUUM_PAGES = 256                  # Pages freed per incremental vacuum step
+BATCH_DELAY = 0.2                   # Pause between batches (lets live writes through)
+
+# Last run, for /metrics
+maintenance_stats = {"runs": 0, "last_run": None, "last_duration_ms": None, "last": None}
+
+
+def retention_cutoff(days, now=None):
+    """UTC timestamp (memory.db's CURRENT_TIMESTAMP format) before which rows expire."""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def roll_up_telegram(cutoff, archive_path=None, batch=None):
+    """
+    Summarize and delete each user's messages older than `cutoff`.
+    A user whose summary the LLM cannot produce is skipped (their rows are
+    kept for the next run); the other users are still rolled up.
+
+    Returns:
+        tuple: (summaries written, messages deleted, users skipped)
+    """
+    batch = batch or ROLLUP_BATCH
+    summaries = deleted = skipped = 0
+    for user_id in await async_storage.get_expired_telegram_users(cutoff):
+        while True:
+            rows = await async_storage.get_expired_telegram_messages(user_id, cutoff, batch)
+            if not rows:
+                break
+            history = [{"role": role, "content": text} for _, role, text, _ in rows]
+            summary, key_points = await asyncio.gather(
+                asyncio.to_thread(generate_summary, history),
+                asyncio.to_thread(extract_key_points, history),
+            )
+            if not summary:
+                print(f"[Maintenance] No summary for Telegram user {user_id}; keeping their old messages")
+                skipped += 1
+                break
+            # Dated like the messages it replaces, so it neither becomes the
+            # latest summary nor pushes newer real summaries towards pruning
+            await async_storage.save_summary(summary, key_points, len(rows),
+                                             conversation=conversation_key("Telegram", user_id),
+                                             created_at=rows[-1][3])
+            summaries += 1
+            deleted += await async_storage.delete_telegram_messages([row[0] for row in rows], archive_path)
+            await asyncio.sleep(BATCH_DELAY)
+    return summaries, deleted, skipped
+
+
+async def _drain(step):
+    """Repeat a batched delete, step(limit), until it removes less than a full batch."""
+    total = 0
+    while True:
+        count = await step(DELETE_BATCH)
+        total += count
+        if count < DELETE_BATCH:
+            return total
+        await asyncio.sleep(BATCH_DELAY)
+
+
+async def run_maintenance(retention_days=None, keep_summaries=None, archive_path=None, now=None):
+    """
+    Run one retention pass.
+
+    Args:
+        retention_days: Raw messages older than this are rolled up / deleted
+        keep_summaries: Summaries kept per conversation
+        archive_path: Optional SQLite file receiving deleted rows
+        now: Current UTC time (for tests)
+
+    Returns:
+        dict: What was done
+    """
+    settings = get_settings()
+    retention_days = settings.memory_retention_days if retention_days is None else retention_days
+    keep_summaries = settings.memory_keep_summaries if keep_summaries is None else keep_summaries
+    archive_path = archive_path or settings.memory_archive_path
+    cutoff = retention_cutoff(retention_days, now)
+    start = time.perf_counter()
+
+    summaries, telegram_deleted, telegram_skipped = await roll_up_telegram(cutoff, archive_path)
+    web_deleted = await _drain(lambda limit: async_storage.delete_expired_web_messages(cutoff, limit, archive_path))
+    summaries_pruned = await _drain(lambda limit: async_storage.prune_summaries(keep_summaries, limit, archive_path))
+    mistakes_pruned = await _drain(lambda limit: async_storage.delete_stale_mistakes(cutoff, limit))
+    # llm_cache.db is not behind the memory.db writer thread; one statement per run
+    cache_pruned = await asyncio.to_thread(llm_cache.prune_expired)
+
+    before = await async_storage.get_database_size()
+    free = await async_storage.incremental_vacuum(VACUUM_PAGES)
+    while free:
+        await asyncio.sleep(BATCH_DELAY)
+        previous, free = free, await async_storage.incremental_vacuum(VACUUM_PAGES)
+        if free >= previous:
+            break  # Not in incremental auto-vacuum mode
+    await async_storage.analyze()
+    after = await async_storage.get_database_size()
+
+    result = {
+        "cutoff": cutoff,
+        "summaries_written": summaries,
+        "telegram_deleted": telegram_deleted,
+        "telegram_users_skipped": telegram_skipped,
+        "web_deleted": web_deleted,
+        "summaries_pruned": summaries_pruned,
+        "mistakes_pruned": mistakes_pruned,
+        "cache_pruned": cache_pruned,
+        "pages_freed": before["pages"] - after["pages"],
+        "size_bytes": after["pages"] * after["page_size"],
+    }
+    maintenance_stats["runs"] += 1
+    maintenance_stats["last_run"] = datetime.utcnow().isoformat(timespec="seconds")
+    maintenance_stats["last_duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    maintenance_stats["last"] = result
+    print(f"[Maintenance] {result}")
+    return result
+
+
+async def maintenance_loop(interval=MAINTENANCE_INTERVAL, start_delay=MAINTENANCE_START_DELAY):
+    """Run maintenance forever (started from the server lifespan)."""
+    await asyncio.sleep(start_delay)
+    while True:
+        try:
+            await run_maintenance()
+        except Exception as e:
+            print(f"[Maintenance] Error: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,147 @@
+"""
+Per-student index of recurring mistakes.
+
+After each tutor reply, the corrections it made are extracted (one small
+LLM call on just that exchange) and merged into `student_mistakes` in
+memory.db: the same mistake again only bumps its count and last_seen.
+The prompt gets a compact top-N projection of the index, so recurring
+errors survive summary refreshes without re-reading the history.
+"""
+
+import asyncio
+import json
+import re
+
+from ai.cache import llm_cache
+from ai.router import model_router
+from config import get_openai_client
+from imessage.reader import address_key
+from memory import async_storage
+from ringle.students import DEFAULT_STUDENT, normalize_telegram_id, student_directory
+
+MISTAKES_TOP_N = 5            # Mistakes shown in the prompt
+MAX_MISTAKES_PER_TURN = 5
+MAX_FIELD_LENGTH = 200
+
+CATEGORIES = (
+    "tense", "verb_form", "subject_verb_agreement", "article", "preposition",
+    "plural", "word_order", "word_choice", "spelling", "other",
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_JSON_ARRAY = re.compile(r"\[.*\]", re.DOTALL)
+
+EXTRACT_PROMPT = """A student wrote to their English tutor, and the tutor replied.
+List the student's English mistakes that the tutor corrected (explicitly or by rephrasing).
+Answer with a JSON array only, [] if the tutor corrected nothing. Each item:
+{{"category": one of {categories}, "example": the student's wrong words, "correction": the corrected words}}
+
+Student: {student}
+Tutor: {tutor}
+
+JSON:"""
+
+
+def student_key(phone_number=None, telegram_id=None):
+    """
+    Index key for a student: their student_id when STUDENTS_FILE knows them,
+    otherwise the channel identity. None when the student cannot be identified
+    (e.g. web sessions).
+    """
+    if phone_number is None and telegram_id is None:
+        return None
+    student = student_directory.find(phone_number=phone_number, telegram_id=telegram_id)
+    if student is not DEFAULT_STUDENT:
+        return student.student_id
+    if telegram_id is not None:
+        return f"telegram:{normalize_telegram_id(telegram_id)}"
+    return f"imessage:{address_key(phone_number)}"
+
+
+def correction_key(correction):
+    """Normalized correction, so "I went." and "i went" count as the same mistake."""
+    return _WHITESPACE.sub(" ", correction.lower()).strip(" .!?,")
+
+
+def parse_mistakes(raw):
+    """
+    Validate the extractor's answer.
+
+    Returns:
+        list: Dicts with 'category', 'example', 'correction', 'correction_key'
+    """
+    match = _JSON_ARRAY.search(raw or "")
+    if not match:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return []
+
+    mistakes = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        example = str(item.get("example") or "").strip()[:MAX_FIELD_LENGTH]
+        correction = str(item.get("correction") or "").strip()[:MAX_FIELD_LENGTH]
+        if not example or not correction or correction_key(example) == correction_key(correction):
+            continue
+        category = str(item.get("category") or "").strip().lower().replace(" ", "_").replace("-", "_")
+        mistakes.append({
+            "category": category if category in CATEGORIES else "other",
+            "example": example,
+            "correction": correction,
+            "correction_key": correction_key(correction),
+        })
+    return mistakes[:MAX_MISTAKES_PER_TURN]
+
+
+def extract_mistakes(student_text, tutor_reply):
+    """
+    Corrections the tutor made in one exchange (blocking LLM call).
+
+    Returns:
+        list: See parse_mistakes (empty if the LLM is unavailable)
+    """
+    prompt = EXTRACT_PROMPT.format(categories=", ".join(CATEGORIES), student=student_text, tutor=tutor_reply)
+    try:
+        return parse_mistakes(llm_cache.complete(
+            "mistakes",
+            get_openai_client().chat.completions.create,
+            model=model_router.tier("summary").model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=200,
+            temperature=0,
+        ))
+    except Exception as e:
+        print(f"Error extracting mistakes: {e}")
+        return []
+
+
+async def update_mistake_index(key, student_text, tutor_reply):
+    """Extract this exchange's corrections and merge them into the student's index."""
+    mistakes = await asyncio.to_thread(extract_mistakes, student_text, tutor_reply)
+    if mistakes:
+        await async_storage.record_mistakes(key, mistakes)
+        print(f"[Mistakes] Recorded {len(mistakes)} for {key}")
+    return mistakes
+
+
+def format_mistakes_context(mistakes):
+    """
+    Format the top-N projection for the system prompt.
+
+    Args:
+        mistakes: Results of get_top_mistakes
+
+    Returns:
+        str: Prompt section (empty if there is nothing to add)
+    """
+    if not mistakes:
+        return ""
+    lines = [
+        f"- ({m['category'].replace('_', ' ')}) \"{m['example']}\" -> \"{m['correction']}\""
+        + (f" x{m['count']}" if m["count"] > 1 else "")
+        for m in mistakes
+    ]
+    return "\n\n[Recurring Mistakes]\n" + "\n".join(lines)
@@ -0,0 +1,230 @@
+"""
+Long-term memory retrieval.
+Finds past summaries, key points and messages relevant to the current
+message using the FTS5 index maintained by triggers in memory/storage.py.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+from memory import storage
+
+# Words that match almost everything and only slow the query down
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "you", "your", "with", "that", "this",
+    "have", "has", "had", "but", "not", "what", "how", "can", "could", "would",
+    "will", "just", "about", "from", "they", "them", "there", "then", "its",
+    "it's", "i'm", "is", "to", "of", "in", "on", "at", "a", "an", "it", "me",
+    "my", "we", "so", "do", "be", "or", "if", "no", "yes", "ok", "okay",
+}
+# Terms used per query, rarest first. The conversation is part of the MATCH
+# (its `owner` token), so only that conversation's rows match however common
+# a term is in other conversations.
+MAX_QUERY_TERMS = 16
+# Newest matching rows of the conversation that are ranked. Ranking happens
+# here (BM25 over the cached document counts) rather than with FTS5's bm25(),
+# which walks the whole doclist of every term to compute its IDF.
+MAX_CANDIDATES = 1000
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Document counts change slowly but are costly to compute for common terms
+# (FTS5 walks the whole doclist), so they are cached per process.
+DOC_COUNT_CACHE_SIZE = 50000
+DOC_COUNT_TTL = 600  # seconds
+_doc_counts = OrderedDict()  # term -> (doc_count, fetched_at)
+_doc_counts_lock = threading.Lock()
+
+
+def _fold(text):
+    """Lowercase and strip diacritics, like the index's tokenizer."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def extract_terms(text):
+    """Distinct searchable terms of a message (lowercased, no stopwords)."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < 2 or token in STOPWORDS or token.isdigit() or token in terms:
+            continue
+        terms.append(token)
+    return terms
+
+
+def get_doc_count(cursor, term):
+    """Number of indexed items containing `term` (cached)."""
+    now = time.monotonic()
+    with _doc_counts_lock:
+        cached = _doc_counts.get(term)
+        if cached and now - cached[1] < DOC_COUNT_TTL:
+            _doc_counts.move_to_end(term)
+            return cached[0]
+
+    cursor.execute("SELECT doc FROM memory_fts_vocab WHERE term = ?", (term,))
+    row = cursor.fetchone()
+    doc_count = row[0] if row else 0
+
+    if not doc_count:
+        return 0  # Cheap to look up again, and may appear soon
+
+    with _doc_counts_lock:
+        _doc_counts[term] = (doc_count, now)
+        _doc_counts.move_to_end(term)
+        while len(_doc_counts) > DOC_COUNT_CACHE_SIZE:
+            _doc_counts.popitem(last=False)
+    return doc_count
+
+
+def select_terms(cursor, terms):
+    """
+    Keep the most selective terms: rarest first (by document count across
+    the whole index), at most MAX_QUERY_TERMS. Terms that appear nowhere
+    are dropped.
+    """
+    counts = []
+    for term in terms:
+        doc_count = get_doc_count(cursor, term)
+        if doc_count:
+            counts.append((doc_count, term))
+    return [term for _, term in sorted(counts)[:MAX_QUERY_TERMS]]
+
+
+def rank_candidates(rows, terms, doc_counts, total_docs):
+    """
+    Score matching rows with BM25 (lower is better, like FTS5's bm25()).
+
+    Args:
+        rows: (kind, content) of the candidates, newest first
+        terms: Query terms
+        doc_counts: term -> number of indexed items containing it
+        total_docs: Approximate number of indexed items
+
+    Returns:
+        list: (score, kind, content), best first (newest first on ties)
+    """
+    idf = {}
+    for term in terms:
+        count = doc_counts[term]
+        idf[term] = math.log(1 + (max(total_docs, count) - count + 0.5) / (count + 0.5))
+    tokenized = [Counter(TOKEN_PATTERN.findall(_fold(content))) for _, content in rows]
+    average = sum(sum(tf.values()) for tf in tokenized) / len(tokenized) if tokenized else 1.0
+    ranked = []
+    for (kind, content), tf in zip(rows, tokenized):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(tf.values()) / (average or 1.0))
+        score = sum(idf[term] * tf[term] * (BM25_K1 + 1) / (tf[term] + norm) for term in terms if tf[term])
+        ranked.append((-score, kind, content))
+    ranked.sort(key=lambda item: item[0])
+    return ranked
+
+
+def owner_token(conversation):
+    """The conversation's token in the index's `owner` column (see storage.SEARCH_TRIGGERS)."""
+    return conversation.encode("utf-8").hex().upper()
+
+
+def build_match_query(terms, conversation=None):
+    """
+    Turn terms into an FTS5 MATCH expression: terms OR-ed together in the
+    content column, and-ed with the conversation's owner token when given.
+
+    Returns:
+        str or None: MATCH expression, or None if nothing is searchable
+    """
+    if not terms:
+        return None
+    query = "content : (" + " OR ".join(f'"{term}"' for term in terms) + ")"
+    if conversation is not None:
+        query = f'owner : "{owner_token(conversation)}" AND {query}'
+    return query
+
+
+def search_memory(text, conversation=None, limit=5, exclude=None):
+    """
+    Retrieve the top-k stored items relevant to a message.
+
+    Args:
+        text: Current user message
+        conversation: storage.conversation_key() of the conversation; only its own
+            messages and summaries match (nothing is returned without one)
+        limit: Number of items to return
+        exclude: Optional set of contents to skip (e.g. the recent history
+            that is already in the prompt)
+
+    Returns:
+        List of dicts: {'kind', 'content', 'score'}
+    """
+    terms = extract_terms(text)
+    if conversation is None or not terms or not os.path.exists(storage.DB_PATH):
+        return []
+
+    exclude = exclude or set()
+    conn = sqlite3.connect(storage.DB_PATH)
+    try:
+        cursor = conn.cursor()
+        selected = select_terms(cursor, terms)
+        query = build_match_query(selected, conversation)
+        if not query:
+            return []
+        cursor.execute("""
+        SELECT kind, content
+        FROM memory_fts
+        WHERE memory_fts MATCH ?
+          AND conversation = ?
+        ORDER BY rowid DESC
+        LIMIT ?
+        """, (query, conversation, MAX_CANDIDATES))
+        rows = cursor.fetchall()
+        # Rowids are source id * 4 + 1..3, so this approximates the index size cheaply
+        cursor.execute("SELECT max(rowid) FROM memory_fts")
+        total_docs = (cursor.fetchone()[0] or 0) // 4 + 1
+        doc_counts = {term: get_doc_count(cursor, term) for term in selected}
+    except sqlite3.OperationalError as e:
+        # Index missing (old DB) or a query FTS5 cannot parse
+        print(f"[Search] Memory search failed: {e}")
+        return []
+    finally:
+        conn.close()
+
+    results = []
+    for score, kind, content in rank_candidates(rows, selected, doc_counts, total_docs):
+        if content in exclude:
+            continue
+        results.append({"kind": kind, "content": content, "score": score})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def format_memory_context(items, profile=None):
+    """
+    Format retrieved memory and the user profile for the system prompt.
+
+    Args:
+        items: Results of search_memory
+        profile: Optional dict from get_all_profile_data (only for the student it describes)
+
+    Returns:
+        str: Prompt section (empty if there is nothing to add)
+    """
+    context_text = ""
+
+    if profile:
+        context_text += "\n\n[Student Profile]\n"
+        context_text += "\n".join(f"- {key}: {value}" for key, value in profile.items())
+
+    if items:
+        labels = {"message": "Past message", "summary": "Past summary", "key_points": "Past learning points"}
+        context_text += "\n\n[Relevant Past Conversations]\n"
+        context_text += "\n".join(
+            f"- ({labels.get(item['kind'], item['kind'])}) {item['content']}" for item in items
+        )
+
+    return context_text
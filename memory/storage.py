@@ -5,11 +5,39 @@ Uses SQLite for local storage.
 
 import sqlite3
 import json
+import threading
 from datetime import datetime
 import os
 
+from imessage.reader import address_key
+
 DB_PATH = os.path.expanduser("~/Documents/rngbot/data/memory.db")
 
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Write-through cache of user_profile: (database path, conversation) -> {key: decoded value}.
+# Loaded on first read; save_user_profile keeps it coherent, and
+# invalidate_profile_cache() is the hook for writers outside this process.
+_profile_cache = {}
+_profile_lock = threading.Lock()
+_profile_version = 0  # Bumped by every profile write/invalidation (under _profile_lock)
+
+def conversation_key(service, user_id):
+    """
+    Key a conversation's memory is stored under: "telegram:<id>",
+    "imessage:<address>" (iMessage and SMS share it) or "web:<session>".
+
+    Returns:
+        str or None: None if the conversation is unknown
+    """
+    if user_id is None:
+        return None
+    service = service.lower()
+    if service in ("imessage", "sms"):
+        return f"imessage:{address_key(user_id)}"
+    return f"{service}:{user_id}"
+
+
 def ensure_db_directory():
     """Ensure the database directory exists."""
     db_dir = os.path.dirname(DB_PATH)
@@ -25,7 +53,24 @@ def init_database():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # Freed pages are returned by memory/maintenance.py in small steps
+    # (must be set before the first table is created; older files are converted once)
+    cursor.execute("PRAGMA auto_vacuum")
+    if cursor.fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        cursor.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+        cursor.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        if cursor.fetchone():
+            print("[Storage] Converting database to incremental auto-vacuum (one-time VACUUM)...")
+            cursor.execute("VACUUM")
+    
+    # WAL lets readers proceed while the writer thread commits (persistent per file)
+    cursor.execute("PRAGMA journal_mode = WAL")
+    
     # Conversation summaries table
+    cursor.execute("PRAGMA table_info(conversation_summaries)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and "conversation" not in columns:
+        migrate_summaries_to_conversations(cursor, "user_id" in columns)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS conversation_summaries (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -33,18 +78,35 @@ def init_database():
         message_count INTEGER NOT NULL,
         summary TEXT NOT NULL,
         key_points TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        conversation TEXT -- conversation_key() the summary belongs to (NULL: from before per-conversation memory)
     )
     """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_conversation_summaries_conversation ON conversation_summaries (conversation, id)
+    """)
     
-    # User profile table (for long-term memory)
+    # User profile table (for long-term memory), one profile per student
+    cursor.execute("PRAGMA table_info(user_profile)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and "conversation" not in columns:
+        # The single-student profile becomes unassigned ('') until assign_legacy_memory
+        cursor.execute("ALTER TABLE user_profile RENAME TO user_profile_old")
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS user_profile (
-        key TEXT PRIMARY KEY,
+        conversation TEXT NOT NULL DEFAULT '', -- conversation_key() of the student ('': unassigned)
+        key TEXT NOT NULL,
         value TEXT NOT NULL,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (conversation, key)
     )
     """)
+    if columns and "conversation" not in columns:
+        cursor.execute("""
+        INSERT INTO user_profile (conversation, key, value, updated_at)
+        SELECT '', key, value, updated_at FROM user_profile_old
+        """)
+        cursor.execute("DROP TABLE user_profile_old")
     
     # Telegram messages table (for history)
     cursor.execute("""
@@ -56,13 +118,175 @@ def init_database():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_telegram_messages_user ON telegram_messages (user_id, created_at)
+    """)
+    
+    # Web chat messages (for /ws sessions, when persistence is enabled)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS web_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL, -- 'user' or 'assistant'
+        text TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_web_messages_session ON web_messages (session_id, id)
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_web_messages_created ON web_messages (created_at)
+    """)
+    
+    # Per-student index of corrected mistakes (see memory/mistakes.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS student_mistakes (
+        student_key TEXT NOT NULL,
+        category TEXT NOT NULL,
+        correction_key TEXT NOT NULL, -- Normalized correction, identifies a recurring mistake
+        example TEXT NOT NULL,        -- What the student wrote (latest occurrence)
+        correction TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 1,
+        first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (student_key, category, correction_key)
+    )
+    """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_student_mistakes_top ON student_mistakes (student_key, count DESC, last_seen DESC)
+    """)
+    
+    # Poll cursors (last handled chat.db ROWID per source), survive restarts
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS poll_cursors (
+        source TEXT PRIMARY KEY,
+        last_rowid INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    
+    init_search_index(cursor)
     
     conn.commit()
     conn.close()
     print(f"[Storage] Database initialized at {DB_PATH}")
 
 
-def save_summary(summary, key_points, message_count):
+def migrate_summaries_to_conversations(cursor, has_user_id):
+    """
+    Replace the Telegram-only user_id of conversation_summaries with a
+    conversation key. The search index is dropped and rebuilt from the
+    source tables by init_search_index, with conversation keys.
+    """
+    print("[Storage] Migrating summaries to per-conversation keys...")
+    conversation = "CASE WHEN user_id IS NULL THEN NULL ELSE 'telegram:' || user_id END" if has_user_id else "NULL"
+    cursor.execute("""
+    CREATE TABLE conversation_summaries_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_date TEXT NOT NULL,
+        message_count INTEGER NOT NULL,
+        summary TEXT NOT NULL,
+        key_points TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        conversation TEXT
+    )
+    """)
+    cursor.execute(f"""
+    INSERT INTO conversation_summaries_new (id, session_date, message_count, summary, key_points, created_at, conversation)
+    SELECT id, session_date, message_count, summary, key_points, created_at, {conversation}
+    FROM conversation_summaries
+    """)
+    cursor.execute("DROP TABLE conversation_summaries")  # Also drops its triggers and index
+    cursor.execute("ALTER TABLE conversation_summaries_new RENAME TO conversation_summaries")
+    for trigger in ("telegram_messages_fts_insert", "telegram_messages_fts_delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP TABLE IF EXISTS memory_fts_vocab")
+    cursor.execute("DROP TABLE IF EXISTS memory_fts")
+
+
+# Full-text index over long-term memory (see memory/search.py).
+# Each source row maps to a fixed FTS rowid so triggers can update it cheaply:
+#   telegram message id -> id * 4 + 1
+#   summary id          -> id * 4 + 2 (summary text), id * 4 + 3 (key points)
+# `owner` holds hex(conversation key): a single token, so searches put the
+# conversation in the MATCH itself and only rank that conversation's rows.
+SEARCH_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS telegram_messages_fts_insert AFTER INSERT ON telegram_messages BEGIN
+    INSERT INTO memory_fts(rowid, content, kind, conversation, owner)
+    VALUES (NEW.id * 4 + 1, NEW.text, 'message', 'telegram:' || NEW.user_id, hex('telegram:' || NEW.user_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS telegram_messages_fts_delete AFTER DELETE ON telegram_messages BEGIN
+    DELETE FROM memory_fts WHERE rowid = OLD.id * 4 + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS conversation_summaries_fts_insert AFTER INSERT ON conversation_summaries BEGIN
+    INSERT INTO memory_fts(rowid, content, kind, conversation, owner)
+    VALUES (NEW.id * 4 + 2, NEW.summary, 'summary', NEW.conversation, hex(NEW.conversation));
+    INSERT INTO memory_fts(rowid, content, kind, conversation, owner)
+    SELECT NEW.id * 4 + 3, group_concat(value, char(10)), 'key_points', NEW.conversation, hex(NEW.conversation)
+    FROM json_each(COALESCE(NEW.key_points, '[]'))
+    HAVING count(*) > 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS conversation_summaries_fts_delete AFTER DELETE ON conversation_summaries BEGIN
+    DELETE FROM memory_fts WHERE rowid IN (OLD.id * 4 + 2, OLD.id * 4 + 3);
+END;
+"""
+
+
+def init_search_index(cursor):
+    """
+    Create the FTS5 index and the triggers that keep it updated on write.
+    Existing rows are indexed once, when the index is first created.
+    """
+    cursor.execute("PRAGMA table_info(memory_fts)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and "owner" not in columns:
+        # Index from before the conversation was searchable: rebuild it
+        for trigger in ("telegram_messages_fts_insert", "conversation_summaries_fts_insert"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE IF EXISTS memory_fts_vocab")
+        cursor.execute("DROP TABLE memory_fts")
+        columns = []
+    exists = bool(columns)
+    
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+        content,
+        kind UNINDEXED,     -- 'message', 'summary' or 'key_points'
+        conversation UNINDEXED,  -- conversation_key() of the source row
+        owner,              -- hex(conversation): one token per conversation
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """)
+    # Per-term document counts, used to skip terms that match too much
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts_vocab USING fts5vocab(memory_fts, 'row')
+    """)
+    cursor.executescript(SEARCH_TRIGGERS)
+    
+    if not exists:
+        # Backfill rows written before the index existed
+        cursor.execute("""
+        INSERT INTO memory_fts(rowid, content, kind, conversation, owner)
+        SELECT id * 4 + 1, text, 'message', 'telegram:' || user_id, hex('telegram:' || user_id) FROM telegram_messages
+        """)
+        cursor.execute("""
+        INSERT INTO memory_fts(rowid, content, kind, conversation, owner)
+        SELECT id * 4 + 2, summary, 'summary', conversation, hex(conversation) FROM conversation_summaries
+        """)
+        cursor.execute("""
+        INSERT INTO memory_fts(rowid, content, kind, conversation, owner)
+        SELECT s.id * 4 + 3, group_concat(j.value, char(10)), 'key_points', s.conversation, hex(s.conversation)
+        FROM conversation_summaries s, json_each(COALESCE(s.key_points, '[]')) j
+        GROUP BY s.id
+        """)
+        print("[Storage] Built memory search index")
+
+
+def save_summary(summary, key_points, message_count, conversation=None, created_at=None):
     """
     Save a conversation summary to the database.
     
@@ -70,18 +294,22 @@ def save_summary(summary, key_points, message_count):
         summary: Text summary of conversation
         key_points: List of key learning points
         message_count: Current message count
+        conversation: conversation_key() the summary belongs to
+        created_at: UTC timestamp of the summarized conversation (default: now).
+            Roll-ups of old messages pass the last message's time so they never
+            count as the conversation's latest summary.
     """
     ensure_db_directory()
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    session_date = datetime.now().strftime("%Y-%m-%d")
+    session_date = created_at[:10] if created_at else datetime.now().strftime("%Y-%m-%d")
     key_points_json = json.dumps(key_points, ensure_ascii=False)
     
     cursor.execute("""
-    INSERT INTO conversation_summaries (session_date, message_count, summary, key_points)
-    VALUES (?, ?, ?, ?)
-    """, (session_date, message_count, summary, key_points_json))
+    INSERT INTO conversation_summaries (session_date, message_count, summary, key_points, conversation, created_at)
+    VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    """, (session_date, message_count, summary, key_points_json, conversation, created_at))
     
     conn.commit()
     summary_id = cursor.lastrowid
@@ -91,12 +319,13 @@ def save_summary(summary, key_points, message_count):
     return summary_id
 
 
-def load_recent_summaries(limit=5):
+def load_recent_summaries(limit=5, conversation=None):
     """
     Load recent conversation summaries.
     
     Args:
         limit: Number of recent summaries to load
+        conversation: conversation_key() whose summaries to load (None: untagged legacy ones)
     
     Returns:
         List of dicts with summary data
@@ -110,9 +339,10 @@ def load_recent_summaries(limit=5):
     cursor.execute("""
     SELECT id, session_date, message_count, summary, key_points, created_at
     FROM conversation_summaries
-    ORDER BY created_at DESC
+    WHERE conversation IS ?
+    ORDER BY created_at DESC, id DESC
     LIMIT ?
-    """, (limit,))
+    """, (conversation, limit))
     
     rows = cursor.fetchall()
     conn.close()
@@ -132,19 +362,95 @@ def load_recent_summaries(limit=5):
     return summaries
 
 
-def get_latest_summary():
-    """Get the most recent summary."""
-    summaries = load_recent_summaries(limit=1)
+def get_latest_summary(conversation=None):
+    """Get the most recent summary of a conversation."""
+    summaries = load_recent_summaries(limit=1, conversation=conversation)
     return summaries[0] if summaries else None
 
 
-def save_user_profile(key, value):
+def assign_legacy_memory(conversation):
+    """
+    Give summaries and profile entries saved before per-conversation memory
+    (untagged) to their conversation: the configured student's, from the
+    single-student setup. Entries the student already has are kept.
+
+    Returns:
+        int: Summaries and profile entries assigned
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    assigned = cursor.execute(
+        "UPDATE conversation_summaries SET conversation = ? WHERE conversation IS NULL", (conversation,)
+    ).rowcount
+    if assigned:
+        cursor.execute("UPDATE memory_fts SET conversation = ?, owner = hex(?) WHERE conversation IS NULL",
+                       (conversation, conversation))
+    profile = cursor.execute(
+        "UPDATE OR IGNORE user_profile SET conversation = ? WHERE conversation = ''", (conversation,)
+    ).rowcount
+    cursor.execute("DELETE FROM user_profile WHERE conversation = ''")
+    conn.commit()
+    conn.close()
+    
+    if profile:
+        invalidate_profile_cache(conversation=conversation)
+        invalidate_profile_cache(conversation="")
+    if assigned or profile:
+        print(f"[Storage] Assigned {assigned} untagged summaries and {profile} profile entries to {conversation}")
+    return assigned + profile
+
+
+def _decode_profile_value(value):
+    """Parse a stored profile value as JSON when possible."""
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+
+
+def _get_profile_cache(conversation):
+    """
+    Return the cached profile of a conversation, loading it on first use.
+    The SQLite read happens outside the lock; the result is only installed
+    if no profile write happened meanwhile (otherwise it is read again), so
+    a concurrent save_user_profile is never overwritten by a stale load.
+    """
+    cache_key = (DB_PATH, conversation)
+    while True:
+        with _profile_lock:
+            cache = _profile_cache.get(cache_key)
+            if cache is not None:
+                return cache
+            version = _profile_version
+        
+        if not os.path.exists(DB_PATH):
+            return None
+        
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT key, value FROM user_profile WHERE conversation = ?", (conversation,))
+        rows = cursor.fetchall()
+        conn.close()
+        loaded = {key: _decode_profile_value(value) for key, value in rows}
+        
+        with _profile_lock:
+            cache = _profile_cache.get(cache_key)
+            if cache is not None:
+                return cache  # Another reader installed it first
+            if version == _profile_version:
+                _profile_cache[cache_key] = loaded
+                return loaded
+
+
+def save_user_profile(key, value, conversation=""):
     """
     Save or update a user profile entry.
     
     Args:
         key: Profile key (e.g., 'learning_goal', 'level')
         value: Profile value (will be JSON encoded if dict/list)
+        conversation: conversation_key() of the student the profile describes
+            ("": not assigned to a student yet)
     """
     ensure_db_directory()
     conn = sqlite3.connect(DB_PATH)
@@ -155,106 +461,178 @@ def save_user_profile(key, value):
         value = json.dumps(value, ensure_ascii=False)
     
     cursor.execute("""
-    INSERT INTO user_profile (key, value, updated_at)
-    VALUES (?, ?, CURRENT_TIMESTAMP)
-    ON CONFLICT(key) DO UPDATE SET
+    INSERT INTO user_profile (conversation, key, value, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(conversation, key) DO UPDATE SET
         value = excluded.value,
         updated_at = CURRENT_TIMESTAMP
-    """, (key, value))
+    """, (conversation, key, value))
     
     conn.commit()
     conn.close()
-    print(f"[Storage] Updated profile: {key}")
+    
+    # Write-through: keep the cache identical to what a reload would return
+    global _profile_version
+    with _profile_lock:
+        _profile_version += 1
+        cache = _profile_cache.get((DB_PATH, conversation))
+        if cache is not None:
+            cache[key] = _decode_profile_value(value)
+    print(f"[Storage] Updated profile: {key} ({conversation or 'unassigned'})")
 
 
-def load_user_profile(key):
+def load_user_profile(key, conversation=""):
     """
-    Load a user profile entry.
+    Load a user profile entry (served from the profile cache).
     
     Args:
         key: Profile key
+        conversation: conversation_key() of the student
     
     Returns:
         Value (parsed from JSON if applicable) or None
     """
-    if not os.path.exists(DB_PATH):
+    cache = _get_profile_cache(conversation)
+    if cache is None:
         return None
+    with _profile_lock:
+        return cache.get(key)
+
+
+def get_all_profile_data(conversation=""):
+    """Get a student's profile data (a copy of their profile cache)."""
+    cache = _get_profile_cache(conversation)
+    if cache is None:
+        return {}
+    with _profile_lock:
+        return dict(cache)
+
+
+def invalidate_profile_cache(key=None, conversation=None):
+    """
+    Drop cached profile data after the table was changed by another writer
+    (another process, a migration script, manual SQL...).
+    
+    Args:
+        key: Reload just this key of `conversation`; None drops the whole profile
+        conversation: Student whose profile changed; None drops every cached profile
+    """
+    global _profile_version
+    with _profile_lock:
+        _profile_version += 1
+        if conversation is None:
+            for cache_key in [k for k in _profile_cache if k[0] == DB_PATH]:
+                del _profile_cache[cache_key]
+            return
+        if key is None:
+            _profile_cache.pop((DB_PATH, conversation), None)
+            return
+        
+        cache = _profile_cache.get((DB_PATH, conversation))
+        if cache is None:
+            return  # Nothing cached yet; next read loads everything
+        
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM user_profile WHERE conversation = ? AND key = ?", (conversation, key))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            cache[key] = _decode_profile_value(row[0])
+        else:
+            cache.pop(key, None)
+
+
+def save_telegram_message(user_id, role, text):
+    """
+    Save a Telegram message to history.
     
+    Returns:
+        int: Row id of the saved message
+    """
+    ensure_db_directory()
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("SELECT value FROM user_profile WHERE key = ?", (key,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if not row:
-        return None
+    cursor.execute("""
+    INSERT INTO telegram_messages (user_id, role, text)
+    VALUES (?, ?, ?)
+    """, (user_id, role, text))
+    message_id = cursor.lastrowid
     
-    value = row[0]
-    # Try to parse as JSON
-    try:
-        return json.loads(value)
-    except (json.JSONDecodeError, TypeError):
-        return value
+    conn.commit()
+    conn.close()
+    return message_id
 
 
-def get_all_profile_data():
-    """Get all user profile data."""
-    if not os.path.exists(DB_PATH):
-        return {}
+def get_telegram_history(user_id, limit=20, until_id=None):
+    """
+    Get recent Telegram history for a user.
+    Returns list of dicts: {'role': ..., 'content': ...}
     
+    Args:
+        until_id: Row id of the message being answered. User messages saved
+            after it (still waiting for their own turn) are left out, and it
+            comes last, after the replies to earlier messages.
+    """
+    if not os.path.exists(DB_PATH):
+        return []
+        
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("SELECT key, value FROM user_profile")
+    cursor.execute("""
+    SELECT role, text
+    FROM telegram_messages
+    WHERE user_id = ? AND (? IS NULL OR role != 'user' OR id <= ?)
+    ORDER BY id = ? DESC, created_at DESC, id DESC
+    LIMIT ?
+    """, (user_id, until_id, until_id, until_id, limit))
+    
     rows = cursor.fetchall()
     conn.close()
     
-    profile = {}
-    for key, value in rows:
-        try:
-            profile[key] = json.loads(value)
-        except (json.JSONDecodeError, TypeError):
-            profile[key] = value
-    
-    return profile
+    # Return in chronological order (oldest first)
+    history = [{"role": row[0], "content": row[1]} for row in rows]
+    return history[::-1]
 
 
-def save_telegram_message(user_id, role, text):
+def save_web_message(session_id, role, text):
     """
-    Save a Telegram message to history.
+    Save a web chat message to history.
     """
     ensure_db_directory()
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute("""
-    INSERT INTO telegram_messages (user_id, role, text)
+    INSERT INTO web_messages (session_id, role, text)
     VALUES (?, ?, ?)
-    """, (user_id, role, text))
+    """, (session_id, role, text))
     
     conn.commit()
     conn.close()
 
 
-def get_telegram_history(user_id, limit=20):
+def get_web_history(session_id, limit=20):
     """
-    Get recent Telegram history for a user.
+    Get recent web chat history for a session.
     Returns list of dicts: {'role': ..., 'content': ...}
     """
     if not os.path.exists(DB_PATH):
         return []
-        
+    
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute("""
     SELECT role, text
-    FROM telegram_messages
-    WHERE user_id = ?
-    ORDER BY created_at DESC
+    FROM web_messages
+    WHERE session_id = ?
+    ORDER BY id DESC
     LIMIT ?
-    """, (user_id, limit))
+    """, (session_id, limit))
     
     rows = cursor.fetchall()
     conn.close()
@@ -262,3 +640,282 @@ def get_telegram_history(user_id, limit=20):
     # Return in chronological order (oldest first)
     history = [{"role": row[0], "content": row[1]} for row in rows]
     return history[::-1]
+
+
+def save_poll_cursor(source, last_rowid):
+    """
+    Persist a poll cursor (e.g. "imessage:+821012345678").
+    """
+    ensure_db_directory()
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+    INSERT OR REPLACE INTO poll_cursors (source, last_rowid, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    """, (source, last_rowid))
+    
+    conn.commit()
+    conn.close()
+
+
+def load_poll_cursor(source):
+    """
+    Load a poll cursor.
+    Returns the last handled ROWID, or None if the source was never polled.
+    """
+    if not os.path.exists(DB_PATH):
+        return None
+    
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT last_rowid FROM poll_cursors WHERE source = ?", (source,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    return row[0] if row else None
+
+
+def delete_poll_cursor(source):
+    """Remove a poll cursor (e.g. once a catch-up has finished)."""
+    if not os.path.exists(DB_PATH):
+        return
+    
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM poll_cursors WHERE source = ?", (source,))
+    conn.commit()
+    conn.close()
+
+
+def record_mistakes(student_key, mistakes):
+    """
+    Add corrected mistakes to a student's index.
+    A mistake already in the index (same category and correction) has its
+    count incremented and its example and last_seen updated.
+
+    Args:
+        student_key: Student identifier (see memory.mistakes.student_key)
+        mistakes: List of dicts with 'category', 'example', 'correction' and 'correction_key'
+
+    Returns:
+        int: Mistakes recorded
+    """
+    if not mistakes:
+        return 0
+    ensure_db_directory()
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany("""
+    INSERT INTO student_mistakes (student_key, category, correction_key, example, correction)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (student_key, category, correction_key) DO UPDATE SET
+        count = count + 1,
+        example = excluded.example,
+        correction = excluded.correction,
+        last_seen = CURRENT_TIMESTAMP
+    """, [(student_key, m["category"], m["correction_key"], m["example"], m["correction"]) for m in mistakes])
+    conn.commit()
+    conn.close()
+    return len(mistakes)
+
+
+def get_top_mistakes(student_key, limit=5):
+    """
+    A student's most frequent mistakes (most recent first on ties).
+
+    Returns:
+        list: Dicts with 'category', 'example', 'correction', 'count', 'last_seen'
+    """
+    if not os.path.exists(DB_PATH):
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("""
+    SELECT category, example, correction, count, last_seen
+    FROM student_mistakes
+    WHERE student_key = ?
+    ORDER BY count DESC, last_seen DESC
+    LIMIT ?
+    """, (student_key, limit)).fetchall()
+    conn.close()
+    return [{"category": row[0], "example": row[1], "correction": row[2], "count": row[3], "last_seen": row[4]}
+            for row in rows]
+
+
+# Retention (see memory/maintenance.py). Each call is one short transaction
+# so the maintenance job never holds the writer for long.
+
+def _archive_rows(cursor, archive_path, table, columns, where, params):
+    """Copy matching rows into the same table of the archive database."""
+    cursor.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT {columns} FROM main.{table} WHERE 0")
+    cursor.execute(f"INSERT INTO archive.{table} SELECT {columns} FROM main.{table} WHERE {where}", params)
+
+
+def get_expired_telegram_users(cutoff):
+    """
+    Telegram users with messages older than `cutoff`.
+
+    Args:
+        cutoff: UTC timestamp string ('YYYY-MM-DD HH:MM:SS')
+    """
+    if not os.path.exists(DB_PATH):
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(
+        "SELECT DISTINCT user_id FROM telegram_messages WHERE created_at < ? ORDER BY user_id", (cutoff,)
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def get_expired_telegram_messages(user_id, cutoff, limit):
+    """
+    Oldest messages of a Telegram user older than `cutoff`.
+
+    Returns:
+        list: [(id, role, text, created_at)] oldest first
+    """
+    if not os.path.exists(DB_PATH):
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute("""
+    SELECT id, role, text, created_at
+    FROM telegram_messages
+    WHERE user_id = ? AND created_at < ?
+    ORDER BY created_at, id
+    LIMIT ?
+    """, (user_id, cutoff, limit)).fetchall()
+    conn.close()
+    return rows
+
+
+def delete_telegram_messages(ids, archive_path=None):
+    """
+    Delete Telegram messages by id (after they were rolled into a summary).
+
+    Args:
+        ids: Message ids
+        archive_path: Optional SQLite file that receives the rows first
+
+    Returns:
+        int: Rows deleted
+    """
+    if not ids:
+        return 0
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    where = f"id IN ({','.join('?' * len(ids))})"
+    if archive_path:
+        _archive_rows(cursor, archive_path, "telegram_messages", "id, user_id, role, text, created_at", where, ids)
+    cursor.execute(f"DELETE FROM telegram_messages WHERE {where}", ids)
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+
+def delete_expired_web_messages(cutoff, limit, archive_path=None):
+    """
+    Delete up to `limit` web messages older than `cutoff`.
+
+    Returns:
+        int: Rows deleted
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    ids = [row[0] for row in cursor.execute(
+        "SELECT id FROM web_messages WHERE created_at < ? ORDER BY created_at LIMIT ?", (cutoff, limit))]
+    if ids:
+        where = f"id IN ({','.join('?' * len(ids))})"
+        if archive_path:
+            _archive_rows(cursor, archive_path, "web_messages", "id, session_id, role, text, created_at", where, ids)
+        cursor.execute(f"DELETE FROM web_messages WHERE {where}", ids)
+    conn.commit()
+    conn.close()
+    return len(ids)
+
+
+def prune_summaries(keep, limit, archive_path=None):
+    """
+    Delete up to `limit` summaries beyond the newest `keep` of each conversation
+    (by conversation key).
+
+    Returns:
+        int: Rows deleted
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    ids = [row[0] for row in cursor.execute("""
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY conversation ORDER BY created_at DESC, id DESC) AS position
+        FROM conversation_summaries
+    )
+    WHERE position > ?
+    ORDER BY id
+    LIMIT ?
+    """, (keep, limit))]
+    if ids:
+        where = f"id IN ({','.join('?' * len(ids))})"
+        if archive_path:
+            _archive_rows(cursor, archive_path, "conversation_summaries",
+                          "id, session_date, message_count, summary, key_points, created_at, conversation", where, ids)
+        cursor.execute(f"DELETE FROM conversation_summaries WHERE {where}", ids)
+    conn.commit()
+    conn.close()
+    return len(ids)
+
+
+def delete_stale_mistakes(cutoff, limit):
+    """
+    Delete up to `limit` one-off mistakes not seen since `cutoff`.
+
+    Returns:
+        int: Rows deleted
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.execute("""
+    DELETE FROM student_mistakes WHERE rowid IN (
+        SELECT rowid FROM student_mistakes WHERE count = 1 AND last_seen < ? LIMIT ?
+    )
+    """, (cutoff, limit))
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+
+def incremental_vacuum(pages):
+    """
+    Return up to `pages` free pages to the file system.
+
+    Returns:
+        int: Free pages left
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.close()
+    return remaining
+
+
+def analyze(limit=400):
+    """Refresh query planner statistics (sampling at most `limit` rows per index)."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(f"PRAGMA analysis_limit = {int(limit)}")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def get_database_size():
+    """
+    Returns:
+        dict: {'pages', 'free_pages', 'page_size'} of memory.db
+    """
+    conn = sqlite3.connect(DB_PATH)
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    return {"pages": pages, "free_pages": free, "page_size": page_size}
@@ -3,12 +3,9 @@ Conversation summarization for mid-term memory.
 Generates and manages conversation summaries to maintain context efficiently.
 """
 
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from config import get_openai_client
+from ai.cache import llm_cache
+from ai.router import model_router
 
 
 def generate_summary(message_history):
@@ -43,13 +40,15 @@ def generate_summary(message_history):
 요약:"""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        # Same window as last time (restart, no new messages) is served from the cache
+        summary = llm_cache.complete(
+            "summary",
+            get_openai_client().chat.completions.create,
+            model=model_router.tier("summary").model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=300,
             temperature=0.3
-        )
-        summary = response.choices[0].message.content.strip()
+        ).strip()
         print(f"[Summary Generated] {summary}")
         return summary
     except Exception as e:
@@ -84,13 +83,14 @@ def extract_key_points(message_history):
 학습 포인트 (각 줄에 하나씩):"""
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        points_text = llm_cache.complete(
+            "key_points",
+            get_openai_client().chat.completions.create,
+            model=model_router.tier("summary").model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
             temperature=0.3
-        )
-        points_text = response.choices[0].message.content.strip()
+        ).strip()
         # Split by newlines and clean
         key_points = [p.strip() for p in points_text.split('\n') if p.strip()]
         print(f"[Key Points Extracted] {len(key_points)} points")
@@ -0,0 +1,239 @@
+"""
+Student context for the tutor prompt.
+
+Student, tutor and last-class records are bulk-loaded from STUDENTS_FILE
+(JSON, CSV, or a SQLite database with a `students` table) and indexed by
+phone number and Telegram id. The rendered system prompt is cached per
+student with a TTL, so the per-turn lookup is two dictionary reads.
+Without STUDENTS_FILE, the demo student from ringle/mock_data.py is used.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from config import get_settings
+from ringle import mock_data
+
+PROMPT_CACHE_TTL = 10 * 60  # Seconds a rendered prompt is reused
+STUDENTS_TABLE = "students"
+
+Student = namedtuple("Student", ["student_id", "name", "phone_number", "telegram_id", "tutor_name", "last_class_topic"])
+
+DEFAULT_STUDENT = Student(
+    student_id="default",
+    name=mock_data.STUDENT_NAME,
+    phone_number=None,
+    telegram_id=None,
+    tutor_name=mock_data.TUTOR_NAME,
+    last_class_topic=mock_data.LAST_CLASS_TOPIC,
+)
+
+SYSTEM_PROMPT_TEMPLATE = (
+    "You are an AI English Tutor for Ringle. Your name is RingleBot.\n"
+    "Your student is {student_name}. Her last class was with Tutor '{tutor_name}' on the topic '{topic}'.\n"
+    "Your goal is to help her practice English naturally.\n"
+    "1. ALWAYS respond in English only, even if the student writes in Korean.\n"
+    "2. Correct her grammar naturally in the flow of conversation.\n"
+    "3. Reference her last class context ({tutor_name}, {topic}) where appropriate to reinforce learning.\n"
+    "4. If she struggles or asks for more help, suggest booking a class with {tutor_name}.\n"
+    "5. Keep responses concise and conversational, suitable for a chat interface.\n"
+    "6. Be encouraging and friendly.\n"
+    "7. IMPORTANT: If you can see previous messages in the conversation history, continue the conversation naturally WITHOUT greeting again. Only greet when it's truly the first message or after a long break."
+)
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone_number):
+    """Digits only, so "+82 10-1234-5678" and "+821012345678" match."""
+    if not phone_number:
+        return None
+    return _NON_DIGITS.sub("", str(phone_number)) or None
+
+
+def normalize_telegram_id(telegram_id):
+    if telegram_id is None or telegram_id == "":
+        return None
+    return str(telegram_id).strip()
+
+
+def render_prompt(student):
+    return SYSTEM_PROMPT_TEMPLATE.format(
+        student_name=student.name,
+        tutor_name=student.tutor_name,
+        topic=student.last_class_topic,
+    )
+
+
+def _to_student(row, index):
+    """Build a Student from a dict-like record (missing fields use the demo student's)."""
+    def field(name):
+        value = row.get(name)
+        return value if value not in (None, "") else None
+
+    return Student(
+        student_id=str(field("student_id") or field("id") or index),
+        name=field("name") or DEFAULT_STUDENT.name,
+        phone_number=field("phone_number"),
+        telegram_id=field("telegram_id"),
+        tutor_name=field("tutor_name") or DEFAULT_STUDENT.tutor_name,
+        last_class_topic=field("last_class_topic") or DEFAULT_STUDENT.last_class_topic,
+    )
+
+
+def load_records(path):
+    """
+    Read student records from a JSON list, a CSV file or a SQLite database.
+
+    Returns:
+        list of dict
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        if not isinstance(records, list) or not all(isinstance(row, dict) for row in records):
+            raise ValueError("expected a JSON list of student objects")
+        return records
+    if extension == ".csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            return list(csv.DictReader(f))
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(f"SELECT * FROM {STUDENTS_TABLE}")]
+    finally:
+        conn.close()
+
+
+class StudentDirectory:
+    """
+    In-memory index of students with a per-student prompt cache.
+
+    Args:
+        path: Data file; defaults to STUDENTS_FILE
+        ttl: Seconds a rendered prompt is cached
+    """
+
+    def __init__(self, path=None, ttl=PROMPT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.by_id = {}
+        self.by_phone = {}
+        self.by_telegram = {}
+        self.loaded = False
+        self._prompts = {}  # student_id -> (expires_at, prompt)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        self.unloaded_lookups = 0  # Lookups answered before the directory was loaded
+
+    def load(self):
+        """
+        (Re)load all records and rebuild the indexes.
+
+        Returns:
+            int: Number of students loaded
+        """
+        path = self.path or get_settings().students_file
+        students = []
+        if path:
+            try:
+                students = [_to_student(row, i) for i, row in enumerate(load_records(path), 1)]
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"[Students] Could not load {path}: {e}")
+
+        by_id, by_phone, by_telegram = {}, {}, {}
+        for student in students:
+            by_id[student.student_id] = student
+            phone = normalize_phone(student.phone_number)
+            if phone:
+                by_phone[phone] = student
+            telegram_id = normalize_telegram_id(student.telegram_id)
+            if telegram_id:
+                by_telegram[telegram_id] = student
+
+        with self._lock:
+            self.by_id, self.by_phone, self.by_telegram = by_id, by_phone, by_telegram
+            self._prompts.clear()
+            self.loaded = True
+        print(f"[Students] Loaded {len(by_id)} students" + (f" from {path}" if path else " (demo student only)"))
+        return len(by_id)
+
+    def _ensure_loaded(self):
+        """
+        Load on first use, but never on the event loop: the app loads the
+        directory in a thread before its channels start, so a lookup that
+        gets here first is answered from the (empty) index instead of
+        blocking every conversation on file I/O.
+        """
+        if self.loaded:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.load()
+            return
+        if not self.unloaded_lookups:
+            print("[Students] Lookup before the directory was loaded; using the demo student")
+        self.unloaded_lookups += 1
+
+    def find(self, phone_number=None, telegram_id=None):
+        """
+        Look up a student by phone number or Telegram id.
+
+        Returns:
+            Student (the demo student if nobody matches)
+        """
+        self._ensure_loaded()
+        if telegram_id is not None:
+            student = self.by_telegram.get(normalize_telegram_id(telegram_id))
+            if student:
+                return student
+        if phone_number:
+            student = self.by_phone.get(normalize_phone(phone_number))
+            if student:
+                return student
+        return DEFAULT_STUDENT
+
+    def phone_numbers(self):
+        """Phone numbers of all loaded students, as written in the data file."""
+        self._ensure_loaded()
+        return [student.phone_number for student in self.by_id.values() if student.phone_number]
+
+    def get_system_prompt(self, phone_number=None, telegram_id=None):
+        """Rendered system prompt for the student, served from the cache while fresh."""
+        student = self.find(phone_number, telegram_id)
+        now = time.monotonic()
+        cached = self._prompts.get(student.student_id)
+        if cached and cached[0] > now:
+            self.stats["hits"] += 1
+            return cached[1]
+
+        self.stats["misses"] += 1
+        prompt = render_prompt(student)
+        self._prompts[student.student_id] = (now + self.ttl, prompt)
+        return prompt
+
+    def invalidate(self, student_id=None):
+        """Drop cached prompts (all of them, or one student's)."""
+        with self._lock:
+            if student_id is None:
+                self._prompts.clear()
+            else:
+                self._prompts.pop(str(student_id), None)
+
+    def metrics(self):
+        return {"students": len(self.by_id), "cached_prompts": len(self._prompts),
+                "unloaded_lookups": self.unloaded_lookups, **self.stats}
+
+
+# Global student directory
+student_directory = StudentDirectory()
@@ -0,0 +1,32 @@
+"""
+Production entry point.
+
+    python serve.py --workers 4
+
+Runs one server process (HTTP, WebSockets, Telegram, iMessage polling and
+the single memory.db writer) plus N pipeline worker processes; every
+conversation is pinned to one worker (see workers.py). Development keeps
+using `python main.py`, which runs everything in one process with reload.
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run RingleBot with pipeline worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "0")) or os.cpu_count() or 1,
+                        help="Pipeline worker processes (default: WORKERS or CPU count)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # Read by config.get_settings() when main is imported
+    os.environ["WORKERS"] = str(args.workers)
+    uvicorn.run("main:app", host=args.host, port=args.port, reload=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import time
 from enum import Enum
 
+CONTEXT_IDLE_TTL = 7 * 24 * 60 * 60  # Seconds before an idle conversation's context is dropped
+WEB_CONTEXT_IDLE_TTL = 30 * 60       # Web sessions come and go (same as channels.web.SESSION_IDLE_TTL)
+
 
 class UserState(Enum):
     """User conversation state."""
@@ -47,19 +51,26 @@ class Context:
             self.key_points = key_points
         print(f"[Context Updated] Summary length: {len(summary)} chars, Key points: {len(self.key_points)}")
 
-    def save_summary_to_db(self):
-        """Save current summary to database."""
+    def save_summary_to_db(self, conversation=None):
+        """Save current summary to database, tagged with its conversation key."""
         from memory.storage import save_summary
         if self.conversation_summary:
-            save_summary(self.conversation_summary, self.key_points, self.message_count)
+            save_summary(self.conversation_summary, self.key_points, self.message_count, conversation)
+
+    async def save_summary_to_db_async(self, conversation=None):
+        """Save current summary to database without blocking the event loop."""
+        from memory import async_storage
+        if self.conversation_summary:
+            await async_storage.save_summary(self.conversation_summary, self.key_points, self.message_count,
+                                             conversation)
 
-    def load_latest_summary(self):
-        """Load the most recent summary from database on startup."""
+    def load_latest_summary(self, conversation=None):
+        """Load the conversation's most recent summary from database on startup."""
         if self._loaded_initial_summary:
             return  # Only load once
         
         from memory.storage import get_latest_summary
-        latest = get_latest_summary()
+        latest = get_latest_summary(conversation)
         
         if latest:
             self.conversation_summary = latest['summary']
@@ -126,15 +137,18 @@ class Context:
         self.current_state = UserState.WAITING
         print(f"[Context] User message language: {detected_lang}, state: {self.current_state.value}")
     
-    def start_response_session(self):
+    def start_response_session(self, session_id=None):
         """
         Start a new response session.
         Call this when bot starts generating a response.
         
+        Args:
+            session_id: Id to use (default: this context's next id)
+        
         Returns:
             int: New session ID
         """
-        self.response_session_id += 1
+        self.response_session_id = session_id if session_id is not None else self.response_session_id + 1
         self.current_state = UserState.BOT_RESPONDING
         print(f"[Context] Started response session {self.response_session_id}")
         return self.response_session_id
@@ -155,5 +169,67 @@ class Context:
         self.key_points = []
         print("[Context Reset]")
 
-# Global context instance
-context = Context()
+
+class ConversationContexts:
+    """
+    One Context per conversation, keyed by conversation_key() (the memory.db key),
+    so students never share a summary, a message counter or a language.
+    Response session ids stay unique across conversations. Contexts idle
+    for longer than their TTL are dropped by prune(); a returning student's
+    summary is reloaded from memory.db.
+    """
+
+    def __init__(self):
+        self.contexts = {}
+        self.last_used = {}  # conversation -> time.monotonic() of the last get()
+        self.last_session_id = 0
+        self.evicted = 0
+
+    def get(self, conversation):
+        """Context of a conversation (created on first use; load_latest_summary fills it)."""
+        ctx = self.contexts.get(conversation)
+        if ctx is None:
+            ctx = self.contexts[conversation] = Context()
+        self.last_used[conversation] = time.monotonic()
+        return ctx
+
+    def prune(self, now=None):
+        """
+        Drop idle contexts: web sessions after WEB_CONTEXT_IDLE_TTL, students
+        after CONTEXT_IDLE_TTL. A context in the middle of a turn is kept.
+
+        Returns:
+            int: Contexts dropped
+        """
+        now = now if now is not None else time.monotonic()
+        expired = []
+        for conversation, ctx in self.contexts.items():
+            ttl = WEB_CONTEXT_IDLE_TTL if (conversation or "").startswith("web:") else CONTEXT_IDLE_TTL
+            if ctx.current_state == UserState.IDLE and now - self.last_used.get(conversation, now) > ttl:
+                expired.append(conversation)
+        for conversation in expired:
+            del self.contexts[conversation]
+            self.last_used.pop(conversation, None)
+        self.evicted += len(expired)
+        return len(expired)
+
+    def items(self):
+        return list(self.contexts.items())
+
+    def start_response_session(self, ctx):
+        """Start a response session on `ctx` with an id no other conversation has used."""
+        self.last_session_id = max(self.last_session_id, ctx.response_session_id) + 1
+        return ctx.start_response_session(self.last_session_id)
+
+    def is_any_busy(self):
+        """Check if the bot is responding in any conversation."""
+        return any(ctx.is_bot_busy() for ctx in self.contexts.values())
+
+    def reset(self):
+        self.contexts.clear()
+        self.last_used.clear()
+        self.last_session_id = 0
+
+
+# Global registry of this process's conversation contexts
+contexts = ConversationContexts()
@@ -0,0 +1,97 @@
+"""
+Per-turn latency budget.
+
+A TurnDeadline is created when a user message arrives and passed down the
+pipeline. The budget is split into consecutive stages; each stage must end
+by its checkpoint, so time saved by an early stage carries over to the
+later ones. LLM request timeouts are derived from these checkpoints.
+"""
+
+import time
+
+from config import get_settings
+
+TURN_BUDGET_SECONDS = get_settings().turn_budget_seconds
+
+# Fraction of the budget for each stage, in pipeline order
+STAGE_SPLIT = (
+    ("history", 0.10),     # Load conversation history
+    ("generation", 0.60),  # Primary LLM reply
+    ("fallback", 0.15),    # Cheaper reply if the primary one missed its deadline
+    ("delivery", 0.15),    # Last chunk actually sent (checked by the channel's sender)
+)
+
+# Process-wide deadline counters (exposed via /metrics)
+deadline_stats = {
+    "turns": 0,
+    "fallbacks": 0,
+    "misses": {stage: 0 for stage, _ in STAGE_SPLIT},
+}
+
+
+class TurnDeadline:
+    def __init__(self, budget=None, split=STAGE_SPLIT):
+        self.budget = budget if budget is not None else TURN_BUDGET_SECONDS
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.budget
+        self.missed = set()
+
+        # Absolute checkpoint (monotonic time) at which each stage must end
+        self.checkpoints = {}
+        elapsed = 0.0
+        for stage, fraction in split:
+            elapsed += fraction
+            self.checkpoints[stage] = self.started_at + self.budget * elapsed
+
+        deadline_stats["turns"] += 1
+
+    def stage_deadline(self, stage):
+        """Monotonic time by which `stage` must finish."""
+        return self.checkpoints[stage]
+
+    def stage_timeout(self, stage):
+        """Seconds left for `stage` (0 if its checkpoint has passed)."""
+        return max(0.0, self.checkpoints[stage] - time.monotonic())
+
+    def remaining(self):
+        """Seconds left in the whole turn."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage):
+        """
+        Record a miss if `stage` finished after its checkpoint.
+
+        Returns:
+            bool: True if the stage was on time
+        """
+        if time.monotonic() <= self.checkpoints[stage]:
+            return True
+        self.record_miss(stage)
+        return False
+
+    def record_miss(self, stage):
+        """Count a deadline miss for `stage` (once per turn)."""
+        if stage in self.missed:
+            return
+        self.missed.add(stage)
+        deadline_stats["misses"][stage] += 1
+        print(f"[Deadline] Missed {stage} deadline ({time.monotonic() - self.started_at:.2f}s into turn)")
+
+    def record_fallback(self):
+        deadline_stats["fallbacks"] += 1
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+
+def get_deadline_metrics():
+    """Copy of the deadline counters."""
+    return {
+        "turn_budget": TURN_BUDGET_SECONDS,
+        "turns": deadline_stats["turns"],
+        "fallbacks": deadline_stats["fallbacks"],
+        "misses": dict(deadline_stats["misses"]),
+    }
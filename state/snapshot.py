@@ -0,0 +1,273 @@
+"""
+Snapshots of the conversation contexts across restarts.
+
+Contexts live in process memory, so a restart used to reset the summary
+cadence (message_count) and the response session ids, and warming up
+meant re-querying memory.db. Every conversation's context is now written
+periodically to a small binary file and restored at startup;
+load_latest_summary is only the fallback when there is no usable snapshot
+(or for conversations the snapshot does not have).
+
+Format: a fixed header (magic, version, saved_at, CRC32 of the payload)
+followed by a zlib-compressed payload: the last response session id and
+the number of contexts, then one record per conversation (its key, packed
+integers and length-prefixed UTF-8 strings). Files are replaced
+atomically (temp file + os.replace), and a snapshot is only written when
+a context changed. Each process keeps its own file: pipeline workers own
+their own contexts.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import struct
+import time
+import zlib
+
+from memory import storage
+from state.context import UserState, contexts
+
+MAGIC = b"RCTX"
+VERSION = 2
+SNAPSHOT_INTERVAL = 30.0  # seconds between snapshots
+
+_HEADER = struct.Struct("<4sBdI")   # magic, version, saved_at, crc32(payload)
+_COUNTS = struct.Struct("<II")      # last response session id, context count
+_FIELDS = struct.Struct("<IIB2sH")  # message_count, response_session_id, state, language, key point count
+_LENGTH = struct.Struct("<I")
+_STATES = list(UserState)
+
+snapshot_stats = {
+    "writes": 0,
+    "unchanged": 0,
+    "errors": 0,
+    "last_bytes": 0,
+    "last_contexts": 0,
+    "last_write_ms": None,
+    "restored": False,
+    "restore_ms": None,
+    "evicted_contexts": 0,
+}
+
+
+def snapshot_path(directory=None):
+    """
+    Snapshot file of this process: context.snapshot for the server,
+    context.<worker name>.snapshot for pipeline workers.
+
+    Args:
+        directory: Where to keep snapshots (default: next to memory.db)
+    """
+    directory = directory or os.path.dirname(storage.DB_PATH)
+    name = multiprocessing.current_process().name
+    filename = "context.snapshot" if name == "MainProcess" else f"context.{name}.snapshot"
+    return os.path.join(directory, filename)
+
+
+def _pack_text(text):
+    data = text.encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_text(payload, offset):
+    (length,) = _LENGTH.unpack_from(payload, offset)
+    offset += _LENGTH.size
+    return payload[offset:offset + length].decode("utf-8"), offset + length
+
+
+def _encode_record(conversation, ctx):
+    """Pack one conversation's context (None is stored as an empty key)."""
+    key_points = [str(point) for point in ctx.key_points]
+    record = _pack_text(conversation or "")
+    record += _FIELDS.pack(
+        ctx.message_count,
+        ctx.response_session_id,
+        _STATES.index(ctx.current_state),
+        ctx.current_language.encode("ascii")[:2],
+        len(key_points),
+    )
+    record += _pack_text(ctx.conversation_summary)
+    record += b"".join(_pack_text(point) for point in key_points)
+    return record
+
+
+def _decode_record(payload, offset):
+    conversation, offset = _unpack_text(payload, offset)
+    message_count, session_id, state, language, point_count = _FIELDS.unpack_from(payload, offset)
+    summary, offset = _unpack_text(payload, offset + _FIELDS.size)
+    key_points = []
+    for _ in range(point_count):
+        point, offset = _unpack_text(payload, offset)
+        key_points.append(point)
+    return conversation or None, {
+        "message_count": message_count,
+        "response_session_id": session_id,
+        "state": _STATES[state],
+        "language": language.rstrip(b"\0").decode("ascii"),
+        "summary": summary,
+        "key_points": key_points,
+    }, offset
+
+
+def encode_contexts(registry, saved_at=None):
+    """
+    Serialize the persistent part of every context in a ConversationContexts.
+
+    Returns:
+        bytes: Snapshot file contents
+    """
+    items = registry.items()
+    payload = _COUNTS.pack(registry.last_session_id, len(items))
+    payload += b"".join(_encode_record(conversation, ctx) for conversation, ctx in items)
+    payload = zlib.compress(payload)
+    saved_at = saved_at if saved_at is not None else time.time()
+    return _HEADER.pack(MAGIC, VERSION, saved_at, zlib.crc32(payload)) + payload
+
+
+def decode_contexts(data):
+    """
+    Parse snapshot file contents.
+
+    Returns:
+        dict: saved_at, last_session_id and contexts ({conversation: dict of
+            message_count, response_session_id, state, language, summary, key_points})
+
+    Raises:
+        ValueError: Not a snapshot, unknown version or corrupt payload
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("snapshot too short")
+    magic, version, saved_at, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"unsupported snapshot ({magic!r}, version {version})")
+    payload = data[_HEADER.size:]
+    if zlib.crc32(payload) != crc:
+        raise ValueError("snapshot checksum mismatch")
+    try:
+        payload = zlib.decompress(payload)
+        last_session_id, count = _COUNTS.unpack_from(payload)
+        offset = _COUNTS.size
+        records = {}
+        for _ in range(count):
+            conversation, record, offset = _decode_record(payload, offset)
+            records[conversation] = record
+    except (zlib.error, struct.error, UnicodeDecodeError, IndexError) as e:
+        raise ValueError(f"corrupt snapshot: {e}") from e
+    return {"saved_at": saved_at, "last_session_id": last_session_id, "contexts": records}
+
+
+class ContextSnapshots:
+    """
+    Writes and restores the snapshot file of a process's contexts.
+
+    Args:
+        registry: The ConversationContexts to snapshot
+        path: Snapshot file (default: snapshot_path())
+    """
+
+    def __init__(self, registry, path=None):
+        self.registry = registry
+        self._path = path
+        self._last_payload = None
+
+    @property
+    def path(self):
+        return self._path or snapshot_path()
+
+    def save(self):
+        """
+        Write a snapshot if a context changed since the last one.
+
+        Returns:
+            bool: True if a file was written
+        """
+        started = time.perf_counter()
+        data = encode_contexts(self.registry)
+        payload = data[_HEADER.size:]
+        if payload == self._last_payload:
+            snapshot_stats["unchanged"] += 1
+            return False
+
+        path = self.path
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            snapshot_stats["errors"] += 1
+            print(f"[Snapshot] Write failed: {e}")
+            return False
+
+        self._last_payload = payload
+        snapshot_stats["writes"] += 1
+        snapshot_stats["last_bytes"] = len(data)
+        snapshot_stats["last_contexts"] = len(self.registry.contexts)
+        snapshot_stats["last_write_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return True
+
+    def restore(self):
+        """
+        Load the snapshot into the contexts.
+        Turns do not survive a restart, so an in-flight state comes back as IDLE.
+
+        Returns:
+            bool: True if restored (False: no snapshot or unusable, use load_latest_summary)
+        """
+        started = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"[Snapshot] Read failed: {e}")
+            return False
+        try:
+            snapshot = decode_contexts(data)
+        except ValueError as e:
+            print(f"[Snapshot] Ignoring {self.path}: {e}")
+            return False
+
+        registry = self.registry
+        for conversation, record in snapshot["contexts"].items():
+            ctx = registry.get(conversation)
+            ctx.message_count = record["message_count"]
+            ctx.response_session_id = record["response_session_id"]
+            ctx.current_language = record["language"]
+            ctx.current_state = UserState.IDLE
+            ctx.conversation_summary = record["summary"]
+            ctx.key_points = record["key_points"]
+            ctx._loaded_initial_summary = True
+        registry.last_session_id = max(registry.last_session_id, snapshot["last_session_id"])
+        self._last_payload = data[_HEADER.size:]
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        snapshot_stats["restored"] = True
+        snapshot_stats["restore_ms"] = elapsed_ms
+        print(f"[Snapshot] Restored {len(snapshot['contexts'])} contexts in {elapsed_ms}ms "
+              f"(last session: {registry.last_session_id})")
+        return True
+
+
+async def snapshot_loop(snapshots, interval=SNAPSHOT_INTERVAL):
+    """
+    Save a snapshot every `interval` seconds (and once more when cancelled).
+    Idle contexts are pruned first (on the loop, where turns use them), so
+    finished web sessions do not stay in every snapshot.
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            snapshot_stats["evicted_contexts"] += snapshots.registry.prune()
+            await asyncio.to_thread(snapshots.save)
+    except asyncio.CancelledError:
+        snapshots.save()
+        raise
+
+
+# Global instance for this process's contexts
+context_snapshots = ContextSnapshots(contexts)
@@ -1,21 +1,29 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from config import get_settings
 
 class User:
     def __init__(self):
-        self.phone_number = os.getenv("TARGET_PHONE_NUMBER")
+        settings = get_settings()
+        # TARGET_PHONE_NUMBER may list several numbers, comma-separated
+        numbers = [n.strip() for n in (settings.target_phone_number or "").split(",") if n.strip()]
+        self.phone_number = numbers[0] if numbers else None
+        self.other_phone_numbers = numbers[1:]
+        self.students_file = settings.students_file
         self.name = "Kwon"  # Could be dynamic later
         
         # Trigger configuration
-        self.trigger_prefix = os.getenv("TRIGGER_PREFIX", "/")
+        self.trigger_prefix = settings.trigger_prefix
         # Default to True as requested
-        self.use_trigger = os.getenv("USE_TRIGGER", "True").lower() == "true"
+        self.use_trigger = settings.use_trigger
+
+    @property
+    def phone_numbers(self):
+        """All configured iMessage/SMS numbers (primary first)."""
+        return ([self.phone_number] if self.phone_number else []) + self.other_phone_numbers
 
     def validate(self):
-        if not self.phone_number:
-            raise ValueError("TARGET_PHONE_NUMBER not set in .env")
+        # Students' numbers come from STUDENTS_FILE when no target is configured
+        if not self.phone_number and not self.students_file:
+            raise ValueError("TARGET_PHONE_NUMBER (or STUDENTS_FILE) not set in .env")
 
 # Global user instance
 user = User()
@@ -0,0 +1,45 @@
+"""
+Test script for the async storage facade.
+Uses a temporary database so the real memory.db is untouched.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory import storage, async_storage
+
+
+def test_async_roundtrip(tmp_path, monkeypatch):
+    """Writes and reads through the facade match the sync API."""
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+
+    async def run():
+        await async_storage.init_database()
+        # Many conversations writing at once still land in order per user
+        await asyncio.gather(*[
+            async_storage.save_telegram_message(user_id, "user", f"hello {i}")
+            for user_id in (1, 2, 3)
+            for i in range(5)
+        ])
+        await async_storage.save_summary("Practiced emails.", ["Use 'Dear'"], 5)
+        history = await async_storage.get_telegram_history(2, limit=20)
+        latest = await async_storage.get_latest_summary()
+        return history, latest
+
+    try:
+        history, latest = asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    assert len(history) == 5
+    assert history == storage.get_telegram_history(2, limit=20)
+    assert latest["summary"] == "Practiced emails."
+    print("✓ Async storage roundtrip")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
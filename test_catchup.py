@@ -0,0 +1,115 @@
+"""
+Test script for the persisted poll cursor and catch-up after downtime.
+Uses a tiny chat.db built in a temporary directory and a stubbed pipeline.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from channels.imessage import IMessageChannel
+from channels.runtime import ChannelRuntime
+from imessage import catchup, reader
+from imessage.catchup import read_backlog, coalesce_backlog, cursor_source, backlog_source
+from memory import storage, async_storage
+
+PHONE = "+821012345678"
+
+
+def make_chat_db(path, texts):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT, service TEXT);
+    CREATE TABLE chat (ROWID INTEGER PRIMARY KEY);
+    CREATE TABLE chat_handle_join (chat_id INTEGER, handle_id INTEGER);
+    CREATE TABLE chat_message_join (chat_id INTEGER, message_id INTEGER);
+    CREATE TABLE message (ROWID INTEGER PRIMARY KEY, text TEXT, attributedBody BLOB, handle_id INTEGER,
+                          is_from_me INTEGER, date INTEGER);
+    INSERT INTO handle VALUES (1, '+821012345678', 'iMessage');
+    INSERT INTO chat VALUES (1);
+    INSERT INTO chat_handle_join VALUES (1, 1);
+    """)
+    add_messages(conn, texts)
+    conn.close()
+
+
+def add_messages(conn, texts):
+    for text in texts:
+        cursor = conn.execute("INSERT INTO message (text, handle_id, is_from_me, date) "
+                              "VALUES (?, 1, 0, (SELECT COUNT(*) FROM message))", (text,))
+        conn.execute("INSERT INTO chat_message_join VALUES (1, ?)", (cursor.lastrowid,))
+    conn.commit()
+
+
+def test_backlog_is_read_in_pages_and_coalesced(tmp_path):
+    path = tmp_path / "chat.db"
+    make_chat_db(path, [f"message {i}" for i in range(1, 11)] + [None])
+    conn = sqlite3.connect(path)
+
+    backlog, total = asyncio.run(read_backlog(conn, reader.resolve_handles(conn, [PHONE]), 3, 11,
+                                              page_size=3, max_messages=4))
+    assert total == 8
+    rows = backlog[PHONE]
+    assert [r[1] for r in rows] == ["message 7", "message 8", "message 9", "message 10"]
+    assert coalesce_backlog(rows) == (10, "iMessage", "message 7\nmessage 8\nmessage 9\nmessage 10")
+    assert coalesce_backlog([]) is None
+    print("✓ Paged backlog read")
+
+
+def test_poller_resumes_from_saved_cursor(tmp_path, monkeypatch):
+    chat_db = tmp_path / "chat.db"
+    make_chat_db(chat_db, ["answered before shutdown"])
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    # Saved by a single-number setup, before the shared cursor existed
+    storage.save_poll_cursor(cursor_source(PHONE), 1)
+
+    # Sent while the bot was down
+    conn = sqlite3.connect(chat_db)
+    add_messages(conn, ["are you there?", "I goed to the office today"])
+    conn.close()
+
+    turns = []
+
+    async def fake_run_turn(text, service, conn, reply_callback, rowid=None, history=None, **kwargs):
+        turns.append((text, rowid, [m["content"] for m in history or []]))
+
+    monkeypatch.setattr(reader, "DB_PATH", str(chat_db))
+    monkeypatch.setattr(main, "run_turn", fake_run_turn)
+    monkeypatch.setattr(main.user, "phone_number", PHONE)
+    monkeypatch.setattr(catchup, "catchup_pacer", catchup.CatchUpPacer(interval=0))
+
+    async def run():
+        runtime = ChannelRuntime(main.handle_channel_message, workers=2)
+        runtime.add_channel(IMessageChannel(lambda: [PHONE]))
+        await runtime.start()
+        for _ in range(100):
+            await asyncio.sleep(0.05)
+            if turns and await async_storage.load_poll_cursor(backlog_source()) is None:
+                break
+        await runtime.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    # One coalesced turn for the backlog, not one per message
+    assert turns == [(
+        "are you there?\nI goed to the office today",
+        None,
+        ["answered before shutdown", "are you there?", "I goed to the office today"],
+    )]
+    assert storage.load_poll_cursor(cursor_source()) == 3
+    assert storage.load_poll_cursor(backlog_source()) is None
+    assert storage.load_poll_cursor(cursor_source(PHONE)) is None
+    print("✓ Catch-up after downtime")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
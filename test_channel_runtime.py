@@ -0,0 +1,133 @@
+"""
+Test script for the channel runtime (channels/runtime.py).
+Uses an in-memory channel and a stubbed pipeline.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from channels.base import BaseChannel
+from channels.runtime import ChannelRuntime
+
+
+class ListChannel(BaseChannel):
+    """Yields a fixed list of (sender_id, text) messages."""
+
+    name = "Test"
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.done_calls = []
+
+    async def connect(self):
+        pass
+
+    async def status(self):
+        return "connected"
+
+    async def listen(self):
+        for sender_id, text in self.messages:
+            yield sender_id, text, {"text": text}
+
+    async def send(self, target, message, metadata=None):
+        pass
+
+    async def typing(self, target):
+        pass
+
+    async def done(self, sender_id, metadata):
+        self.done_calls.append(metadata["text"])
+
+
+async def wait_for(predicate, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_order_per_conversation_and_concurrency_across():
+    messages = [("alice", f"a{i}") for i in range(3)] + [("bob", f"b{i}") for i in range(3)]
+    channel = ListChannel(messages)
+    events = []
+    running = set()
+    overlap = []
+
+    async def pipeline(channel, sender_id, text, metadata):
+        assert sender_id not in running, "two turns of one conversation at once"
+        running.add(sender_id)
+        overlap.append(len(running))
+        events.append((sender_id, text))
+        await asyncio.sleep(0.02)
+        running.discard(sender_id)
+        if text == "b1":
+            raise RuntimeError("pipeline failure")
+
+    async def run():
+        runtime = ChannelRuntime(pipeline, workers=4)
+        runtime.add_channel(channel)
+        await runtime.start()
+        await wait_for(lambda: len(channel.done_calls) == len(messages))
+        metrics = runtime.metrics()
+        await runtime.stop()
+        return metrics
+
+    metrics = asyncio.run(run())
+    assert [text for sender, text in events if sender == "alice"] == ["a0", "a1", "a2"]
+    assert [text for sender, text in events if sender == "bob"] == ["b0", "b1", "b2"]
+    assert max(overlap) == 2
+    # A failing turn is counted and acknowledged, and the conversation goes on
+    assert sorted(channel.done_calls) == sorted(text for _, text in messages)
+    assert metrics["processed"] == 5 and metrics["failed"] == 1
+    assert metrics["conversations"] == 0
+    print("✓ In order per conversation, concurrent across conversations")
+
+
+def test_full_conversation_folds_its_overflow():
+    messages = [("alice", f"a{i}") for i in range(6)] + [("bob", "b0")]
+    channel = ListChannel([])
+    processed = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def pipeline(channel, sender_id, text, metadata):
+            if sender_id == "alice":
+                await gate.wait()
+            processed.append((sender_id, text, metadata["text"]))
+
+        runtime = ChannelRuntime(pipeline, workers=2, queue_limit=2)
+        runtime.add_channel(channel)
+        await runtime.start()
+        await runtime.submit(channel, "alice", "a0", {"text": "a0"})
+        await wait_for(lambda: runtime.active == 1)
+        # One of alice's turns in the pipeline, two waiting; her overflow does not hold up bob
+        for sender_id, text in messages[1:]:
+            await runtime.submit(channel, sender_id, text, {"text": text})
+        await wait_for(lambda: ("bob", "b0", "b0") in processed)
+        queued = runtime.metrics()["queued"]
+        gate.set()
+        await wait_for(lambda: len(channel.done_calls) == len(messages))
+        metrics = runtime.metrics()
+        await runtime.stop()
+        return queued, metrics
+
+    queued, metrics = asyncio.run(run())
+    assert queued == 2
+    assert metrics["received"] == 7 and metrics["coalesced"] == 3
+    # Folded messages become one turn carrying the newest metadata
+    assert [entry for entry in processed if entry[0] == "alice"] == [
+        ("alice", "a0", "a0"), ("alice", "a1", "a1"), ("alice", "a2\na3\na4\na5", "a5"),
+    ]
+    # Every message is acknowledged, folded ones included
+    assert sorted(channel.done_calls) == sorted(text for _, text in messages)
+    print("✓ Per-conversation backpressure")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
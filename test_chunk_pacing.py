@@ -0,0 +1,147 @@
+"""
+Test script for the typing-delay scheduler (imessage/manager.py ChunkPacer).
+Uses a fixed natural delay and a fake clock; nothing is sent.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from imessage import manager as manager_module
+from imessage.manager import ChunkPacer, MessageManager
+
+ALICE = "+821055556666"
+BOB = "+821077778888"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_generation_time_counts_towards_the_delay(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(manager_module.time, "monotonic", clock)
+    pacer = ChunkPacer(delay=lambda text: 2.0)
+
+    # Fast generation: only the rest of the natural delay is added
+    pacer.start_turn(ALICE, 1, arrived_at=clock.now)
+    clock.now += 0.5
+    pacer.queued(ALICE, 1)
+    assert pacer.wait_time(ALICE, 1, "hi") == 1.5
+    clock.now += 1.5
+    pacer.sent(ALICE, 1)
+
+    # Next chunk is paced from the previous send
+    clock.now += 0.25
+    assert pacer.wait_time(ALICE, 1, "more") == 1.75
+    clock.now += 1.75
+    pacer.sent(ALICE, 1)
+
+    # Slow generation: already late, the first chunk goes out at once
+    pacer.start_turn(ALICE, 2, arrived_at=clock.now)
+    clock.now += 4.0
+    pacer.queued(ALICE, 2)
+    assert pacer.wait_time(ALICE, 2, "sorry") == 0.0
+
+    metrics = pacer.metrics()
+    assert metrics["chunks"] == 3 and metrics["turns"] == 2
+    assert metrics["immediate_first_chunks"] == 1
+    assert metrics["natural_delay"] == 6.0
+    assert metrics["removed_delay"] == 0.5 + 0.25 + 2.0
+    assert metrics["last_generation_time"] == 4.0 and metrics["avg_generation_time"] == 2.25
+    print("✓ Generation time credited")
+
+
+def test_chunks_outside_a_turn_get_the_full_delay(monkeypatch):
+    pacer = ChunkPacer(delay=lambda text: 2.0)
+    assert pacer.wait_time(ALICE, 0, "system notice") == 2.0
+
+    # A superseded session does not borrow the new turn's clock
+    pacer.start_turn(ALICE, 5, arrived_at=0.0)
+    assert pacer.wait_time(ALICE, 4, "stale") == 2.0
+    assert pacer.metrics()["removed_delay"] == 0.0
+    print("✓ Unpaced chunks")
+
+
+def test_manager_sleeps_only_the_remaining_delay(monkeypatch):
+    sent, sleeps = [], []
+    monkeypatch.setattr(manager_module, "send_message", lambda target, text, service: sent.append(text))
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(manager_module.asyncio, "sleep", fake_sleep)
+
+    async def run():
+        manager = MessageManager()
+        manager.pacer.delay = lambda text: 1.0
+        task = asyncio.create_task(manager.start())
+        # The user's message arrived 3s ago: generation already took longer than typing would
+        manager.set_session(1, ALICE, started_at=manager_module.time.monotonic() - 3.0)
+        manager.add_message(ALICE, "first")
+        manager.add_message(ALICE, "second")
+        await manager.queue.join()
+        await manager.stop()
+        task.cancel()
+        return manager.get_queue_status()["pacing"]
+
+    pacing = asyncio.run(run())
+    assert sent == ["first", "second"]
+    # First chunk: no sleep; second chunk: about the full delay after the first went out
+    assert len(sleeps) == 1 and 0.9 < sleeps[0] <= 1.0
+    assert pacing["immediate_first_chunks"] == 1
+    assert pacing["last_generation_time"] >= 3.0
+    print("✓ MessageManager pacing")
+
+
+def test_recipients_are_paced_and_sent_independently(monkeypatch):
+    sent = []
+    alice_blocked = threading.Event()
+
+    def fake_send(target, text, service):
+        if target == ALICE:
+            alice_blocked.wait(1.0)  # A slow osascript call for Alice only
+        sent.append((target, text))
+
+    monkeypatch.setattr(manager_module, "send_message", fake_send)
+
+    async def run():
+        manager = MessageManager()
+        manager.pacer.delay = lambda text: 0.2 if text.startswith("alice") else 0.0
+        task = asyncio.create_task(manager.start())
+        manager.set_session(1, ALICE)
+        manager.add_message(ALICE, "alice 1")
+        manager.set_session(2, BOB)
+        manager.add_message(BOB, "bob 1")
+        manager.add_message(BOB, "bob 2")
+        # Bob's chunks neither wait for Alice's pacing nor for her blocked send
+        start = time.monotonic()
+        while len(sent) < 2 and time.monotonic() - start < 2.0:
+            await asyncio.sleep(0.01)
+        bob_done = time.monotonic() - start
+        alice_blocked.set()
+        await manager.queue.join()
+        await manager.stop()
+        task.cancel()
+        return bob_done
+
+    bob_done = asyncio.run(run())
+    assert sent[:2] == [(BOB, "bob 1"), (BOB, "bob 2")]
+    assert sent[2] == (ALICE, "alice 1")
+    assert bob_done < 0.2
+    print("✓ Per-recipient senders")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,63 @@
+"""
+Test script for channel-aware chunk packing (SMS segments, Telegram limit).
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai.packing import pack_chunks, sms_segments, utf16_length
+
+
+def test_sms_segment_count():
+    assert sms_segments("a" * 160) == 1
+    assert sms_segments("a" * 161) == 2
+    assert sms_segments("a" * 306) == 2
+    assert sms_segments("a" * 307) == 3
+    # Extension characters take two septets
+    assert sms_segments("€" * 80) == 1
+    assert sms_segments("€" * 81) == 2
+    # One Korean character switches the whole message to UCS-2
+    assert sms_segments("가" * 70) == 1
+    assert sms_segments("a" * 69 + "가" * 2) == 2
+    # Emoji are surrogate pairs and are never split across parts
+    assert sms_segments("😀" * 35) == 1
+    assert sms_segments("😀" * 34 + "a" * 67) == 3
+    print("✓ SMS segment count")
+
+
+def test_sms_packing_minimizes_segments():
+    chunks = ["a" * 100, "b" * 100, "c" * 100]
+    packed = pack_chunks(chunks, "SMS")
+    assert sum(sms_segments(m) for m in packed) == 2
+    assert "".join(packed).replace("\n", "") == "".join(chunks)
+
+    # Merging would not save a segment: chunks stay separate messages
+    assert pack_chunks(["a" * 100, "b" * 100], "SMS") == ["a" * 100, "b" * 100]
+    assert pack_chunks(["Good job!", "Try again."], "SMS") == ["Good job!\nTry again."]
+
+    # Oversized chunks are split at whitespace, within the segment cap
+    long_text = " ".join(["안녕하세요"] * 200)
+    packed = pack_chunks([long_text], "SMS")
+    assert all(sms_segments(m) <= 10 for m in packed)
+    assert " ".join(m.replace("\n", " ") for m in packed) == long_text
+    print("✓ SMS packing")
+
+
+def test_channel_limits():
+    text = ("word " * 3000).strip()
+    packed = pack_chunks([text], "Telegram")
+    assert len(packed) == 4
+    assert all(utf16_length(m) <= 4096 for m in packed)
+    assert " ".join(packed) == text
+
+    chunks = ["Hello there!", text]
+    assert pack_chunks(chunks, "Web") == chunks
+    assert pack_chunks(chunks, "iMessage") == chunks
+    print("✓ Channel limits")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,156 @@
+"""
+Test script for context snapshots (state/snapshot.py).
+Snapshots and memory.db live in a temporary directory.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from memory import storage
+from state import snapshot
+from state import context as context_module
+from state.context import ConversationContexts, UserState
+from state.snapshot import ContextSnapshots, decode_contexts, encode_contexts
+
+ALICE = "imessage:821011112222"
+BOB = "telegram:7"
+
+
+def busy_contexts():
+    registry = ConversationContexts()
+    ctx = registry.get(ALICE)
+    ctx.message_count = 7
+    registry.start_response_session(ctx)
+    ctx.current_language = "ko"
+    ctx.update_summary("학생이 부산 여행 이야기를 했다. Practiced past tense.",
+                       ["went, not goed", "an email"])
+    bob = registry.get(BOB)
+    bob.message_count = 2
+    registry.start_response_session(bob)
+    bob.finish_response_session()
+    bob.update_summary("Bob is preparing for IELTS.")
+    return registry
+
+
+def test_binary_round_trip():
+    registry = busy_contexts()
+    data = encode_contexts(registry, saved_at=1700000000.0)
+    assert data[:4] == snapshot.MAGIC
+    assert decode_contexts(data) == {
+        "saved_at": 1700000000.0,
+        "last_session_id": 2,
+        "contexts": {
+            ALICE: {
+                "message_count": 7,
+                "response_session_id": 1,
+                "state": UserState.BOT_RESPONDING,
+                "language": "ko",
+                "summary": registry.get(ALICE).conversation_summary,
+                "key_points": ["went, not goed", "an email"],
+            },
+            BOB: {
+                "message_count": 2,
+                "response_session_id": 2,
+                "state": UserState.IDLE,
+                "language": "en",
+                "summary": "Bob is preparing for IELTS.",
+                "key_points": [],
+            },
+        },
+    }
+
+    for broken in (b"", b"JUNK" + data[4:], data[:-3], data[:-1] + bytes([data[-1] ^ 1])):
+        try:
+            decode_contexts(broken)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted a broken snapshot: {broken[:8]!r}")
+    print(f"✓ Round trip ({len(data)} bytes)")
+
+
+def test_restore_after_restart(tmp_path):
+    path = str(tmp_path / "context.snapshot")
+    writer = ContextSnapshots(busy_contexts(), path=path)
+    assert writer.save()
+    assert not writer.save()  # Unchanged contexts: no write
+    assert not os.path.exists(path + ".tmp")
+
+    restarted = ConversationContexts()
+    assert ContextSnapshots(restarted, path=path).restore()
+    alice, bob = restarted.get(ALICE), restarted.get(BOB)
+    assert alice.message_count == 7 and alice.response_session_id == 1
+    assert alice.current_language == "ko"
+    assert alice.key_points == ["went, not goed", "an email"]
+    # Each conversation keeps its own summary
+    assert bob.conversation_summary == "Bob is preparing for IELTS." and bob.message_count == 2
+    # The interrupted turn does not survive the restart
+    assert alice.current_state == UserState.IDLE
+    # The summary cadence continues where it stopped, and session ids stay unique
+    alice.increment_message_count()
+    assert alice.message_count == 8
+    assert restarted.start_response_session(alice) == 3
+    print("✓ Restored after restart")
+
+
+def test_missing_or_corrupt_snapshot_falls_back_to_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    monkeypatch.setattr(main.user, "phone_number", "+821011112222")
+    storage.save_summary("summary from memory.db", ["point"], 5, conversation=ALICE)
+
+    registry = ConversationContexts()
+    snapshots = ContextSnapshots(registry)
+    assert snapshots.path == str(tmp_path / "context.snapshot")
+    assert not snapshots.restore()
+
+    with open(snapshots.path, "wb") as f:
+        f.write(b"RCTX truncated")
+    assert not snapshots.restore()
+
+    # Startup (prepare_worker) takes the fallback path
+    monkeypatch.setattr(main, "contexts", registry)
+    monkeypatch.setattr(main, "context_snapshots", snapshots)
+    monkeypatch.setattr(main, "ping_llm", lambda: None)
+
+    async def start():
+        await main.prepare_worker()
+        main.snapshot_task.cancel()
+        await asyncio.gather(main.snapshot_task, return_exceptions=True)
+
+    try:
+        asyncio.run(start())
+    finally:
+        main.async_storage.shutdown()
+    assert registry.get(ALICE).conversation_summary == "summary from memory.db"
+
+    # Cancelling the loop wrote a fresh snapshot, used on the next start
+    warm = ConversationContexts()
+    assert ContextSnapshots(warm, path=snapshots.path).restore()
+    assert warm.get(ALICE).conversation_summary == "summary from memory.db"
+    print("✓ Falls back to load_latest_summary")
+
+
+def test_idle_contexts_leave_the_snapshot():
+    registry = busy_contexts()
+    web = "web:" + "a" * 32
+    registry.get(web).message_count = 1
+    now = context_module.time.monotonic()
+
+    # A finished web session goes after its TTL; students and busy turns stay
+    assert registry.prune(now + context_module.WEB_CONTEXT_IDLE_TTL + 1) == 1
+    assert web not in decode_contexts(encode_contexts(registry))["contexts"]
+    assert set(registry.contexts) == {ALICE, BOB}
+
+    assert registry.prune(now + context_module.CONTEXT_IDLE_TTL + 1) == 1
+    assert set(registry.contexts) == {ALICE}  # Still in the middle of a turn
+    assert registry.evicted == 2
+    print("✓ Idle contexts evicted")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,100 @@
+"""
+Test script for per-turn deadlines and the fallback reply.
+A fake OpenAI client stands in for the API.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai import chat
+from imessage import manager as manager_module
+from imessage.manager import MessageManager
+from ai.governor import RequestGovernor
+from state.deadline import TurnDeadline, deadline_stats
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class SlowPrimaryClient:
+    """Primary requests hang until their timeout; short ones answer at once."""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, timeout=None, max_tokens=None):
+        self.requests.append({"timeout": timeout, "max_tokens": max_tokens, "messages": len(messages)})
+        if max_tokens != chat.FALLBACK_MAX_TOKENS:
+            time.sleep(timeout)
+            raise TimeoutError("request timed out")
+        return completion("Quick answer!")
+
+
+def test_stage_checkpoints_carry_over():
+    deadline = TurnDeadline(budget=10.0)
+    # Each checkpoint is cumulative, so generation can use unspent history time
+    assert deadline.stage_timeout("history") <= 1.0
+    assert 6.9 < deadline.stage_timeout("generation") <= 7.0
+    assert deadline.stage_timeout("delivery") <= 10.0
+    print("✓ Stage checkpoints")
+
+
+def test_fallback_after_generation_deadline(monkeypatch):
+    fake = SlowPrimaryClient()
+    monkeypatch.setattr(chat, "get_openai_client", lambda: fake)
+    monkeypatch.setattr(chat, "llm_governor", RequestGovernor())
+    history = [{"role": "user", "content": f"message {i}"} for i in range(20)]
+    misses_before = deadline_stats["misses"]["generation"]
+    fallbacks_before = deadline_stats["fallbacks"]
+
+    deadline = TurnDeadline(budget=0.5)
+    reply = chat.generate_response("system", history, deadline=deadline)
+
+    assert reply == "Quick answer!"
+    # Primary got a timeout derived from the budget, not the client default
+    assert fake.requests[0]["timeout"] <= 0.35
+    # Fallback is short: capped tokens and trimmed history
+    assert fake.requests[-1]["max_tokens"] == chat.FALLBACK_MAX_TOKENS
+    assert fake.requests[-1]["messages"] == chat.FALLBACK_HISTORY_LIMIT + 1
+    assert deadline_stats["misses"]["generation"] == misses_before + 1
+    assert deadline_stats["fallbacks"] == fallbacks_before + 1
+    assert not deadline.expired()
+    print("✓ Fallback reply within budget")
+
+
+def test_delivery_is_checked_when_chunks_are_sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(manager_module, "send_message", lambda target, text, service: sent.append(text))
+    misses_before = deadline_stats["misses"]["delivery"]
+
+    async def run(budget):
+        manager = MessageManager()
+        manager.pacer.delay = lambda text: 0.05
+        task = asyncio.create_task(manager.start())
+        deadline = TurnDeadline(budget=budget)
+        manager.set_session(1, "+821000000000", deadline.started_at, deadline)
+        # Queued well within the budget; only the actual send can be late
+        manager.add_message("+821000000000", "first")
+        manager.add_message("+821000000000", "second")
+        assert deadline_stats["misses"]["delivery"] == misses_before
+        await manager.queue.join()
+        task.cancel()
+
+    asyncio.run(run(budget=10.0))
+    assert deadline_stats["misses"]["delivery"] == misses_before
+    asyncio.run(run(budget=0.05))
+    assert deadline_stats["misses"]["delivery"] == misses_before + 1  # Once per turn
+    assert sent == ["first", "second"] * 2
+    print("✓ Delivery checkpoint at send time")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,178 @@
+"""
+Test script for the LLM request governor.
+Uses fake request functions, so no OpenAI calls are made.
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from ai.governor import RequestGovernor, CircuitOpenError, DeadlineExceeded
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_retries_and_aimd_decrease():
+    """429s are retried with backoff and halve the concurrency limit."""
+    governor = RequestGovernor(initial_limit=8, backoff_base=0.01, backoff_cap=0.02)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise FakeAPIError(429)
+        return "ok"
+
+    assert governor.call(flaky) == "ok"
+    metrics = governor.metrics()
+    assert metrics["retries"] == 2
+    assert metrics["limit_decreases"] == 2
+    assert metrics["concurrency_limit"] < 8
+    print("✓ Retries with AIMD decrease")
+
+
+def test_non_retryable_error_fails_fast():
+    governor = RequestGovernor(backoff_base=0.01)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        governor.call(bad_request)
+    assert len(calls) == 1
+    print("✓ 400 not retried")
+
+
+def test_circuit_opens_and_recovers():
+    governor = RequestGovernor(max_retries=0, failure_threshold=2, reset_timeout=0.05)
+
+    def down():
+        raise FakeAPIError(503)
+
+    for _ in range(2):
+        with pytest.raises(FakeAPIError):
+            governor.call(down)
+    assert governor.metrics()["circuit_state"] == "open"
+
+    # Fails fast without calling the API
+    with pytest.raises(CircuitOpenError):
+        governor.call(lambda: "never called")
+
+    # After the reset timeout a trial request closes the circuit again
+    time.sleep(0.06)
+    assert governor.call(lambda: "ok") == "ok"
+    assert governor.metrics()["circuit_state"] == "closed"
+    print("✓ Circuit breaker opens and recovers")
+
+
+def test_non_retryable_trial_closes_half_open_circuit():
+    governor = RequestGovernor(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+
+    def down():
+        raise FakeAPIError(503)
+
+    def bad_request():
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        governor.call(down)
+    assert governor.metrics()["circuit_state"] == "open"
+
+    # The trial gets a 400: the API is reachable, later calls must not be rejected
+    time.sleep(0.06)
+
+    with pytest.raises(FakeAPIError):
+        governor.call(bad_request)
+    assert governor.metrics()["circuit_state"] == "closed"
+    assert governor.call(lambda: "ok") == "ok"
+    assert governor.metrics()["rejected"] == 0
+    print("✓ Non-retryable trial closes the circuit")
+
+
+def test_hedged_request_wins_on_slow_tail():
+    governor = RequestGovernor(hedge_min_delay=0.02)
+    # Teach the governor that requests normally take ~10ms
+    governor.latencies.extend([0.01] * 50)
+    calls = []
+
+    def sometimes_slow():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)  # Slow tail on the first request only
+            return "slow"
+        return "fast"
+
+    assert governor.call(sometimes_slow) == "fast"
+    metrics = governor.metrics()
+    assert metrics["hedges"] == 1
+    assert metrics["hedge_wins"] == 1
+    print("✓ Hedged request beats slow tail")
+
+
+def test_workers_share_the_concurrency_budget():
+    governor = RequestGovernor(initial_limit=8, max_limit=16)
+    governor.share_budget(4)
+    metrics = governor.metrics()
+    assert metrics["max_limit"] == 4 and metrics["concurrency_limit"] == 4
+    # More workers than budget: each still gets one call
+    governor.share_budget(8)
+    assert governor.metrics()["max_limit"] == 1 and governor.min_limit == 1
+    print("✓ Budget shared across workers")
+
+
+def test_slot_wait_is_capped_by_the_deadline():
+    """Waiting for a slot spends the deadline; the request gets what is left."""
+    governor = RequestGovernor(initial_limit=1, max_limit=1)
+    release = threading.Event()
+    busy = threading.Thread(target=governor.call, args=(release.wait,), kwargs={"hedge": False})
+    busy.start()
+    while governor.in_flight == 0:
+        time.sleep(0.001)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        governor.call(lambda timeout: "late", deadline=time.monotonic() + 0.05)
+    assert time.monotonic() - start < 0.5
+
+    timeouts = []
+
+    def record(timeout):
+        timeouts.append(timeout)
+        return "ok"
+
+    threading.Timer(0.1, release.set).start()
+    assert governor.call(record, deadline=time.monotonic() + 1.0) == "ok"
+    busy.join()
+    assert timeouts and timeouts[0] < 0.95  # Recomputed after the 100ms wait
+    print("✓ Slot wait bounded by the deadline")
+
+
+def test_deadline_timeouts_do_not_open_the_circuit():
+    governor = RequestGovernor(max_retries=0, failure_threshold=2)
+
+    def slow(timeout):
+        raise TimeoutError("timed out at the turn deadline")
+
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            governor.call(slow, deadline=time.monotonic() + 1.0)
+    metrics = governor.metrics()
+    assert metrics["circuit_state"] == "closed"
+    assert metrics["consecutive_failures"] == 0
+    assert metrics["limit_decreases"] == 0
+    print("✓ Deadline-bound timeouts not counted by the breaker")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
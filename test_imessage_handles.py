@@ -0,0 +1,170 @@
+"""
+Test script for multi-handle iMessage polling (many students, one query per poll).
+Uses a tiny chat.db built in a temporary directory and a stubbed pipeline.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from channels.imessage import IMessageChannel
+from channels.runtime import ChannelRuntime
+from imessage import reader
+from imessage.catchup import cursor_source
+from imessage.manager import MessageManager
+from memory import storage, async_storage
+from ringle.students import StudentDirectory
+from state.deadline import TurnDeadline
+
+TEACHER = "+821011112222"
+ALICE = "+821033334444"
+BOB = "bob@example.com"
+STRANGER = "+821099990000"
+
+
+def make_chat_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT, service TEXT);
+    CREATE TABLE chat (ROWID INTEGER PRIMARY KEY);
+    CREATE TABLE chat_handle_join (chat_id INTEGER, handle_id INTEGER);
+    CREATE TABLE chat_message_join (chat_id INTEGER, message_id INTEGER);
+    CREATE TABLE message (ROWID INTEGER PRIMARY KEY, text TEXT, attributedBody BLOB, handle_id INTEGER,
+                          is_from_me INTEGER, date INTEGER);
+    """)
+    # Alice has an iMessage and an SMS handle
+    handles = [(1, TEACHER, "iMessage"), (2, ALICE, "iMessage"), (3, ALICE, "SMS"),
+               (4, BOB, "iMessage"), (5, STRANGER, "iMessage")]
+    conn.executemany("INSERT INTO handle VALUES (?, ?, ?)", handles)
+    conn.executemany("INSERT INTO chat VALUES (?)", [(rowid,) for rowid, _, _ in handles])
+    conn.executemany("INSERT INTO chat_handle_join VALUES (?, ?)", [(rowid, rowid) for rowid, _, _ in handles])
+    conn.commit()
+    return conn
+
+
+def add_message(conn, handle_rowid, text, is_from_me=0):
+    cursor = conn.execute("INSERT INTO message (text, handle_id, is_from_me, date) "
+                          "VALUES (?, ?, ?, (SELECT COUNT(*) FROM message))", (text, handle_rowid, is_from_me))
+    conn.execute("INSERT INTO chat_message_join VALUES (?, ?)", (handle_rowid, cursor.lastrowid))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def test_one_query_for_all_handles(tmp_path):
+    conn = make_chat_db(tmp_path / "chat.db")
+    handles = reader.resolve_handles(conn, ["+82 10-3333-4444", "Bob@Example.com", "+821000000000"])
+    assert handles == {2: ALICE, 3: ALICE, 4: BOB}
+
+    add_message(conn, 2, "hi from iMessage")
+    add_message(conn, 5, "not a student")
+    add_message(conn, 4, "hello")
+    add_message(conn, 4, "my reply", is_from_me=1)
+    add_message(conn, 3, "hi from SMS")
+
+    assert reader.get_new_messages_for_handles(conn, handles, 0) == [
+        (1, ALICE, "hi from iMessage", "iMessage"),
+        (3, BOB, "hello", "iMessage"),
+        (5, ALICE, "hi from SMS", "SMS"),
+    ]
+    assert reader.get_new_messages_for_handles(conn, handles, 1, until_rowid=4, limit=1) == [
+        (3, BOB, "hello", "iMessage"),
+    ]
+    assert reader.get_new_messages_for_handles(conn, {}, 0) == []
+    assert reader.get_inbox_rowid(conn) == 5
+    conn.close()
+    print("✓ Single query over watched handles")
+
+
+def test_poller_dispatches_per_student(tmp_path, monkeypatch):
+    chat_db = tmp_path / "chat.db"
+    make_chat_db(chat_db).close()
+    students = tmp_path / "students.json"
+    students.write_text(json.dumps([
+        {"student_id": "s1", "name": "Alice", "phone_number": "+82 10-3333-4444"},
+        {"student_id": "s2", "name": "Bob", "phone_number": BOB},
+    ]))
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    monkeypatch.setattr(reader, "DB_PATH", str(chat_db))
+    monkeypatch.setattr(main, "student_directory", StudentDirectory(str(students)))
+    monkeypatch.setattr(main.user, "phone_number", TEACHER)
+    monkeypatch.setattr(main.user, "other_phone_numbers", [])
+
+    turns = []
+    deadlines = []
+
+    async def fake_run_turn(text, service, conn, reply_callback, rowid=None, history=None,
+                            deadline=None, user_id=None, conversation_id=None, **kwargs):
+        turns.append((user_id, conversation_id, text, service))
+        deadlines.append(deadline)
+
+    monkeypatch.setattr(main, "run_turn", fake_run_turn)
+    storage.init_database()
+
+    async def run():
+        runtime = ChannelRuntime(main.handle_channel_message, workers=4)
+        runtime.add_channel(IMessageChannel(main.watched_handles))
+        await runtime.start()
+        # Wait until the channel has set its cursor, then write
+        for _ in range(100):
+            await asyncio.sleep(0.05)
+            if await async_storage.load_poll_cursor(cursor_source()) is not None:
+                break
+        conn = sqlite3.connect(chat_db)
+        add_message(conn, 2, "I goed to school")
+        add_message(conn, 5, "spam")
+        add_message(conn, 4, "how are you")
+        add_message(conn, 3, "sent by SMS")
+        last = add_message(conn, 1, "teacher here")
+        conn.close()
+        for _ in range(60):
+            await asyncio.sleep(0.05)
+            if await async_storage.load_poll_cursor(cursor_source()) == last:
+                break
+        await runtime.stop()
+        return last
+
+    try:
+        last = asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    assert sorted(turns) == sorted([
+        (ALICE, ALICE, "I goed to school", "iMessage"),
+        (ALICE, ALICE, "sent by SMS", "SMS"),
+        (BOB, BOB, "how are you", "iMessage"),
+        (TEACHER, TEACHER, "teacher here", "iMessage"),
+    ])
+    # Within a student, messages keep their order
+    assert [t[2] for t in turns if t[0] == ALICE] == ["I goed to school", "sent by SMS"]
+    # Each turn's budget started when the poll read it, not when a worker picked it up
+    assert all(isinstance(deadline, TurnDeadline) for deadline in deadlines)
+    assert len({id(deadline) for deadline in deadlines}) == len(turns)
+    assert storage.load_poll_cursor(cursor_source()) == last
+    print("✓ Per-student dispatch")
+
+
+def test_new_turn_only_supersedes_its_own_recipient():
+    manager = MessageManager()
+
+    async def run():
+        manager.set_session(1, ALICE)
+        manager.add_message(ALICE, "chunk for alice")
+        manager.set_session(2, BOB)
+        manager.add_message(BOB, "chunk for bob")
+        manager.set_session(3, ALICE)
+        items = [manager.queue.get_nowait() for _ in range(2)]
+        return [(target, session < manager.current_session(target)) for _, _, session, target, _, _ in items]
+
+    # Bob's turn did not cancel Alice's chunk; Alice's own next turn did
+    assert asyncio.run(run()) == [(ALICE, True), (BOB, False)]
+    print("✓ Per-recipient sessions")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
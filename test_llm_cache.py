@@ -0,0 +1,117 @@
+"""
+Test script for the LLM result cache (ai/cache.py).
+A fake OpenAI client stands in for the API; the persistent tier lives in a temporary directory.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai import cache, chat
+from ai.cache import LLMCache, request_key
+from memory import storage, summary
+
+TTLS = {"summary": 60, "reply": 0}
+
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class CountingClient:
+    """Answers every request with a numbered completion."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.calls += 1
+        return completion(f"answer {self.calls}")
+
+
+def request(content="Summarize this", **extra):
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}], "max_tokens": 300, **extra}
+
+
+def test_key_covers_model_parameters_and_messages():
+    base = request_key(request())
+    # Governor options do not change the completion
+    assert request_key(request(hedge=False, deadline=123.0, timeout=5)) == base
+    assert request_key(request(temperature=0.3)) != base
+    assert request_key(request("Summarize that")) != base
+    assert request_key({**request(), "model": "gpt-4o"}) != base
+    print("✓ Request keys")
+
+
+def test_memory_and_persistent_tiers(tmp_path):
+    client = CountingClient()
+    path = str(tmp_path / "llm_cache.db")
+    llm_cache = LLMCache(path=path, ttls=TTLS)
+
+    assert llm_cache.complete("summary", client.chat.completions.create, **request()) == "answer 1"
+    assert llm_cache.complete("summary", client.chat.completions.create, **request()) == "answer 1"
+    assert client.calls == 1
+
+    # A new process starts warm from the persistent tier
+    restarted = LLMCache(path=path, ttls=TTLS)
+    assert restarted.complete("summary", client.chat.completions.create, **request()) == "answer 1"
+    assert client.calls == 1
+    assert restarted.metrics()["by_type"]["summary"]["disk_hits"] == 1
+
+    # Replies are opted out: always generated, never stored
+    assert llm_cache.complete("reply", client.chat.completions.create, **request()) == "answer 2"
+    assert llm_cache.complete("reply", client.chat.completions.create, **request()) == "answer 3"
+
+    by_type = llm_cache.metrics()["by_type"]
+    assert by_type["summary"] == {"memory_hits": 1, "disk_hits": 0, "misses": 1, "bypassed": 0, "hit_rate": 0.5}
+    assert by_type["reply"]["bypassed"] == 2 and by_type["reply"]["hit_rate"] is None
+    print("✓ LRU and SQLite tiers")
+
+
+def test_expiry_and_eviction(tmp_path, monkeypatch):
+    client = CountingClient()
+    llm_cache = LLMCache(path=str(tmp_path / "llm_cache.db"), max_entries=2, ttls=TTLS)
+    create = client.chat.completions.create
+
+    for text in ("a", "b", "c"):
+        llm_cache.complete("summary", create, **request(text))
+    assert len(llm_cache.entries) == 2  # "a" evicted from memory, still on disk
+    assert llm_cache.complete("summary", create, **request("a")) == "answer 1"
+    assert client.calls == 3
+
+    now = cache.time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 61)
+    assert llm_cache.complete("summary", create, **request("a")) == "answer 4"
+    assert llm_cache.prune_expired() == 2  # "b" and "c"; "a" was just refreshed
+    print("✓ TTL expiry and LRU eviction")
+
+
+def test_summaries_and_opted_in_replies_use_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    client = CountingClient()
+    monkeypatch.setattr(summary, "get_openai_client", lambda: client)
+    monkeypatch.setattr(chat, "get_openai_client", lambda: client)
+    monkeypatch.setattr(summary, "llm_cache", LLMCache(ttls=TTLS))
+    history = [{"role": "user", "content": "I goed to school"}, {"role": "assistant", "content": "You went!"}]
+
+    # Same 20-message window after a restart: no second LLM call
+    assert summary.generate_summary(history) == "answer 1"
+    assert summary.generate_summary(history) == "answer 1"
+    assert os.path.exists(tmp_path / "llm_cache.db")
+    assert client.calls == 1
+
+    monkeypatch.setattr(chat, "llm_cache", LLMCache(ttls=TTLS))
+    assert chat.generate_response("system", history) == "answer 2"
+    assert chat.generate_response("system", history) == "answer 3"
+    monkeypatch.setattr(chat, "llm_cache", LLMCache(ttls={"reply": 60}))
+    assert chat.generate_response("system", history) == "answer 4"
+    assert chat.generate_response("system", history) == "answer 4"
+    print("✓ Call sites go through the cache")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,209 @@
+"""
+Test script for memory.db retention (memory/maintenance.py).
+Uses a temporary database and a stubbed summarizer.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory import async_storage, maintenance, storage
+from memory.search import search_memory
+
+NOW = datetime(2026, 6, 1)
+
+
+def add_rows(conn, table, key, rows):
+    for key_value, created_at, text in rows:
+        conn.execute(f"INSERT INTO {table} ({key}, role, text, created_at) VALUES (?, 'user', ?, ?)",
+                     (key_value, text, created_at))
+    conn.commit()
+
+
+def test_old_rows_are_rolled_up_pruned_and_vacuumed(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    archive = str(tmp_path / "archive.db")
+
+    summarized = []
+
+    def fake_summary(history):
+        summarized.append([m["content"] for m in history])
+        return f"Talked about {history[0]['content']}"
+
+    monkeypatch.setattr(maintenance, "generate_summary", fake_summary)
+    monkeypatch.setattr(maintenance, "extract_key_points", lambda history: ["Past tense of go is went"])
+    monkeypatch.setattr(maintenance, "ROLLUP_BATCH", 2)
+    monkeypatch.setattr(maintenance, "DELETE_BATCH", 2)
+    monkeypatch.setattr(maintenance, "BATCH_DELAY", 0)
+
+    conn = sqlite3.connect(storage.DB_PATH)
+    padding = "x" * 2000  # Enough data for freed pages
+    add_rows(conn, "telegram_messages", "user_id", [
+        (1, "2026-01-01 10:00:00", "old trip to Busan"),
+        (1, "2026-01-02 10:00:00", "old interview " + padding),
+        (1, "2026-01-03 10:00:00", "old meeting " + padding),
+        (1, "2026-05-30 10:00:00", "recent message"),
+        (2, "2026-05-31 10:00:00", "only recent"),
+    ])
+    add_rows(conn, "web_messages", "session_id", [
+        ("a" * 32, "2026-01-01 10:00:00", "old web " + padding),
+        ("a" * 32, "2026-01-01 10:00:01", "old web 2 " + padding),
+        ("a" * 32, "2026-01-01 10:00:02", "old web 3 " + padding),
+        ("b" * 32, "2026-05-31 10:00:00", "recent web"),
+    ])
+    conn.close()
+    for i in range(4):
+        storage.save_summary(f"main summary {i}", [], 20, conversation="imessage:821011112222")
+
+    async def run():
+        return await maintenance.run_maintenance(retention_days=30, keep_summaries=2,
+                                                 archive_path=archive, now=NOW)
+
+    try:
+        result = asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    # Two rolled-up summaries for user 1 (batches of two), none for user 2
+    assert summarized == [["old trip to Busan", "old interview " + padding], ["old meeting " + padding]]
+    assert result["summaries_written"] == 2
+    assert result["telegram_deleted"] == 3 and result["web_deleted"] == 3
+    assert [m["content"] for m in storage.get_telegram_history(1)] == ["recent message"]
+    assert storage.get_web_history("b" * 32) == [{"role": "user", "content": "recent web"}]
+
+    # Newest two summaries kept per conversation; rolled-up ones belong to their user
+    assert [s["summary"] for s in storage.load_recent_summaries(10, "imessage:821011112222")] == [
+        "main summary 3", "main summary 2"]
+    assert len(storage.load_recent_summaries(10, conversation="telegram:1")) == 2
+    assert result["summaries_pruned"] == 2
+    hits = search_memory("Busan trip", conversation="telegram:1")
+    assert [h["content"] for h in hits] == ["Talked about old trip to Busan"]
+    assert search_memory("Busan trip", conversation="telegram:2") == []
+
+    # Deleted rows are in the archive; freed pages went back to the file system
+    archived = sqlite3.connect(archive)
+    assert archived.execute("SELECT COUNT(*) FROM telegram_messages").fetchone()[0] == 3
+    assert archived.execute("SELECT COUNT(*) FROM web_messages").fetchone()[0] == 3
+    assert archived.execute("SELECT COUNT(*) FROM conversation_summaries").fetchone()[0] == 2
+    archived.close()
+    assert result["pages_freed"] > 0
+    assert storage.get_database_size()["free_pages"] == 0
+    print("✓ Retention pass")
+
+
+def test_summary_failure_keeps_messages(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    # The summarizer fails for user 1 only
+    monkeypatch.setattr(maintenance, "generate_summary",
+                        lambda history: "" if history[0]["content"] == "old" else "summary")
+    monkeypatch.setattr(maintenance, "extract_key_points", lambda history: [])
+
+    conn = sqlite3.connect(storage.DB_PATH)
+    add_rows(conn, "telegram_messages", "user_id", [(1, "2026-01-01 10:00:00", "old"),
+                                                    (2, "2026-01-01 10:00:00", "old from 2")])
+    conn.close()
+
+    try:
+        result = asyncio.run(maintenance.run_maintenance(retention_days=30, keep_summaries=5, now=NOW))
+    finally:
+        async_storage.shutdown()
+
+    assert result["telegram_deleted"] == 1 and result["telegram_users_skipped"] == 1
+    assert maintenance.maintenance_stats["last"]["telegram_users_skipped"] == 1
+    assert storage.get_telegram_history(1) == [{"role": "user", "content": "old"}]
+    # The next user is still rolled up
+    assert storage.get_telegram_history(2) == []
+    assert storage.get_latest_summary("telegram:2")["summary"] == "summary"
+    print("✓ Messages kept when the summarizer is down")
+
+
+def test_rolled_up_summary_keeps_its_messages_date(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    monkeypatch.setattr(maintenance, "generate_summary", lambda history: "rolled up " + history[0]["content"])
+    monkeypatch.setattr(maintenance, "extract_key_points", lambda history: [])
+
+    storage.save_summary("live summary", [], 20, conversation="telegram:1")
+    conn = sqlite3.connect(storage.DB_PATH)
+    add_rows(conn, "telegram_messages", "user_id", [(1, "2026-01-01 10:00:00", "January"),
+                                                    (1, "2026-01-02 09:30:00", "still January")])
+    conn.close()
+
+    try:
+        asyncio.run(maintenance.run_maintenance(retention_days=30, keep_summaries=5, now=NOW))
+    finally:
+        async_storage.shutdown()
+
+    # The roll-up is dated like its last message, so the live summary stays the latest
+    assert storage.get_latest_summary("telegram:1")["summary"] == "live summary"
+    rolled = storage.load_recent_summaries(5, "telegram:1")[1]
+    assert rolled["summary"] == "rolled up January"
+    assert (rolled["created_at"], rolled["session_date"]) == ("2026-01-02 09:30:00", "2026-01-02")
+    print("✓ Roll-ups dated by their messages")
+
+
+def test_existing_database_is_migrated(tmp_path, monkeypatch):
+    path = tmp_path / "memory.db"
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE conversation_summaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, session_date TEXT NOT NULL, message_count INTEGER NOT NULL,
+        summary TEXT NOT NULL, key_points TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+    """)
+    conn.execute("INSERT INTO conversation_summaries (session_date, message_count, summary) "
+                 "VALUES ('2026-01-01', 20, 'before the upgrade')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(storage, "DB_PATH", str(path))
+    storage.init_database()
+    storage.init_database()  # Idempotent
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == storage.AUTO_VACUUM_INCREMENTAL
+    conn.close()
+    assert storage.get_latest_summary()["summary"] == "before the upgrade"
+    storage.save_summary("rolled up", ["point"], 3, conversation="telegram:7")
+    assert storage.get_latest_summary()["summary"] == "before the upgrade"
+
+    # Untagged summaries go to the configured student, and only they find them
+    assert storage.assign_legacy_memory("imessage:821011112222") == 1
+    assert storage.get_latest_summary() is None
+    assert storage.get_latest_summary("imessage:821011112222")["summary"] == "before the upgrade"
+    assert [h["content"] for h in search_memory("upgrade", "imessage:821011112222")] == ["before the upgrade"]
+    assert search_memory("upgrade", "telegram:7") == []
+    print("✓ Existing database migrated")
+
+
+def test_telegram_user_ids_become_conversation_keys(tmp_path, monkeypatch):
+    path = tmp_path / "memory.db"
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE conversation_summaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, session_date TEXT NOT NULL, message_count INTEGER NOT NULL,
+        summary TEXT NOT NULL, key_points TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, user_id INTEGER)
+    """)
+    conn.execute("INSERT INTO conversation_summaries (session_date, message_count, summary, user_id) "
+                 "VALUES ('2026-01-01', 20, 'rolled up Busan trip', 42)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(storage, "DB_PATH", str(path))
+    storage.init_database()
+    storage.save_telegram_message(42, "user", "another Busan story")
+    assert storage.get_latest_summary("telegram:42")["summary"] == "rolled up Busan trip"
+    assert sorted(h["content"] for h in search_memory("Busan", "telegram:42")) == [
+        "another Busan story", "rolled up Busan trip"]
+    assert search_memory("Busan", "telegram:43") == []
+    print("✓ Telegram summaries migrated")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
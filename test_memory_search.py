@@ -0,0 +1,197 @@
+"""
+Test script for FTS5 long-term memory retrieval.
+Uses a temporary database so the real memory.db is untouched.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from memory import async_storage, storage
+from memory.search import search_memory, format_memory_context
+from state.context import ConversationContexts
+
+
+def test_index_follows_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+
+    storage.save_telegram_message(1, "user", "I have a job interview at Samsung next week")
+    storage.save_telegram_message(1, "assistant", "Great! Let's practice interview questions.")
+    storage.save_telegram_message(2, "user", "My interview went badly")
+    storage.save_summary("Student practiced email greetings.", ["Use 'Dear' in formal emails"], 5,
+                         conversation="telegram:1")
+
+    # Messages, summaries and key points are scoped to their conversation
+    hits = search_memory("Any tips for my interview?", conversation="telegram:1")
+    assert {h["content"] for h in hits} == {
+        "I have a job interview at Samsung next week",
+        "Great! Let's practice interview questions.",
+    }
+    hits = search_memory("How formal should emails be?", conversation="telegram:1")
+    assert [h["kind"] for h in hits] == ["key_points"]
+    assert search_memory("How formal should emails be?", conversation="telegram:2") == []
+    assert search_memory("formal emails") == []  # No conversation, no memory
+
+    # Items already in the prompt are skipped
+    hits = search_memory("interview", conversation="telegram:2", exclude={"My interview went badly"})
+    assert hits == []
+
+    # Deleting source rows removes them from the index
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("DELETE FROM telegram_messages WHERE user_id = 1")
+    conn.commit()
+    conn.close()
+    assert search_memory("Samsung interview", conversation="telegram:1") == []
+
+    context_text = format_memory_context(search_memory("formal emails", "telegram:1"), {"level": "intermediate"})
+    assert "[Student Profile]\n- level: intermediate" in context_text
+    assert "Use 'Dear' in formal emails" in context_text
+    print("✓ FTS index follows writes")
+
+
+def test_existing_rows_are_backfilled(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "memory.db")
+    monkeypatch.setattr(storage, "DB_PATH", db_path)
+
+    # A database created before the index existed
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE telegram_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+                 "role TEXT NOT NULL, text TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO telegram_messages (user_id, role, text) VALUES (1, 'user', 'quarterly report deadline')")
+    conn.commit()
+    conn.close()
+
+    storage.init_database()
+    assert [h["content"] for h in search_memory("quarterly report", conversation="telegram:1")] == ["quarterly report deadline"]
+    print("✓ Existing rows backfilled")
+
+
+def test_terms_common_elsewhere_still_find_own_memories(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    conn = sqlite3.connect(storage.DB_PATH)
+    # "marathon" is everywhere in other students' conversations, "zebra" is rare
+    conn.executemany("INSERT INTO telegram_messages (user_id, role, text) VALUES (?, 'user', ?)",
+                     [(2 + i % 50, f"marathon number {i}") for i in range(6000)])
+    conn.execute("INSERT INTO telegram_messages (user_id, role, text) VALUES (3, 'user', 'a zebra at the zoo')")
+    conn.execute("INSERT INTO telegram_messages (user_id, role, text) VALUES (1, 'user', 'my marathon training')")
+    conn.commit()
+    conn.close()
+
+    hits = search_memory("zebra marathon", conversation="telegram:1")
+    assert [h["content"] for h in hits] == ["my marathon training"]
+    print("✓ Own memories found despite common terms")
+
+
+def test_old_index_is_rebuilt_with_conversation_tokens(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("CREATE TABLE telegram_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+                 "role TEXT NOT NULL, text TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("CREATE VIRTUAL TABLE memory_fts USING fts5(content, kind UNINDEXED, conversation UNINDEXED)")
+    conn.execute("INSERT INTO telegram_messages (user_id, role, text) VALUES (1, 'user', 'quarterly report deadline')")
+    conn.commit()
+    conn.close()
+
+    storage.init_database()
+    assert [h["content"] for h in search_memory("report", conversation="telegram:1")] == ["quarterly report deadline"]
+    storage.save_telegram_message(1, "user", "report card")
+    assert len(search_memory("report", conversation="telegram:1")) == 2
+    print("✓ Old index rebuilt")
+
+
+def test_pipeline_keeps_memory_and_profile_per_student(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.invalidate_profile_cache()
+    storage.save_user_profile("goal", "IELTS 7.0", storage.conversation_key("iMessage", "+821011112222"))
+    storage.save_user_profile("goal", "TOEIC 900", "telegram:2")
+    storage.save_summary("Talked about the Busan marathon.", [], 5, conversation="telegram:1")
+
+    prompts = {}
+
+    def fake_generate(system_prompt, history, summary_context, *args, **kwargs):
+        prompts[history[-1]["content"]] = summary_context
+        return "Sounds fun!"
+
+    monkeypatch.setattr(main, "generate_response", fake_generate)
+
+    async def run():
+        async def reply(chunk):
+            pass
+
+        for user_id, text in ((1, "Busan marathon again"), (2, "Busan marathon plans")):
+            await main.process_user_message(text, "Telegram", None, reply,
+                                            history=[{"role": "user", "content": text}], user_id=user_id)
+        # Each student gets their own profile
+        await main.process_user_message("Busan marathon", "iMessage", sqlite3.connect(":memory:"), reply,
+                                        history=[{"role": "user", "content": "Busan marathon"}],
+                                        user_id="+82 10-1111-2222")
+
+    try:
+        asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    assert "Busan marathon." in prompts["Busan marathon again"]
+    assert "Busan" not in prompts["Busan marathon plans"]
+    assert "IELTS" not in prompts["Busan marathon plans"] and "IELTS" not in prompts["Busan marathon again"]
+    assert "[Student Profile]\n- goal: IELTS 7.0" in prompts["Busan marathon"]
+    assert "TOEIC 900" in prompts["Busan marathon plans"] and "TOEIC" not in prompts["Busan marathon"]
+    print("✓ Memory and profile stay with their student")
+
+
+def test_pipeline_keeps_context_per_student(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.save_summary("Alice is planning a trip to Busan.", ["went, not goed"], 5, conversation="telegram:1")
+    registry = ConversationContexts()
+    monkeypatch.setattr(main, "contexts", registry)
+
+    prompts, languages = {}, {}
+
+    def fake_generate(system_prompt, history, summary_context, *args, **kwargs):
+        prompts[history[-1]["content"]] = summary_context
+        return "Sounds fun!"
+
+    def fake_route(text, language):
+        languages[text] = language
+        return real_route(text, language)
+
+    real_route = main.model_router.route
+    monkeypatch.setattr(main, "generate_response", fake_generate)
+    monkeypatch.setattr(main.model_router, "route", fake_route)
+
+    async def run():
+        async def reply(chunk):
+            pass
+
+        for user_id, text in ((1, "부산에 가요"), (2, "Hello there"), (1, "다음 주에요")):
+            await main.process_user_message(text, "Telegram", None, reply,
+                                            history=[{"role": "user", "content": text}], user_id=user_id)
+
+    try:
+        asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    # Only the summarized student's turns get the summary
+    assert "Alice is planning a trip to Busan." in prompts["부산에 가요"]
+    assert "Alice is planning a trip to Busan." in prompts["다음 주에요"]
+    assert "[Previous Conversation Summary]" not in prompts["Hello there"]
+    # Language and summary cadence are tracked per student
+    assert languages == {"부산에 가요": "ko", "Hello there": "en", "다음 주에요": "ko"}
+    assert registry.get("telegram:1").message_count == 2 and registry.get("telegram:2").message_count == 1
+    # Session ids stay unique across students
+    assert registry.get("telegram:1").response_session_id == 3 and registry.get("telegram:2").response_session_id == 2
+    print("✓ Context stays with its student")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,115 @@
+"""
+Test script for the per-student mistake index (memory/mistakes.py).
+Uses a temporary database; the extractor and the tutor are stubbed.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from memory import async_storage, mistakes, storage
+
+ALICE = "+821033334444"
+
+
+def test_parse_extractor_answer():
+    raw = """Here you go:
+    [{"category": "Tense", "example": "I goed", "correction": "I went"},
+     {"category": "made-up", "example": "a apple", "correction": "an apple"},
+     {"category": "tense", "example": "I went", "correction": "I went."},
+     {"example": "", "correction": "x"}, "junk"]"""
+    assert mistakes.parse_mistakes(raw) == [
+        {"category": "tense", "example": "I goed", "correction": "I went", "correction_key": "i went"},
+        {"category": "other", "example": "a apple", "correction": "an apple", "correction_key": "an apple"},
+    ]
+    assert mistakes.parse_mistakes("[]") == []
+    assert mistakes.parse_mistakes("no corrections") == []
+    assert mistakes.parse_mistakes("[{broken") == []
+    print("✓ Extractor answers validated")
+
+
+def test_index_counts_recurring_mistakes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+
+    went = mistakes.parse_mistakes('[{"category": "tense", "example": "I goed", "correction": "I went"}]')
+    article = mistakes.parse_mistakes('[{"category": "article", "example": "a email", "correction": "an email"}]')
+    storage.record_mistakes("s1", went)
+    storage.record_mistakes("s1", article)
+    # Same mistake again, written differently
+    storage.record_mistakes("s1", mistakes.parse_mistakes(
+        '[{"category": "tense", "example": "yesterday I goed", "correction": "I went."}]'))
+    storage.record_mistakes("s2", article)
+
+    top = storage.get_top_mistakes("s1", limit=5)
+    assert [(m["category"], m["example"], m["count"]) for m in top] == [
+        ("tense", "yesterday I goed", 2),
+        ("article", "a email", 1),
+    ]
+    assert len(storage.get_top_mistakes("s1", limit=1)) == 1
+    assert storage.get_top_mistakes("nobody") == []
+
+    context = mistakes.format_mistakes_context(top)
+    assert context == ('\n\n[Recurring Mistakes]\n'
+                       '- (tense) "yesterday I goed" -> "I went." x2\n'
+                       '- (article) "a email" -> "an email"')
+    assert mistakes.format_mistakes_context([]) == ""
+    print("✓ Recurring mistakes counted per student")
+
+
+def test_student_key():
+    assert mistakes.student_key() is None
+    assert mistakes.student_key(telegram_id=42) == "telegram:42"
+    assert mistakes.student_key(phone_number="+82 10-3333-4444") == "imessage:821033334444"
+    assert mistakes.student_key(phone_number="Bob@Example.com") == "imessage:bob@example.com"
+    print("✓ Student keys")
+
+
+def test_pipeline_reads_and_updates_the_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.record_mistakes("imessage:821033334444", mistakes.parse_mistakes(
+        '[{"category": "tense", "example": "I goed", "correction": "I went"}]'))
+
+    prompts = []
+
+    def fake_generate(system_prompt, history, summary_context, *args, **kwargs):
+        prompts.append(summary_context)
+        return "Nice! By the way, we say 'I ate', not 'I eated'."
+
+    monkeypatch.setattr(main, "generate_response", fake_generate)
+    monkeypatch.setattr(mistakes, "extract_mistakes", lambda student, tutor: mistakes.parse_mistakes(
+        '[{"category": "verb_form", "example": "I eated", "correction": "I ate"}]'))
+
+    async def run():
+        replies = []
+
+        async def reply(chunk):
+            replies.append(chunk)
+
+        # iMessage turns carry a chat.db connection (unused here: history is given)
+        chat_db = sqlite3.connect(":memory:")
+        history = [{"role": "user", "content": "I eated kimchi for lunch today"}]
+        await main.process_user_message("I eated kimchi for lunch today", "iMessage", chat_db, reply,
+                                        history=history, user_id=ALICE)
+        await asyncio.gather(*main.summary_tasks)
+        return replies
+
+    try:
+        replies = asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    assert replies
+    assert '[Recurring Mistakes]\n- (tense) "I goed" -> "I went"' in prompts[0]
+    assert sorted(m["correction"] for m in storage.get_top_mistakes("imessage:821033334444")) == ["I ate", "I went"]
+    print("✓ Pipeline uses and updates the index")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,125 @@
+"""
+Test script for the write-through user_profile cache.
+Uses a temporary database so the real memory.db is untouched.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory import storage
+
+
+def test_profile_reads_hit_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.save_user_profile("level", "intermediate")
+    storage.save_user_profile("preferences", {"topics": ["business"]})
+    assert storage.get_all_profile_data()["preferences"] == {"topics": ["business"]}
+
+    # Once loaded, reads never touch SQLite
+    def no_db(*args, **kwargs):
+        raise AssertionError("profile read went to the database")
+
+    real_connect = sqlite3.connect
+    monkeypatch.setattr(storage.sqlite3, "connect", no_db)
+    assert storage.load_user_profile("level") == "intermediate"
+    assert storage.load_user_profile("missing") is None
+
+    # Writes go through to both the table and the cache
+    monkeypatch.setattr(storage.sqlite3, "connect", real_connect)
+    storage.save_user_profile("level", "advanced")
+    storage.save_user_profile("streak", "42")
+    assert storage.load_user_profile("level") == "advanced"
+    assert storage.load_user_profile("streak") == 42  # Same decoding as a fresh load
+    storage.invalidate_profile_cache()
+    assert storage.load_user_profile("streak") == 42
+    print("✓ Profile reads served from cache")
+
+
+def test_invalidation_for_external_writers(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.save_user_profile("level", "beginner")
+    assert storage.load_user_profile("level") == "beginner"
+
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("UPDATE user_profile SET value = 'advanced' WHERE key = 'level'")
+    conn.execute("INSERT INTO user_profile (key, value) VALUES ('goal', 'IELTS')")
+    conn.commit()
+    conn.close()
+
+    # Stale until told otherwise
+    assert storage.load_user_profile("level") == "beginner"
+    storage.invalidate_profile_cache("level", "")
+    assert storage.load_user_profile("level") == "advanced"
+    assert storage.load_user_profile("goal") is None
+    storage.invalidate_profile_cache()
+    assert storage.load_user_profile("goal") == "IELTS"
+    print("✓ Invalidation hook")
+
+
+def test_profiles_are_kept_per_student(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.save_user_profile("level", "beginner", "telegram:1")
+    storage.save_user_profile("level", "advanced", "telegram:2")
+    assert storage.get_all_profile_data("telegram:1") == {"level": "beginner"}
+    assert storage.get_all_profile_data("telegram:2") == {"level": "advanced"}
+    assert storage.get_all_profile_data("telegram:3") == {}
+
+    # Invalidating one student leaves the others cached
+    storage.invalidate_profile_cache(conversation="telegram:1")
+    assert (storage.DB_PATH, "telegram:1") not in storage._profile_cache
+    assert (storage.DB_PATH, "telegram:2") in storage._profile_cache
+    print("✓ Per-student profiles")
+
+
+def test_legacy_profile_moves_to_its_student(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("CREATE TABLE user_profile (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                 "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO user_profile (key, value) VALUES ('level', 'intermediate')")
+    conn.commit()
+    conn.close()
+
+    storage.init_database()
+    assert storage.get_all_profile_data("") == {"level": "intermediate"}
+    storage.assign_legacy_memory("imessage:+821012345678")
+    assert storage.get_all_profile_data("imessage:+821012345678") == {"level": "intermediate"}
+    assert storage.get_all_profile_data("") == {}
+    print("✓ Legacy profile assigned")
+
+
+def test_save_during_first_load_is_not_lost(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    storage.save_user_profile("level", "beginner", "telegram:1")
+    storage.invalidate_profile_cache()
+
+    # A save that starts while the cache is being loaded must end up in the cache
+    real_decode = storage._decode_profile_value
+    writers = []
+
+    def decode(value):
+        if not writers:
+            writer = threading.Thread(target=storage.save_user_profile, args=("level", "advanced", "telegram:1"))
+            writers.append(writer)
+            writer.start()
+            writer.join()  # Commits while the load is outside the lock
+        return real_decode(value)
+
+    monkeypatch.setattr(storage, "_decode_profile_value", decode)
+    storage.get_all_profile_data("telegram:1")
+    writers[0].join()
+    assert storage.load_user_profile("level", "telegram:1") == "advanced"
+    print("✓ No stale snapshot after a concurrent save")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,62 @@
+"""
+Test script for the latency-aware model router.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ai import router as router_module
+from ai.router import DEFAULT_TIERS, ModelRouter, classify_turn, load_tiers, MAX_SHIFT
+
+
+def test_classify_turn():
+    assert classify_turn("thanks!") == "quick"
+    assert classify_turn("I went to the office and had a long meeting today") == "standard"
+    assert classify_turn("yesterday i goed to the office") == "correction"
+    assert classify_turn("What is the difference between affect and effect?") == "correction"
+    assert classify_turn("이거 영어로 어떻게 말해요?", language="ko") == "correction"
+    print("✓ Turn classification")
+
+
+def test_slow_tier_sheds_traffic():
+    router = ModelRouter()
+    # gpt-4o answers well within its target: no shifting
+    router.record_latency("gpt-4o", 3.0)
+    routes = [router.route("i goed home").tier for _ in range(200)]
+    assert set(routes) == {"correction"}
+
+    # gpt-4o degrades far past its 6s target: most traffic moves down a tier
+    for _ in range(20):
+        router.record_latency("gpt-4o", 30.0)
+    assert router.shift_probability("correction") == MAX_SHIFT
+    routes = [router.route("i goed home").tier for _ in range(500)]
+    shifted = routes.count("standard") + routes.count("quick")
+    assert 0.8 < shifted / len(routes) < 0.97
+    assert router.metrics()["shifted"]["correction"] == shifted
+    print("✓ Degraded tier sheds traffic")
+
+
+def test_invalid_model_tiers_are_ignored(monkeypatch):
+    settings = router_module.get_settings()
+    monkeypatch.setattr(settings, "model_tiers", '{"quick": {"model": "gpt-4.1-nano"}}')
+    assert load_tiers()["quick"]["model"] == "gpt-4.1-nano"
+
+    for override in (
+        '["quick"]',                                               # Not an object
+        '{"quick": "gpt-4.1-nano"}',                               # Tier is not an object
+        '{"fast": {"model": "gpt-4.1-nano"}}',                     # New tier without max_tokens
+        '{"quick": {"max_tokens": "many"}}',                       # Wrong type
+        '{"standard": {"fallback": "cheapest"}}',                  # Unknown fallback
+        '{"quick": {"fallback": "correction"}}',                   # Fallback loop
+        '{"quick": {"latency_target": "soon"}}',                   # Not a number
+    ):
+        monkeypatch.setattr(settings, "model_tiers", override)
+        assert load_tiers() == DEFAULT_TIERS, override
+    print("✓ Invalid MODEL_TIERS ignored")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,36 @@
+"""
+Test script guarding startup cost.
+Heavy SDKs must not be imported just by loading the app.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_import_time import measure_import, LAZY_MODULES
+
+
+def test_main_import_stays_lazy():
+    modules = measure_import("main")
+    eager = [name for name in LAZY_MODULES if name in modules]
+    assert eager == [], f"imported at startup: {eager}"
+    print(f"✓ import main: {modules['main'][1] / 1000:.1f} ms, no heavy SDKs")
+
+
+def test_openai_client_leaves_retries_to_the_governor():
+    import config
+    os.environ.setdefault("OPENAI_API_KEY", "test-key")
+    config.close_clients()
+    try:
+        client = config.get_openai_client()
+        assert client.max_retries == 0
+    finally:
+        config.close_clients()
+    print("✓ OpenAI SDK retries disabled")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+"""
+Test script for the student directory: loading from JSON/CSV/SQLite,
+lookup by phone number and Telegram id, and the prompt cache.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ringle import students
+from ringle.students import StudentDirectory, DEFAULT_STUDENT
+
+RECORDS = [
+    {"student_id": "s1", "name": "Minji", "phone_number": "+82 10-1111-2222", "telegram_id": 1001,
+     "tutor_name": "Emily", "last_class_topic": "Small Talk"},
+    {"student_id": "s2", "name": "Joon", "phone_number": "+821033334444", "telegram_id": None,
+     "tutor_name": "Daniel", "last_class_topic": "Job Interviews"},
+]
+
+
+def test_load_formats_and_lookup(tmp_path):
+    json_path = tmp_path / "students.json"
+    json_path.write_text(json.dumps(RECORDS))
+
+    db_path = tmp_path / "students.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE students (student_id, name, phone_number, telegram_id, tutor_name, last_class_topic)")
+    conn.executemany("INSERT INTO students VALUES (:student_id, :name, :phone_number, :telegram_id, :tutor_name, :last_class_topic)", RECORDS)
+    conn.commit()
+    conn.close()
+
+    csv_path = tmp_path / "students.csv"
+    csv_path.write_text("student_id,name,phone_number,telegram_id,tutor_name,last_class_topic\n"
+                        "s1,Minji,+82 10-1111-2222,1001,Emily,Small Talk\n"
+                        "s2,Joon,+821033334444,,Daniel,Job Interviews\n")
+
+    for path in (json_path, db_path, csv_path):
+        directory = StudentDirectory(path=str(path))
+        assert directory.load() == 2
+        assert directory.find(telegram_id=1001).name == "Minji"
+        assert directory.find(phone_number="+821011112222").name == "Minji"
+        assert directory.find(phone_number="+82 10 3333 4444").name == "Joon"
+        assert directory.find(phone_number="+15550000000") is DEFAULT_STUDENT
+    print("✓ JSON, CSV and SQLite sources")
+
+
+def test_prompt_cache_ttl_and_invalidation(tmp_path, monkeypatch):
+    path = tmp_path / "students.json"
+    path.write_text(json.dumps(RECORDS))
+    directory = StudentDirectory(path=str(path), ttl=60)
+
+    clock = [1000.0]
+    monkeypatch.setattr(students.time, "monotonic", lambda: clock[0])
+
+    prompt = directory.get_system_prompt(telegram_id=1001)
+    assert "Minji" in prompt and "Small Talk" in prompt
+    assert directory.get_system_prompt(telegram_id="1001") is prompt
+    assert directory.stats == {"hits": 1, "misses": 1}
+
+    clock[0] += 61  # Expired
+    assert directory.get_system_prompt(telegram_id=1001) is not prompt
+
+    prompt = directory.get_system_prompt(telegram_id=1001)
+    directory.invalidate("s1")
+    assert directory.get_system_prompt(telegram_id=1001) is not prompt
+
+    # Reloading picks up edits
+    edited = [dict(RECORDS[0], last_class_topic="Negotiation")]
+    path.write_text(json.dumps(edited))
+    directory.load()
+    assert "Negotiation" in directory.get_system_prompt(telegram_id=1001)
+    print("✓ Prompt cache")
+
+
+def test_bad_roster_and_lookups_on_the_event_loop(tmp_path):
+    path = tmp_path / "students.json"
+    path.write_text(json.dumps({"s1": RECORDS[0]}))  # An object, not a list
+    directory = StudentDirectory(path=str(path))
+    assert directory.load() == 0
+    assert directory.find(telegram_id=1001) is DEFAULT_STUDENT
+
+    # A lookup on the event loop never reads the file itself
+    path.write_text(json.dumps(RECORDS))
+    lazy = StudentDirectory(path=str(path))
+
+    async def lookup():
+        return lazy.find(telegram_id=1001)
+
+    assert asyncio.run(lookup()) is DEFAULT_STUDENT
+    assert not lazy.loaded and lazy.metrics()["unloaded_lookups"] == 1
+    # Off the loop (a thread, a script) the first lookup still loads
+    assert lazy.find(telegram_id=1001).name == "Minji"
+    print("✓ Bad roster ignored, no file I/O on the event loop")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,127 @@
+"""
+Test script for the Telegram outbound scheduler.
+Pacing is disabled so the tests only exercise rate limits and retries.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.error import RetryAfter
+
+from channels import telegram_outbox as outbox_module
+from channels.telegram_outbox import TelegramOutbox
+
+
+def no_pacing(text):
+    return 0.0
+
+
+def test_per_chat_order_and_rate():
+    """Chunks for one chat stay in order and respect the chat bucket."""
+    sent = []
+
+    async def run():
+        outbox = TelegramOutbox(per_chat_rate=20.0, per_chat_burst=1, pacing=no_pacing)
+        for i in range(4):
+            async def deliver(i=i):
+                sent.append((i, time.monotonic()))
+            outbox.submit(1, f"chunk {i}", deliver)
+        while outbox.workers:
+            await asyncio.sleep(0.01)
+        return outbox.get_queue_status()
+
+    status = asyncio.run(run())
+
+    assert [i for i, _ in sent] == [0, 1, 2, 3]
+    # 4 messages at 20/s with burst 1 take at least 3 intervals
+    assert sent[-1][1] - sent[0][1] >= 3 / 20.0 - 0.01
+    assert status[1]["sent"] == 4
+    assert status[1]["max_queue_delay"] > 0
+    print("✓ Per-chat ordering and rate limit")
+
+
+def test_retry_after_is_honoured():
+    """A flood-wait error pauses the chat and the chunk is retried."""
+    attempts = []
+
+    async def run():
+        outbox = TelegramOutbox(pacing=no_pacing)
+
+        async def deliver():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfter(0.05)
+
+        outbox.submit(7, "hello", deliver)
+        while outbox.workers:
+            await asyncio.sleep(0.01)
+        return outbox.get_queue_status()
+
+    status = asyncio.run(run())
+
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.05
+    assert status[7]["retry_after"] == 1
+    assert status[7]["sent"] == 1
+    print("✓ RetryAfter honoured")
+
+
+def test_generation_time_counts_towards_pacing():
+    """A turn whose reply took longer than typing would sends its first chunk at once."""
+    sent = []
+
+    async def run():
+        outbox = TelegramOutbox(per_chat_rate=100.0, pacing=lambda text: 0.3)
+        start = time.monotonic()
+        for i in range(2):
+            async def deliver(i=i):
+                sent.append(time.monotonic() - start)
+            # The student's message arrived 1s ago
+            outbox.submit(3, f"chunk {i}", deliver, turn=42, started_at=start - 1.0)
+        while outbox.workers:
+            await asyncio.sleep(0.01)
+        return outbox.pacer.metrics()
+
+    pacing = asyncio.run(run())
+    assert sent[0] < 0.1
+    assert 0.25 < sent[1] - sent[0] < 0.45  # The next chunk is paced from the first
+    assert pacing["immediate_first_chunks"] == 1
+    print("✓ Telegram pacing credits generation time")
+
+
+def test_idle_chats_are_evicted_and_reported():
+    async def run():
+        outbox = TelegramOutbox(pacing=no_pacing)
+
+        async def deliver():
+            pass
+
+        outbox.submit(1, "hello", deliver)
+        outbox.submit(2, "hi", deliver)
+        while outbox.workers:
+            await asyncio.sleep(0.01)
+        before = outbox.metrics()
+        # Chat 2 talks again later; chat 1 stays idle past the TTL
+        outbox.idle_since[1] -= outbox_module.CHAT_IDLE_TTL + 1
+        evicted = outbox.prune(now=time.monotonic() + outbox_module.PRUNE_INTERVAL)
+        return before, evicted, outbox
+
+    before, evicted, outbox = asyncio.run(run())
+    assert before["per_chat"][1]["sent"] == 1 and before["sent"] == 2
+    assert "last_queue_delay" in before["per_chat"][2]
+    assert evicted == 1
+    assert 1 not in outbox.stats and 1 not in outbox.chat_buckets and 1 not in outbox.pacer.turns
+    assert 2 in outbox.stats
+    metrics = outbox.metrics()
+    assert metrics["chats"] == 1 and metrics["evicted_chats"] == 1
+    assert metrics["sent"] == 2  # Lifetime totals survive eviction
+    print("✓ Idle chats evicted, per-chat delay in metrics")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,147 @@
+"""
+Test script for Telegram webhook mode.
+POSTs the recorded update in fixtures/ to the FastAPI route.
+No network access is needed: the Application is built but never initialized.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+from telegram.ext import ApplicationBuilder
+
+import main
+from channels.telegram import TelegramBot
+from memory import async_storage, storage
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "telegram_update.json")
+
+
+def make_bot(secret):
+    bot = TelegramBot()
+    bot.webhook_secret = secret
+    bot.application = ApplicationBuilder().token("123456:TEST").concurrent_updates(True).build()
+    bot.mode = "webhook"
+    return bot
+
+
+def load_fixture():
+    with open(FIXTURE) as f:
+        return json.load(f)
+
+
+def test_webhook_accepts_recorded_update(monkeypatch):
+    bot = make_bot("s3cret")
+    monkeypatch.setattr(main, "telegram_bot", bot)
+    client = TestClient(main.app)
+
+    response = client.post(
+        main.TELEGRAM_WEBHOOK_PATH,
+        json=load_fixture(),
+        headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"},
+    )
+
+    assert response.status_code == 200
+    update = bot.application.update_queue.get_nowait()
+    assert update.update_id == 100000001
+    assert update.message.text.startswith("Hi Emily")
+    print("✓ Recorded update queued")
+
+
+def test_webhook_rejects_bad_secret(monkeypatch):
+    bot = make_bot("s3cret")
+    monkeypatch.setattr(main, "telegram_bot", bot)
+    client = TestClient(main.app)
+
+    response = client.post(
+        main.TELEGRAM_WEBHOOK_PATH,
+        json=load_fixture(),
+        headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+    )
+
+    assert response.status_code == 403
+    assert bot.application.update_queue.empty()
+    print("✓ Bad secret rejected")
+
+
+def test_webhook_fails_closed(monkeypatch):
+    client = TestClient(main.app)
+
+    # No secret configured: nothing is accepted
+    bot = make_bot(None)
+    monkeypatch.setattr(main, "telegram_bot", bot)
+    response = client.post(main.TELEGRAM_WEBHOOK_PATH, json=load_fixture())
+    assert response.status_code == 403
+
+    # Polling mode: the route is not live at all
+    bot = make_bot("s3cret")
+    bot.mode = "polling"
+    monkeypatch.setattr(main, "telegram_bot", bot)
+    response = client.post(
+        main.TELEGRAM_WEBHOOK_PATH,
+        json=load_fixture(),
+        headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"},
+    )
+    assert response.status_code == 404
+    assert bot.application.update_queue.empty()
+    print("✓ Forged updates rejected")
+
+
+def test_webhook_registers_a_random_secret_when_unset():
+    bot = make_bot(None)
+    bot.mode = None
+    bot.webhook_url = "https://example.com/telegram/webhook"
+    registered = {}
+
+    class FakeBot:
+        async def set_webhook(self, url, secret_token, allowed_updates):
+            registered["secret"] = secret_token
+
+    async def start():
+        pass
+
+    bot.application = type("App", (), {"bot": FakeBot(), "start": staticmethod(start)})()
+    asyncio.run(bot.start_webhook())
+    assert bot.mode == "webhook"
+    assert registered["secret"] and registered["secret"] == bot.webhook_secret
+    assert bot.verify_secret(registered["secret"]) and not bot.verify_secret(None)
+    print("✓ Random secret registered")
+
+
+def test_each_turn_gets_history_up_to_its_own_message(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    bot = TelegramBot()
+
+    def update(text):
+        return SimpleNamespace(message=SimpleNamespace(text=text), effective_user=SimpleNamespace(id=7))
+
+    async def run():
+        # Both messages arrive (and are saved) before the first turn runs
+        await bot.handle_message(update("first"), None)
+        await bot.handle_message(update("second"), None)
+        _, _, first = bot.inbox.get_nowait()
+        _, _, second = bot.inbox.get_nowait()
+        first_history = await bot.history(7, first)
+        await async_storage.save_telegram_message(7, "assistant", "reply to first")
+        second_history = await bot.history(7, second)
+        return first_history, second_history
+
+    try:
+        first_history, second_history = asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+
+    assert [m["content"] for m in first_history] == ["first"]
+    assert [m["content"] for m in second_history] == ["first", "reply to first", "second"]
+    print("✓ History ends with the turn's own message")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
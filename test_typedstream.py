@@ -0,0 +1,97 @@
+"""
+Test script for attributedBody text extraction.
+Blobs are in fixtures/attributed_bodies.json (same layout as a real chat.db).
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from imessage import reader
+from imessage.typedstream import extract_text, fill_text
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "attributed_bodies.json")
+PHONE = "+821012345678"
+
+
+def load_fixtures():
+    with open(FIXTURES, encoding="utf-8") as f:
+        return [(case["name"], bytes.fromhex(case["attributedBody"]), case["text"]) for case in json.load(f)]
+
+
+def test_extract_text_fixtures():
+    for name, blob, expected in load_fixtures():
+        assert extract_text(blob) == expected, name
+    assert extract_text(None) is None
+    assert extract_text(b"") is None
+
+    # 32-bit length prefix (strings of 32 KB and more)
+    text = "word " * 8000
+    data = text.encode("utf-8")
+    blob = b"NSString\x01\x94\x84\x01+\x82" + len(data).to_bytes(4, "little") + data + b"\x86"
+    assert extract_text(blob) == text.strip()
+    print("✓ attributedBody fixtures")
+
+
+def test_fill_text_in_bulk():
+    blob = dict((name, blob) for name, blob, _ in load_fixtures())
+    rows = [
+        (1, "plain text", "iMessage", blob["ascii"]),
+        (2, None, "SMS", blob["korean"]),
+        (3, None, "iMessage", blob["attachment_only"]),
+        (4, None, "iMessage", None),
+    ]
+    assert fill_text(rows, 1, 3) == [
+        (1, "plain text", "iMessage"),
+        (2, "어제 회사에 갔어요. How do I say this?", "SMS"),
+        (3, None, "iMessage"),
+        (4, None, "iMessage"),
+    ]
+    print("✓ Bulk fill")
+
+
+def test_reader_uses_attributed_body(tmp_path):
+    blob = dict((name, blob) for name, blob, _ in load_fixtures())
+    conn = sqlite3.connect(tmp_path / "chat.db")
+    conn.executescript("""
+    CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT, service TEXT);
+    CREATE TABLE chat (ROWID INTEGER PRIMARY KEY);
+    CREATE TABLE chat_handle_join (chat_id INTEGER, handle_id INTEGER);
+    CREATE TABLE chat_message_join (chat_id INTEGER, message_id INTEGER);
+    CREATE TABLE message (ROWID INTEGER PRIMARY KEY, text TEXT, attributedBody BLOB, handle_id INTEGER,
+                          is_from_me INTEGER, date INTEGER);
+    INSERT INTO handle VALUES (1, '+821012345678', 'iMessage');
+    INSERT INTO chat VALUES (1);
+    INSERT INTO chat_handle_join VALUES (1, 1);
+    """)
+    conn.executemany(
+        "INSERT INTO message VALUES (?, ?, ?, 1, ?, ?)",
+        [
+            (1, "hello", blob["ascii"], 0, 1),
+            (2, None, blob["mutable_string"], 1, 2),
+            (3, None, blob["attachment_only"], 0, 3),
+            (4, None, blob["ascii"], 0, 4),
+        ],
+    )
+    conn.executemany("INSERT INTO chat_message_join VALUES (1, ?)", [(i,) for i in range(1, 5)])
+    conn.commit()
+
+    assert reader.get_new_messages(conn, PHONE, 1) == [
+        (3, None, "iMessage"),
+        (4, "yesterday i goed to the office", "iMessage"),
+    ]
+    assert reader.get_conversation_history(conn, PHONE, limit=10) == [
+        (0, "hello"),
+        (1, "Can you check my email draft?"),
+        (0, "yesterday i goed to the office"),
+    ]
+    conn.close()
+    print("✓ Reader falls back to attributedBody")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,49 @@
+"""
+Test script for the startup warm-up and the /ready endpoint.
+Uses a temporary memory.db; the LLM and chat.db steps are stubbed/skipped.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+
+import main
+import warmup
+from memory import storage
+
+
+def test_ready_only_after_warmup(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    monkeypatch.setattr(warmup, "warmup_state", warmup.WarmupState())
+    monkeypatch.setattr(main, "warmup_state", warmup.warmup_state)
+    pings = []
+    monkeypatch.setattr(warmup, "ping_llm", lambda: pings.append(1) or "ok")
+
+    client = TestClient(main.app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    asyncio.run(warmup.warm_up(main.templates))
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    checks = response.json()["checks"]
+    assert checks["memory_db"] == "ok"
+    assert checks["templates"] == "ok"
+    assert checks["regexes"] == "ok"
+    assert checks["llm_connection"] == "ok"
+    assert pings == [1]
+    # Memory DB was created and the profile cache loaded
+    assert os.path.exists(storage.DB_PATH)
+    assert main.templates.env.cache
+    print("✓ Ready after warm-up")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
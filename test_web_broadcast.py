@@ -0,0 +1,129 @@
+"""
+Test script for the /ws ConnectionManager: concurrent fan-out and the
+slow-consumer policies. Uses in-process fake sockets.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from channels.web import ConnectionManager, SLOW_CONSUMER_CLOSE_CODE
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0, blocked=None):
+        self.delay = delay
+        self.blocked = blocked  # asyncio.Event the socket waits on before every send
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.blocked is not None:
+            await self.blocked.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def test_slow_socket_does_not_delay_others():
+    async def run():
+        manager = ConnectionManager()
+        slow, fast = FakeSocket(delay=0.5), FakeSocket()
+        await manager.connect(slow)
+        await manager.connect(fast)
+
+        assert await manager.broadcast("hello") == 2
+        await asyncio.sleep(0.05)
+        result = (list(fast.sent), list(slow.sent))
+        manager.shutdown()
+        return result
+
+    fast_sent, slow_sent = asyncio.run(run())
+    assert fast_sent == ["hello"]
+    assert slow_sent == []
+    print("✓ Concurrent fan-out")
+
+
+def test_drop_policy_disconnects_slow_consumer():
+    async def run():
+        manager = ConnectionManager(policy="drop", outbox_limit=3)
+        stuck, healthy = FakeSocket(blocked=asyncio.Event()), FakeSocket()
+        await manager.connect(stuck)
+        await manager.connect(healthy)
+
+        for i in range(5):
+            await manager.broadcast(f"tick {i}")
+        await asyncio.sleep(0.01)
+        result = (stuck.closed_with, list(healthy.sent), manager.metrics())
+        manager.shutdown()
+        return result
+
+    closed_with, healthy_sent, metrics = asyncio.run(run())
+    assert closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert healthy_sent == [f"tick {i}" for i in range(5)]
+    assert metrics["connections"] == 1
+    assert metrics["slow_disconnects"] == 1
+    print("✓ Slow consumer dropped")
+
+
+def test_coalesce_policy_keeps_latest_and_direct_messages():
+    async def run():
+        manager = ConnectionManager(policy="coalesce", outbox_limit=3)
+        gate = asyncio.Event()
+        ws = FakeSocket(blocked=gate)
+        await manager.connect(ws)
+        await asyncio.sleep(0)  # Writer picks up nothing yet
+
+        await manager.send_json(ws, {"role": "bot", "content": "reply"})  # Writer blocks sending this
+        await manager.broadcast("status 1", key="status")
+        await manager.broadcast("status 2", key="status")
+        await manager.broadcast("news 1")                  # Queue is now full
+        await manager.broadcast("status 3", key="status")  # Supersedes "status 1"
+        await manager.broadcast("news 2")                  # Sheds the oldest broadcast ("status 2")
+
+        gate.set()
+        await asyncio.sleep(0.01)
+        result = (list(ws.sent), ws.closed_with, manager.metrics())
+        manager.shutdown()
+        return result
+
+    sent, closed_with, metrics = asyncio.run(run())
+    assert sent == ['{"role":"bot","content":"reply"}', "news 1", "status 3", "news 2"]
+    assert closed_with is None
+    assert metrics["coalesced"] == 2
+    print("✓ Broadcasts coalesced, direct reply kept")
+
+
+def test_direct_message_callback_runs_after_the_socket_write():
+    async def run():
+        manager = ConnectionManager()
+        gate = asyncio.Event()
+        ws = FakeSocket(blocked=gate)
+        await manager.connect(ws)
+        delivered = []
+
+        await manager.send_json(ws, {"role": "bot", "content": "reply"}, on_sent=lambda: delivered.append(len(ws.sent)))
+        await asyncio.sleep(0.01)
+        before = list(delivered)  # Queued but the socket is still blocked
+        gate.set()
+        await asyncio.sleep(0.01)
+        manager.shutdown()
+        return before, delivered
+
+    before, delivered = asyncio.run(run())
+    assert before == []
+    assert delivered == [1]
+    print("✓ on_sent runs once the message is on the socket")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,138 @@
+"""
+Test script for web channel sessions on /ws.
+The LLM is stubbed and memory.db is temporary; chat.db must never be opened.
+"""
+
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from channels import imessage as imessage_channel
+from channels.runtime import ChannelRuntime
+from channels.web import WebSessionStore
+from memory import storage, async_storage
+
+
+def setup_pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+
+    def no_chat_db():
+        raise AssertionError("web traffic opened chat.db")
+
+    seen_histories = []
+
+    def fake_generate(system_prompt, history, *args, **kwargs):
+        seen_histories.append([m["content"] for m in history])
+        return f"Reply {len(seen_histories)}"
+
+    monkeypatch.setattr(imessage_channel, "get_db_connection", no_chat_db)
+    monkeypatch.setattr(main, "generate_response", fake_generate)
+    monkeypatch.setattr(main, "web_sessions", WebSessionStore())
+    monkeypatch.setattr(main.app.router, "lifespan_context", web_only_lifespan)
+    return seen_histories
+
+
+@asynccontextmanager
+async def web_only_lifespan(app):
+    """Just the channel runtime with the web channel (no iMessage, Telegram or warm-up)."""
+    runtime = ChannelRuntime(main.handle_channel_message, workers=4)
+    runtime.add_channel(main.web_channel)
+    await runtime.start()
+    yield
+    await runtime.stop()
+
+
+def test_sessions_have_their_own_history(tmp_path, monkeypatch):
+    seen_histories = setup_pipeline(tmp_path, monkeypatch)
+
+    with TestClient(main.app) as client:
+        with client.websocket_connect("/ws") as ws:
+            session_id = ws.receive_json()["session_id"]
+            ws.receive_json()  # Connected banner
+            ws.send_text("hello")
+            assert ws.receive_json() == {"role": "bot", "content": "Reply 1"}
+
+        with client.websocket_connect("/ws") as other:
+            other.receive_json(), other.receive_json()
+            other.send_text("a different tab")
+            other.receive_json()
+
+        # Reconnecting with the id resumes the same conversation
+        with client.websocket_connect(f"/ws?session={session_id}") as ws:
+            assert ws.receive_json()["session_id"] == session_id
+            ws.receive_json()
+            ws.send_text("again")
+            ws.receive_json()
+
+    assert seen_histories == [
+        ["hello"],
+        ["a different tab"],
+        ["hello", "Reply 1", "again"],
+    ]
+    print("✓ Per-socket session history")
+
+
+def test_web_turns_queue_on_the_runtime(tmp_path, monkeypatch):
+    seen_histories = setup_pipeline(tmp_path, monkeypatch)
+
+    with TestClient(main.app) as client:
+        with client.websocket_connect("/ws") as ws:
+            ws.receive_json(), ws.receive_json()
+            # The second message arrives while the first turn is still waiting
+            ws.send_text("one")
+            ws.send_text("two")
+            replies = [ws.receive_json()["content"], ws.receive_json()["content"]]
+
+    assert replies == ["Reply 1", "Reply 2"]
+    # Each turn sees only the messages up to its own
+    assert seen_histories == [["one"], ["one", "Reply 1", "two"]]
+    print("✓ Web turns run through the channel runtime in order")
+
+
+def test_persisted_sessions_survive_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+
+    async def run():
+        store = WebSessionStore(persist=True)
+        session = await store.open()
+        await session.add_message("user", "I goed home")
+        await session.add_message("assistant", "We say 'went'!")
+
+        restarted = WebSessionStore(persist=True)
+        resumed = await restarted.open(session.session_id)
+        return resumed.get_history()
+
+    try:
+        history = asyncio.run(run())
+    finally:
+        async_storage.shutdown()
+    assert [m["content"] for m in history] == ["I goed home", "We say 'went'!"]
+    print("✓ Persisted web session")
+
+
+def test_failed_session_open_releases_the_socket(tmp_path, monkeypatch):
+    setup_pipeline(tmp_path, monkeypatch)
+
+    async def broken_open(session_id=None):
+        raise OSError("memory.db unavailable")
+
+    monkeypatch.setattr(main.web_sessions, "open", broken_open)
+    client = TestClient(main.app)
+    with pytest.raises(OSError):
+        with client.websocket_connect("/ws") as ws:
+            ws.receive_json()
+    assert main.manager.connections == {}
+    print("✓ No NameError when the session cannot be opened")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
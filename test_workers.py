@@ -0,0 +1,113 @@
+"""
+Test script for multi-process worker mode: consistent-hash routing and
+single-writer storage. The pipeline is a stub that reports its process id.
+"""
+
+import asyncio
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from memory import storage, async_storage
+from workers import HashRing, WorkerPool, conversation_key, merge_metrics
+
+# Turns run by this (worker) process
+turns_run = 0
+
+
+async def echo_pipeline(text, service, conn, reply_callback, rowid=None, history=None, deadline=None, user_id=None,
+                        conversation_id=None):
+    """Stand-in for main.process_user_message, run inside the workers."""
+    global turns_run
+    turns_run += 1
+    await async_storage.save_web_message(user_id, "user", text)
+    await reply_callback(f"{os.getpid()}:{text}")
+
+
+def echo_metrics():
+    """Stand-in for main.pipeline_metrics, run inside the workers."""
+    return {"llm": {"requests": turns_run, "circuit_state": "closed", "latency_p95": float(turns_run)}}
+
+
+def test_hash_ring_is_stable_and_balanced():
+    keys = [conversation_key("Telegram", i) for i in range(10000)]
+    ring = HashRing(range(4))
+
+    same = HashRing(range(4))
+    assert [ring.get(k) for k in keys] == [same.get(k) for k in keys]
+    counts = Counter(ring.get(k) for k in keys)
+    assert min(counts.values()) > 2500 * 0.7
+
+    # Adding a worker only moves roughly its fair share of conversations
+    grown = HashRing(range(5))
+    moved = sum(1 for k in keys if ring.get(k) != grown.get(k))
+    assert moved < len(keys) * 0.3
+    print(f"✓ Hash ring: {dict(counts)}, {moved} keys moved on 4 -> 5")
+
+
+def test_pool_pins_conversations_and_forwards_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_PATH", str(tmp_path / "memory.db"))
+    storage.init_database()
+    sessions = [f"session-{i}" for i in range(8)]
+
+    async def run():
+        pool = WorkerPool(2, pipeline="test_workers:echo_pipeline", setup=None, metrics="test_workers:echo_metrics")
+        pool.start()
+        pids = {}
+        try:
+            for turn in range(2):
+                for session in sessions:
+                    replies = []
+
+                    async def collect(chunk):
+                        replies.append(chunk)
+
+                    await pool.run_turn(session, f"turn {turn}", "Web", collect, user_id=session)
+                    pid, text = replies[0].split(":", 1)
+                    assert text == f"turn {turn}"
+                    pids.setdefault(session, set()).add(pid)
+            reports = await pool.collect_metrics()
+        finally:
+            await pool.stop()
+            async_storage.shutdown()
+        return pool, pids, reports
+
+    pool, pids, reports = asyncio.run(run())
+
+    # Each conversation stayed on one worker, and both workers were used
+    assert all(len(p) == 1 for p in pids.values())
+    assert len({p for s in pids.values() for p in s}) == 2
+
+    # Writes from the workers went through this process's writer
+    assert pool.stats["writes"] == 16
+    for session in sessions:
+        history = storage.get_web_history(session)
+        assert [m["content"] for m in history] == ["turn 0", "turn 1"]
+    print("✓ Conversations pinned to workers, writes forwarded")
+
+    # Each worker reported its own pipeline metrics
+    merged = merge_metrics(reports, gauges=("latency_p95",))
+    assert merged["llm"]["requests"] == 16 and merged["llm"]["circuit_state"] == {"closed": 2}
+    assert merged["llm"]["latency_p95"] == max(report["llm"]["requests"] for report in reports)
+    print("✓ Worker metrics collected")
+
+
+def test_merge_metrics():
+    reports = [
+        {"llm": {"in_flight": 2, "circuit_state": "closed", "latency_p50": 0.5, "latency_p95": None},
+         "router": {"routed": {"quick": 1}, "latency_ewma": {"gpt-4o-mini": 0.4}}},
+        {"llm": {"in_flight": 3, "circuit_state": "open", "latency_p50": 0.9, "latency_p95": 2.0},
+         "router": {"routed": {"quick": 2, "full": 1}, "latency_ewma": {"gpt-4o-mini": 0.7}}},
+    ]
+    assert merge_metrics(reports, gauges=("latency_p50", "latency_p95", "latency_ewma")) == {
+        "llm": {"in_flight": 5, "circuit_state": {"closed": 1, "open": 1}, "latency_p50": 0.9, "latency_p95": 2.0},
+        "router": {"routed": {"quick": 3, "full": 1}, "latency_ewma": {"gpt-4o-mini": 0.7}},
+    }
+    print("✓ Metrics merged")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,143 @@
+"""
+Startup warm-up.
+
+Pays the one-time costs before the first student message does: TLS
+handshake to OpenAI, opening memory.db and chat.db (pulling their hot
+pages into the OS page cache), loading student records, Jinja template
+compilation and regex compilation. /ready reports 503 until warm-up has
+finished.
+"""
+
+import asyncio
+import time
+
+from config import get_settings, get_openai_client
+from imessage.reader import (get_db_connection, get_inbox_rowid, resolve_handles,
+                             get_new_messages_for_handles, get_conversation_history)
+from memory import storage
+from ai.utils import split_message_into_chunks
+from ai.router import classify_turn
+from ringle.students import student_directory
+from state.user import user
+
+# Re-use the pooled connection often enough that it never hits keepalive_expiry
+LLM_KEEPALIVE_INTERVAL = 60.0
+WARMUP_TIMEOUT = 10.0
+
+SAMPLE_REPLY = (
+    "Great job! Your sentence was almost perfect.\n\n"
+    "By the way, we say \"I went\" instead of \"I goed\".\n"
+    "- went\n- bought\n\nShall we practice a few more?"
+)
+
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.checks = {}  # name -> "ok" | "skipped: ..." | "failed: ..."
+        self.started_at = None
+        self.duration = None
+
+    def as_dict(self):
+        return {
+            "ready": self.ready,
+            "checks": dict(self.checks),
+            "warmup_seconds": round(self.duration, 3) if self.duration is not None else None,
+        }
+
+
+# Global readiness state (exposed by /ready)
+warmup_state = WarmupState()
+
+
+def ping_llm():
+    """Open (or re-use) the pooled HTTPS connection to OpenAI."""
+    if not get_settings().openai_api_key:
+        return "skipped: OPENAI_API_KEY not set"
+    get_openai_client().with_options(timeout=WARMUP_TIMEOUT, max_retries=0).models.list()
+    return "ok"
+
+
+def prime_memory_db():
+    """Create/open memory.db and touch the pages every turn reads."""
+    storage.init_database()
+    storage.load_recent_summaries(limit=5)
+    storage.get_all_profile_data()  # Loads the profile cache
+    storage.get_telegram_history(0, limit=20)
+    return "ok"
+
+
+def prime_chat_db():
+    """Open chat.db and run the poller's queries once."""
+    conn = get_db_connection()
+    if not conn:
+        return "skipped: chat.db not available"
+    try:
+        handles = resolve_handles(conn, user.phone_numbers)
+        get_new_messages_for_handles(conn, handles, get_inbox_rowid(conn))
+        if user.phone_number:
+            get_conversation_history(conn, user.phone_number, limit=20)
+    finally:
+        conn.close()
+    return "ok"
+
+
+def load_students():
+    """Load and index student records (unless startup already did)."""
+    count = len(student_directory.by_id) if student_directory.loaded else student_directory.load()
+    return "ok" if count or not get_settings().students_file else "failed: no students loaded"
+
+
+def compile_templates(templates):
+    """Compile Jinja templates into the environment's cache."""
+    for name in templates.env.list_templates():
+        templates.get_template(name)
+    return "ok"
+
+
+def compile_regexes():
+    """Run the chunking and routing paths once so their regexes are compiled."""
+    split_message_into_chunks(SAMPLE_REPLY)
+    classify_turn("yesterday i goed to the office")
+    return "ok"
+
+
+async def _run_check(name, func, *args):
+    start = time.monotonic()
+    try:
+        status = await asyncio.wait_for(asyncio.to_thread(func, *args), WARMUP_TIMEOUT)
+    except Exception as e:
+        status = f"failed: {type(e).__name__}: {e}"
+    warmup_state.checks[name] = status
+    print(f"[Warmup] {name}: {status} ({time.monotonic() - start:.2f}s)")
+
+
+async def warm_up(templates):
+    """
+    Run all warm-up steps concurrently and mark the app ready.
+    Failed steps are reported in /ready but do not keep the app unready:
+    a missing chat.db or an unreachable API is a degraded state, not a
+    reason to refuse the web and Telegram channels.
+    """
+    warmup_state.started_at = time.monotonic()
+    await asyncio.gather(
+        _run_check("llm_connection", ping_llm),
+        _run_check("memory_db", prime_memory_db),
+        _run_check("chat_db", prime_chat_db),
+        _run_check("students", load_students),
+        _run_check("templates", compile_templates, templates),
+        _run_check("regexes", compile_regexes),
+    )
+    warmup_state.duration = time.monotonic() - warmup_state.started_at
+    warmup_state.ready = True
+    print(f"[Warmup] Ready after {warmup_state.duration:.2f}s")
+
+
+async def keep_llm_connection_alive(interval=LLM_KEEPALIVE_INTERVAL):
+    """Periodically re-use the OpenAI connection so it stays open between turns."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(ping_llm)
+        except Exception as e:
+            print(f"[Warmup] LLM keep-alive failed: {e}")
@@ -0,0 +1,449 @@
+"""
+Multi-process worker mode.
+
+The server process (the "front") keeps all I/O: HTTP, WebSockets, the
+Telegram bot, chat.db polling, outbound delivery and the single memory.db
+writer. Conversation turns run in N worker processes. Each conversation
+is pinned to one worker by consistent hashing on (channel, conversation
+id), so the per-process singletons (contexts, user, router and governor
+state) only ever see their own conversations.
+
+Workers send storage writes back to the front, which runs them on its
+writer thread; reads go straight to memory.db (WAL allows concurrent
+readers across processes). The pipeline's metrics (LLM governor, cache,
+router, deadlines) live in the workers too: the front asks each worker
+for a report and merges them (see WorkerPool.collect_metrics).
+
+Started by serve.py (WORKERS > 0). `python main.py` stays single-process.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import importlib
+import itertools
+import multiprocessing
+import threading
+import time
+
+from memory import async_storage, storage
+
+VIRTUAL_NODES = 128         # Ring points per worker (smooths the key distribution)
+MONITOR_INTERVAL = 2.0      # Seconds between worker liveness checks
+STOP_TIMEOUT = 10.0         # Grace period for in-flight turns on shutdown
+METRICS_TIMEOUT = 1.0       # Seconds to wait for the workers' metrics reports
+DEFAULT_PIPELINE = "main:process_user_message"
+DEFAULT_SETUP = "main:prepare_worker"
+DEFAULT_METRICS = "main:pipeline_metrics"
+
+
+class WorkerError(RuntimeError):
+    """A turn or write failed in a worker process (or the worker died)."""
+
+
+def _hash(value):
+    # Python's hash() is salted per process; the ring must agree everywhere
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def conversation_key(service, conversation_id):
+    """Sharding key for a conversation, e.g. "telegram:12345"."""
+    return f"{service.lower()}:{conversation_id}"
+
+
+class HashRing:
+    """
+    Consistent hashing of conversation keys onto worker indexes.
+    Changing the number of workers only moves about 1/N of the keys.
+    """
+
+    def __init__(self, nodes, virtual_nodes=VIRTUAL_NODES):
+        points = sorted(
+            (_hash(f"worker-{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(virtual_nodes)
+        )
+        self.hashes = [h for h, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def get(self, key):
+        """Worker index owning `key`."""
+        i = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.nodes[i]
+
+
+def _resolve(spec):
+    """Import "module:attribute"."""
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def merge_metrics(reports, gauges=()):
+    """
+    Combine the same metrics dict reported by several workers.
+    Numbers are summed, except under `gauges` keys (latencies, delays...),
+    where the highest value is kept; text values such as circuit states are
+    counted, e.g. {"closed": 3, "open": 1}. None values are skipped.
+
+    Args:
+        reports: Metrics dicts, one per worker
+        gauges: Keys whose values are not additive
+    """
+    merged = {}
+    for report in reports:
+        for key, value in report.items():
+            if value is None:
+                merged.setdefault(key, None)
+            elif isinstance(value, dict):
+                current = merged.get(key) or {}
+                # Everything under a gauge key is a gauge too
+                nested = ("*",) if key in gauges or "*" in gauges else gauges
+                merged[key] = merge_metrics([current, value], nested)
+            elif isinstance(value, str):
+                counts = merged.get(key) or {}
+                counts[value] = counts.get(value, 0) + 1
+                merged[key] = counts
+            elif merged.get(key) is None:
+                merged[key] = value
+            elif key in gauges or "*" in gauges:
+                merged[key] = max(merged[key], value)
+            else:
+                merged[key] += value
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Worker process side
+# ---------------------------------------------------------------------------
+
+class _WriteClient:
+    """Forwards async_storage writes to the front process and awaits the result."""
+
+    def __init__(self, index, results, loop):
+        self.index = index
+        self.results = results
+        self.loop = loop
+        self.pending = {}
+        self.ids = itertools.count(1)
+
+    async def __call__(self, func_name, args, kwargs):
+        request_id = next(self.ids)
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        self.results.put(("write", self.index, request_id, func_name, args, kwargs))
+        return await future
+
+    def resolve(self, request_id, result, error):
+        future = self.pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if error:
+            future.set_exception(WorkerError(error))
+        else:
+            future.set_result(result)
+
+
+def worker_main(index, inbox, results, pipeline=DEFAULT_PIPELINE, setup=DEFAULT_SETUP, metrics=DEFAULT_METRICS):
+    """Entry point of a worker process."""
+    try:
+        asyncio.run(_worker_loop(index, inbox, results, pipeline, setup, metrics))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_loop(index, inbox, results, pipeline, setup, metrics):
+    loop = asyncio.get_running_loop()
+    process_turn = _resolve(pipeline)
+
+    writes = _WriteClient(index, results, loop)
+    async_storage.set_write_forwarder(writes)
+    if setup:
+        await _resolve(setup)()
+
+    stopped = asyncio.Event()
+    turns = set()
+    chat_db = None
+
+    async def run_turn(turn_id, payload):
+        nonlocal chat_db
+        error = None
+
+        async def reply(chunk):
+            results.put(("chunk", turn_id, chunk))
+
+        try:
+            conn = None
+            if payload.pop("use_chat_db", False):
+                if chat_db is None:
+                    from imessage.reader import get_db_connection
+                    chat_db = get_db_connection()
+                conn = chat_db
+            text, service = payload.pop("text"), payload.pop("service")
+            await process_turn(text, service, conn, reply, **payload)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"[Worker {index}] Turn failed: {error}")
+        results.put(("done", turn_id, error))
+
+    def handle(message):
+        kind = message[0]
+        if kind == "turn":
+            task = loop.create_task(run_turn(message[1], message[2]))
+            turns.add(task)
+            task.add_done_callback(turns.discard)
+        elif kind == "write_result":
+            writes.resolve(*message[1:])
+        elif kind == "invalidate_profile":
+            storage.invalidate_profile_cache(message[1], message[2])
+        elif kind == "metrics":
+            try:
+                report = _resolve(metrics)() if metrics else {}
+            except Exception as e:
+                print(f"[Worker {index}] Metrics failed: {e}")
+                report = None
+            results.put(("metrics", index, message[1], report))
+        elif kind == "stop":
+            stopped.set()
+
+    def read_inbox():
+        while True:
+            message = inbox.get()
+            loop.call_soon_threadsafe(handle, message)
+            if message[0] == "stop":
+                return
+
+    threading.Thread(target=read_inbox, name=f"worker-{index}-inbox", daemon=True).start()
+    print(f"[Worker {index}] Ready")
+
+    await stopped.wait()
+    if turns:
+        await asyncio.wait(turns, timeout=STOP_TIMEOUT)
+    if chat_db is not None:
+        chat_db.close()
+    async_storage.shutdown()
+
+
+# ---------------------------------------------------------------------------
+# Front process side
+# ---------------------------------------------------------------------------
+
+class WorkerPool:
+    """
+    Starts the worker processes and routes turns to them.
+
+    Args:
+        size: Number of worker processes
+        pipeline: "module:function" run for each turn, with the signature of
+            main.process_user_message
+        setup: Optional "module:coroutine" run once when a worker starts
+        metrics: Optional "module:function" returning a worker's metrics report
+    """
+
+    def __init__(self, size, pipeline=DEFAULT_PIPELINE, setup=DEFAULT_SETUP, metrics=DEFAULT_METRICS):
+        if size < 1:
+            raise ValueError("WorkerPool needs at least one worker")
+        self.size = size
+        self.pipeline = pipeline
+        self.setup = setup
+        self.metrics_spec = metrics
+        self.ring = HashRing(range(size))
+
+        # spawn, not fork: the front already runs an event loop and threads
+        self._mp = multiprocessing.get_context("spawn")
+        self.results = self._mp.Queue()
+        self.inboxes = [self._mp.Queue() for _ in range(size)]
+        self.processes = [None] * size
+        self.restarts = [0] * size
+        self.turns = {}  # turn_id -> (worker index, asyncio.Queue)
+        self.turn_ids = itertools.count(1)
+        self.reports = {}  # metrics request id -> [report per worker]
+        self.report_ids = itertools.count(1)
+        self.stats = {"turns": 0, "failed": 0, "writes": 0}
+
+        self.loop = None
+        self.stopping = False
+        self._reader = None
+        self._monitor_task = None
+
+    def start(self):
+        """Spawn the workers (call from the front's event loop)."""
+        self.loop = asyncio.get_running_loop()
+        for index in range(self.size):
+            self._spawn(index)
+        self._reader = threading.Thread(target=self._read_results, name="worker-results", daemon=True)
+        self._reader.start()
+        self._monitor_task = asyncio.create_task(self._monitor())
+        print(f"[Workers] Started {self.size} worker processes")
+
+    def _spawn(self, index):
+        process = self._mp.Process(
+            target=worker_main,
+            args=(index, self.inboxes[index], self.results, self.pipeline, self.setup, self.metrics_spec),
+            name=f"rngbot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+
+    def worker_for(self, service, conversation_id):
+        """Index of the worker that owns this conversation."""
+        return self.ring.get(conversation_key(service, conversation_id))
+
+    async def run_turn(self, conversation_id, text, service, reply_callback, use_chat_db=False, **kwargs):
+        """
+        Run one turn on the conversation's worker.
+        Reply chunks are passed to `reply_callback` here, in order.
+
+        Raises:
+            WorkerError: if the turn failed or the worker died
+        """
+        index = self.worker_for(service, conversation_id)
+        turn_id = next(self.turn_ids)
+        queue = asyncio.Queue()
+        self.turns[turn_id] = (index, queue)
+        self.stats["turns"] += 1
+
+        payload = dict(kwargs, text=text, service=service, use_chat_db=use_chat_db, conversation_id=conversation_id)
+        self.inboxes[index].put(("turn", turn_id, payload))
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "chunk":
+                    await reply_callback(value)
+                    continue
+                if value:
+                    self.stats["failed"] += 1
+                    raise WorkerError(value)
+                return
+        finally:
+            self.turns.pop(turn_id, None)
+
+    def _read_results(self):
+        """Runs on a thread: dispatches worker output to the event loop or the writer."""
+        while True:
+            message = self.results.get()
+            if message is None:
+                return
+            if message[0] == "write":
+                self._execute_write(*message[1:])
+            elif message[0] == "metrics":
+                self.loop.call_soon_threadsafe(self._deliver_report, *message[1:])
+            else:
+                self.loop.call_soon_threadsafe(self._deliver, message)
+
+    def _deliver_report(self, index, request_id, report):
+        request = self.reports.get(request_id)
+        if request:
+            received, waiting, answered = request
+            received[index] = report
+            waiting.discard(index)
+            if not waiting:
+                answered.set()
+
+    async def collect_metrics(self, timeout=METRICS_TIMEOUT):
+        """
+        Ask every live worker for its metrics report.
+
+        Returns:
+            list: One report per worker (None if it is down or did not answer in time)
+        """
+        request_id = next(self.report_ids)
+        received = [None] * self.size
+        waiting = {index for index, process in enumerate(self.processes) if process and process.is_alive()}
+        answered = asyncio.Event()
+        self.reports[request_id] = (received, waiting, answered)
+        for index in waiting:
+            self.inboxes[index].put(("metrics", request_id))
+        try:
+            if waiting:
+                await asyncio.wait_for(answered.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[Workers] No metrics from workers {sorted(waiting)}")
+        finally:
+            self.reports.pop(request_id, None)
+        return received
+
+    def _deliver(self, message):
+        kind, turn_id, value = message
+        entry = self.turns.get(turn_id)
+        if entry:
+            entry[1].put_nowait((kind, value))
+
+    def _execute_write(self, index, request_id, func_name, args, kwargs):
+        """Run a worker's storage write on the front's single writer thread."""
+        self.stats["writes"] += 1
+        inbox = self.inboxes[index]
+
+        def reply(future):
+            error = None
+            result = None
+            try:
+                result = future.result()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            inbox.put(("write_result", request_id, result, error))
+            # The front's cache is already updated (write-through); refresh the workers'
+            if func_name == "save_user_profile" and not error:
+                key = args[0] if args else kwargs.get("key")
+                conversation = args[2] if len(args) > 2 else kwargs.get("conversation", "")
+                for other in self.inboxes:
+                    other.put(("invalidate_profile", key, conversation))
+
+        try:
+            async_storage.submit_write(func_name, args, kwargs).add_done_callback(reply)
+        except Exception as e:
+            inbox.put(("write_result", request_id, None, f"{type(e).__name__}: {e}"))
+
+    async def _monitor(self):
+        """Restart dead workers; their in-flight turns fail."""
+        while not self.stopping:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if self.stopping or process.is_alive():
+                    continue
+                print(f"[Workers] Worker {index} exited ({process.exitcode}), restarting")
+                for turn_id, (owner, queue) in list(self.turns.items()):
+                    if owner == index:
+                        queue.put_nowait(("done", f"worker {index} exited"))
+                self.restarts[index] += 1
+                self._spawn(index)
+
+    async def stop(self):
+        """Let in-flight turns finish, then stop the workers."""
+        self.stopping = True
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        for inbox in self.inboxes:
+            inbox.put(("stop",))
+
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in self.processes:
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self.results.put(None)
+        if self._reader:
+            await asyncio.to_thread(self._reader.join, STOP_TIMEOUT)
+        for queue in self.inboxes + [self.results]:
+            queue.close()
+            queue.join_thread()
+        print("[Workers] Stopped")
+
+    def metrics(self):
+        in_flight = [0] * self.size
+        for index, _ in self.turns.values():
+            in_flight[index] += 1
+        return {
+            **self.stats,
+            "workers": [
+                {
+                    "pid": process.pid if process else None,
+                    "alive": bool(process and process.is_alive()),
+                    "in_flight": in_flight[index],
+                    "restarts": self.restarts[index],
+                }
+                for index, process in enumerate(self.processes)
+            ],
+        }